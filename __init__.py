@@ -2,12 +2,39 @@
 
 from __future__ import annotations
 
+from datetime import timedelta
+import logging
+
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP, Platform
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse, callback
+from homeassistant.exceptions import ConfigEntryError, HomeAssistantError
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.typing import ConfigType
+from homeassistant.util import slugify
+from homeassistant.util.yaml import load_yaml
 
+from .config_flow import async_discover, cacheTimes
+from .devicemap import DeviceMap
 from .dominoService import DominoService
-from .const import CONF_COM_PORT, CONF_COM_BAUD
+from .hub import DominoHub
+from .recorder import BusRecorder
+from .storage import async_load_snapshot, async_remove_snapshot, async_save_snapshot
+from .const import (
+    DOMAIN,
+    CONF_COM_PORT,
+    CONF_COM_BAUD,
+    COM_BAUD_DEFAULT,
+    CONF_DEVICE_MAP,
+    CONF_DEVICE_MAP_FILE,
+    CONF_MONITOR,
+    CONF_CAPTURE_FILE,
+    CONF_BUSES,
+    CONF_BUS_ID,
+)
+
+_LOGGER = logging.getLogger(__name__)
 
 # TODO List the platforms that you want to support.
 # For your initial PR, limit it to 1 platform.
@@ -23,6 +50,35 @@ type DominoConfigEntry = ConfigEntry[None]  # noqa: F821
 #     # Return boolean to indicate that initialization was successful.
 #     return True
 
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+SERVICE_DISCOVER = "discover"
+
+# the register cache is saved this often and on shutdown, and served from at the next start
+SNAPSHOT_INTERVAL = timedelta(minutes=5)
+# buffered capture records are written at least this often, a crash loses no more than that
+CAPTURE_FLUSH_INTERVAL = timedelta(seconds=10)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Register the Domino services."""
+
+    async def _async_discover(call: ServiceCall) -> ServiceResponse:
+        """Scan the bus of every loaded hub, or of the one requested."""
+        results = {}
+        for entry in hass.config_entries.async_loaded_entries(DOMAIN):
+            if call.data.get("entry_id") not in (None, entry.entry_id):
+                continue
+            results[entry.entry_id] = {
+                bus.com_port: await async_discover(hass, bus) for bus in entry.runtime_data.buses
+            }
+        return results
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_DISCOVER, _async_discover, supports_response=SupportsResponse.OPTIONAL
+    )
+    return True
+
 # TODO Update entry annotation
 async def async_setup_entry(hass: HomeAssistant, entry: DominoConfigEntry) -> bool:
     """Set up Domino from a config entry."""
@@ -32,17 +88,152 @@ async def async_setup_entry(hass: HomeAssistant, entry: DominoConfigEntry) -> bo
     # TODO 3. Store an API object for your platforms to access
     # entry.runtime_data = MyAPI(...)
 
-    comPort = entry.data[CONF_COM_PORT]
-    comBaud = entry.data[CONF_COM_BAUD]
-    api = DominoService(comPort, comBaud)
-    entry.runtime_data = api 
+    buses = []
+    for comPort, comBaud, source, busId in _busConfigs(entry):
+        deviceMap = await _async_load_device_map(hass, source, busId is None)
+        buses.append(DominoService(comPort, comBaud, cacheTimes(entry.options), deviceMap, busId=busId))
+    hub = DominoHub(buses, _hubSource(entry))
+    await _async_restore_snapshot(hass, entry, hub)
+    await _async_start_recorder(hass, entry, hub.primary)
+    await hub.connect()
+    hub.listen(entry.options.get(CONF_MONITOR, False))
+    entry.runtime_data = hub
+    entry.async_on_unload(entry.add_update_listener(_async_update_options))
 
     await hass.config_entries.async_forward_entry_setups(entry, _PLATFORMS)
 
+    # entities have registered their devices, start sweeping the buses
+    hub.start()
+
+    async def _async_save(_now_or_event=None) -> None:
+        await async_save_snapshot(hass, entry.entry_id, hub.snapshot())
+
+    async def _async_stop(_event) -> None:
+        await _async_save()
+        # entries are not unloaded on shutdown, the capture would lose its last frames
+        await _async_stop_recorder(hass, hub.primary)
+
+    @callback
+    def _flush_capture(_now) -> None:
+        recorder = hub.primary.transport.recorder
+        if recorder is not None:
+            recorder.flush()
+
+    entry.async_on_unload(async_track_time_interval(hass, _async_save, SNAPSHOT_INTERVAL))
+    entry.async_on_unload(async_track_time_interval(hass, _flush_capture, CAPTURE_FLUSH_INTERVAL))
+    entry.async_on_unload(hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _async_stop))
+
     return True
 
 
+async def _async_restore_snapshot(hass: HomeAssistant, entry: DominoConfigEntry, hub: DominoHub) -> None:
+    """Fill the register caches from the snapshot the entry left at its last stop."""
+    try:
+        snapshot = await async_load_snapshot(hass, entry.entry_id)
+    except HomeAssistantError as e:
+        _LOGGER.warning(f"Unable to load the register snapshot: {e}")
+        return
+    if snapshot is not None:
+        hub.restoreSnapshot(*snapshot)
+
+
+def _hubSource(entry: DominoConfigEntry):
+    return (entry.options.get(CONF_DEVICE_MAP), entry.options.get(CONF_DEVICE_MAP_FILE), entry.options.get(CONF_BUSES))
+
+
+def _busConfigs(entry: DominoConfigEntry) -> list[tuple]:
+    """Port, baud rate, device map source and bus id of every bus of the entry."""
+    configs = [(
+        entry.data[CONF_COM_PORT],
+        entry.data[CONF_COM_BAUD],
+        (entry.options.get(CONF_DEVICE_MAP), entry.options.get(CONF_DEVICE_MAP_FILE)),
+        None,
+    )]
+    ports = {entry.data[CONF_COM_PORT]}
+    for idx, bus in enumerate(entry.options.get(CONF_BUSES) or []):
+        comPort = bus.get(CONF_COM_PORT) if isinstance(bus, dict) else None
+        if not isinstance(comPort, str) or comPort == "":
+            raise ConfigEntryError(f"Invalid Domino bus {idx}: missing {CONF_COM_PORT}")
+        if comPort in ports:
+            raise ConfigEntryError(f"Invalid Domino bus {idx}: {comPort} is already used")
+        ports.add(comPort)
+        configs.append((
+            comPort,
+            bus.get(CONF_COM_BAUD, COM_BAUD_DEFAULT),
+            (bus.get(CONF_DEVICE_MAP), bus.get(CONF_DEVICE_MAP_FILE)),
+            slugify(str(bus.get(CONF_BUS_ID) or comPort)),
+        ))
+    return configs
+
+
+async def _async_load_device_map(hass: HomeAssistant, source, isPrimary: bool) -> DeviceMap:
+    """Compile a device map from the options, the YAML file or, on the first bus, the built-in default."""
+    config, path = source
+    try:
+        if config is None and path:
+            config = await hass.async_add_executor_job(load_yaml, hass.config.path(path))
+        if config is None and not isPrimary:
+            # the house map belongs to the first bus, the others start empty until they are mapped
+            config = {}
+        deviceMap = DeviceMap(config, source)
+    except (HomeAssistantError, OSError, ValueError) as e:
+        raise ConfigEntryError(f"Invalid Domino device map: {e}") from e
+    _LOGGER.info(f"Loaded {deviceMap}")
+    return deviceMap
+
+
+async def _async_start_recorder(hass: HomeAssistant, entry: DominoConfigEntry, api: DominoService) -> None:
+    """Record the bus traffic to the capture file of the entry, if it has one."""
+    path = entry.options.get(CONF_CAPTURE_FILE)
+    if not path:
+        return
+    recorder = BusRecorder(hass.config.path(path))
+    try:
+        await hass.async_add_executor_job(recorder.open)
+    except OSError as e:
+        _LOGGER.warning(f"Unable to record bus traffic to {recorder.path}: {e}")
+        return
+    api.transport.recorder = recorder
+
+
+def _capturePath(hass: HomeAssistant, entry: DominoConfigEntry):
+    path = entry.options.get(CONF_CAPTURE_FILE)
+    return hass.config.path(path) if path else None
+
+
+async def _async_stop_recorder(hass: HomeAssistant, api: DominoService) -> None:
+    recorder = api.transport.recorder
+    if recorder is not None:
+        api.transport.recorder = None
+        await hass.async_add_executor_job(recorder.close)
+
+
+async def _async_update_options(hass: HomeAssistant, entry: DominoConfigEntry) -> None:
+    """Apply changed options, reloading the entry only when the device maps or the buses changed."""
+    hub = entry.runtime_data
+    if _hubSource(entry) != hub.source:
+        await hass.config_entries.async_reload(entry.entry_id)
+        return
+    recorder = hub.primary.transport.recorder
+    if _capturePath(hass, entry) != (recorder.path if recorder is not None else None):
+        await _async_stop_recorder(hass, hub.primary)
+        await _async_start_recorder(hass, entry, hub.primary)
+    hub.setCacheTimes(cacheTimes(entry.options))
+    hub.listen(entry.options.get(CONF_MONITOR, False))
+
+
 # TODO Update entry annotation
 async def async_unload_entry(hass: HomeAssistant, entry: DominoConfigEntry) -> bool:
     """Unload a config entry."""
-    return await hass.config_entries.async_unload_platforms(entry, _PLATFORMS)
\ No newline at end of file
+    await entry.runtime_data.stop()
+    unloaded = await hass.config_entries.async_unload_platforms(entry, _PLATFORMS)
+    if unloaded:
+        await async_save_snapshot(hass, entry.entry_id, entry.runtime_data.snapshot())
+        await entry.runtime_data.disconnect()
+        await _async_stop_recorder(hass, entry.runtime_data.primary)
+    return unloaded
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: DominoConfigEntry) -> None:
+    """Remove the register snapshot of a deleted entry."""
+    await async_remove_snapshot(hass, entry.entry_id)
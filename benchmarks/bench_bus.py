@@ -0,0 +1,312 @@
+"""End-to-end bus benchmarks against the simulated Domino bus.
+
+Run from the repository root:
+
+    python benchmarks/bench_bus.py --output bench.json
+
+The platform device tables and entity update paths need Home Assistant
+to be importable, those sections are reported as skipped otherwise.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import importlib.util
+import json
+import subprocess
+import sys
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PACKAGE = "domino_hub"
+
+def loadPackage():
+  # the package as domino_hub, with Home Assistant if it imports; the tests load it the same way
+  spec = importlib.util.spec_from_file_location(PACKAGE, ROOT / "__init__.py", submodule_search_locations = [str(ROOT)])
+  pkg = importlib.util.module_from_spec(spec)
+  sys.modules[PACKAGE] = pkg
+  try:
+    spec.loader.exec_module(pkg)
+    return True
+  except (ImportError, SyntaxError):
+    # no Home Assistant, or a Python too old for the syntax it needs, the bus modules do without
+    pkg = types.ModuleType(PACKAGE)
+    pkg.__path__ = [str(ROOT)]
+    sys.modules[PACKAGE] = pkg
+    return False
+
+def percentiles(samples):
+  if (len(samples) == 0):
+    return None
+  ordered = sorted(samples)
+  def pick(pct):
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))] * 1000
+  return {
+    "count": len(ordered),
+    "mean_ms": sum(ordered) / len(ordered) * 1000,
+    "p50_ms": pick(50),
+    "p90_ms": pick(90),
+    "p99_ms": pick(99),
+    "max_ms": ordered[-1] * 1000,
+  }
+
+class CountingExecutor(ThreadPoolExecutor):
+  """Default executor that records how long its threads are kept busy."""
+
+  def __init__(self):
+    super().__init__()
+    self._statsLock = threading.Lock()
+    self.jobs = 0
+    self.busySeconds = 0.0
+    self.active = 0
+    self.peakActive = 0
+
+  def submit(self, fn, *args, **kwargs):
+    def timed():
+      with self._statsLock:
+        self.jobs += 1
+        self.active += 1
+        self.peakActive = max(self.peakActive, self.active)
+      start = time.perf_counter()
+      try:
+        return fn(*args, **kwargs)
+      finally:
+        with self._statsLock:
+          self.busySeconds += time.perf_counter() - start
+          self.active -= 1
+    return super().submit(timed)
+
+class HouseEntry:
+  """The bits of a config entry the platform setups read."""
+
+  def __init__(self, svc):
+    from domino_hub.hub import DominoHub
+    self.runtime_data = DominoHub([svc])
+    self.entry_id = "bench"
+    self.options = {}
+    self.unloadCallbacks = []
+
+  def async_on_unload(self, func):
+    self.unloadCallbacks.append(func)
+
+async def houseEntities(svc):
+  entities = []
+  entry = HouseEntry(svc)
+  for platform in ("light", "cover", "sensor"):
+    module = importlib.import_module(f"{PACKAGE}.{platform}")
+    await module.async_setup_entry(None, entry, entities.extend)
+  return entities
+
+def entityDevices(entity):
+  for attr in ("_light", "_motor", "_room"):
+    if (hasattr(entity, attr)):
+      return [getattr(entity, attr)]
+  return list(getattr(entity, "_meteos", []))
+
+def simulateDevices(bus, devices):
+  from domino_hub.dominoService import Dimmer, LightContainer, Meteo, MotorContainer, RoomTemperature
+  for device in devices:
+    device = getattr(device, "container", None) or getattr(device, "motor", None) or device
+    if (isinstance(device, LightContainer)):
+      bus.addLightContainer(device.mod)
+    elif (isinstance(device, Dimmer)):
+      bus.addDimmer(device.mod)
+    elif (isinstance(device, MotorContainer)):
+      bus.addMotorContainer(device.mod)
+    elif (isinstance(device, RoomTemperature)):
+      bus.addRoomTemperature(device.mod)
+    elif (isinstance(device, Meteo)):
+      bus.addMeteo(device.mod)
+
+async def openBus(args, devices):
+  from domino_hub.devicemap import DeviceMap
+  from domino_hub.dominoService import DominoService
+  from domino_hub.simulator import SimulatedBus
+  bus = SimulatedBus(latency = args.latency, jitter = args.jitter, seed = 1)
+  simulateDevices(bus, devices)
+  port = await bus.start()
+  svc = DominoService(port, 19200, deviceMap = DeviceMap())
+  await svc.connect()
+  return bus, svc
+
+async def closeBus(bus, svc):
+  await svc.disconnect()
+  bus.stop()
+
+async def benchExchange(args):
+  from domino_hub.dominoService import Dimmer, sendReqStatus
+  dimmer = Dimmer(23)
+  bus, svc = await openBus(args, [dimmer])
+  try:
+    msg = sendReqStatus(dimmer.mod, 0x31)
+    samples = []
+    for _ in range(args.exchanges):
+      start = time.perf_counter()
+      await svc.exchange(msg)
+      samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+  finally:
+    await closeBus(bus, svc)
+
+async def benchPollCycle(args, entities):
+  devices = [d for e in entities for d in entityDevices(e)]
+  bus, svc = await openBus(args, devices)
+  try:
+    for entity in entities:
+      svc.scheduler.register(entityDevices(entity), lambda *statuses: None)
+    samples = []
+    requests = bus.requestCount
+    for _ in range(args.cycles):
+      start = time.perf_counter()
+      await svc.scheduler.refresh()
+      samples.append(time.perf_counter() - start)
+    result = percentiles(samples)
+    result["entities"] = len(entities)
+    result["registers"] = len(svc.scheduler.registerKeys())
+    result["frames_per_cycle"] = (bus.requestCount - requests) / args.cycles
+    return result
+  finally:
+    await closeBus(bus, svc)
+
+async def benchEntityUpdate(args):
+  # cold update of every entity through its own async_update, as HA polling would do it
+  from domino_hub.devicemap import DeviceMap
+  from domino_hub.dominoService import DominoService
+  probe = DominoService("unused", 19200, deviceMap = DeviceMap())
+  devices = [d for e in await houseEntities(probe) for d in entityDevices(e)]
+  bus, svc = await openBus(args, devices)
+  try:
+    samples = []
+    requests = bus.requestCount
+    for _ in range(args.cycles):
+      # group and diagnostic entities do not read the bus themselves
+      entities = [e for e in await houseEntities(svc) if len(entityDevices(e)) > 0]
+      start = time.perf_counter()
+      await asyncio.gather(*[e.async_update() for e in entities])
+      samples.append(time.perf_counter() - start)
+    result = percentiles(samples)
+    result["frames_per_cycle"] = (bus.requestCount - requests) / args.cycles
+    return result
+  finally:
+    await closeBus(bus, svc)
+
+async def benchCommandUnderLoad(args, entities):
+  from domino_hub.dominoService import Dimmer
+  devices = [d for e in entities for d in entityDevices(e)]
+  dimmer = next((d for d in devices if isinstance(d, Dimmer)), Dimmer(23))
+  devices.append(dimmer)
+  bus, svc = await openBus(args, devices)
+  try:
+    for entity in entities:
+      svc.scheduler.register(entityDevices(entity), lambda *statuses: None)
+
+    async def pollForever():
+      while True:
+        await svc.scheduler.refresh()
+
+    poller = asyncio.get_running_loop().create_task(pollForever())
+    samples = []
+    try:
+      for i in range(args.commands):
+        await asyncio.sleep(args.latency * 3)
+        start = time.perf_counter()
+        await dimmer.setLight(svc, i % 100)
+        samples.append(time.perf_counter() - start)
+    finally:
+      poller.cancel()
+      try:
+        await poller
+      except asyncio.CancelledError:
+        pass
+    return percentiles(samples)
+  finally:
+    await closeBus(bus, svc)
+
+async def benchMultiBus(args, entities):
+  # the same house on several simulated ports: a hub cycle should take as long as one bus, not all of them
+  from domino_hub.hub import DominoHub
+  devices = [d for e in entities for d in entityDevices(e)]
+  opened = [await openBus(args, devices) for _ in range(args.buses)]
+  try:
+    hub = DominoHub([svc for (_, svc) in opened])
+    for (_, svc) in opened:
+      for entity in entities:
+        svc.scheduler.register(entityDevices(entity), lambda *statuses: None)
+    single = []
+    for _ in range(args.cycles):
+      start = time.perf_counter()
+      await hub.primary.scheduler.refresh()
+      single.append(time.perf_counter() - start)
+    samples = []
+    for _ in range(args.cycles):
+      start = time.perf_counter()
+      await hub.refresh()
+      samples.append(time.perf_counter() - start)
+    result = percentiles(samples)
+    result["buses"] = args.buses
+    result["single_bus_mean_ms"] = sum(single) / len(single) * 1000
+    result["cycle_ratio"] = result["mean_ms"] / result["single_bus_mean_ms"]
+    return result
+  finally:
+    for (bus, svc) in opened:
+      await closeBus(bus, svc)
+
+def gitRevision():
+  try:
+    return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd = ROOT, capture_output = True, text = True, check = True).stdout.strip()
+  except Exception:
+    return None
+
+async def runAll(args, hasHomeAssistant):
+  executor = CountingExecutor()
+  asyncio.get_running_loop().set_default_executor(executor)
+  results = {"exchange_latency": await benchExchange(args)}
+  if (hasHomeAssistant):
+    from domino_hub.devicemap import DeviceMap
+    from domino_hub.dominoService import DominoService
+    entities = await houseEntities(DominoService("unused", 19200, deviceMap = DeviceMap()))
+    results["poll_cycle"] = await benchPollCycle(args, entities)
+    results["entity_update"] = await benchEntityUpdate(args)
+    results["command_under_poll_load"] = await benchCommandUnderLoad(args, entities)
+    results["multi_bus_poll_cycle"] = await benchMultiBus(args, entities)
+  else:
+    results["poll_cycle"] = results["entity_update"] = results["command_under_poll_load"] = "skipped: homeassistant not installed"
+    results["multi_bus_poll_cycle"] = "skipped: homeassistant not installed"
+  results["executor"] = {
+    "jobs": executor.jobs,
+    "busy_seconds": executor.busySeconds,
+    "peak_threads": executor.peakActive,
+  }
+  return results
+
+def main():
+  parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+  parser.add_argument("--latency", type = float, default = 0.01, help = "simulated reply latency in seconds")
+  parser.add_argument("--jitter", type = float, default = 0.002, help = "simulated reply jitter in seconds")
+  parser.add_argument("--exchanges", type = int, default = 200)
+  parser.add_argument("--cycles", type = int, default = 10)
+  parser.add_argument("--commands", type = int, default = 50)
+  parser.add_argument("--buses", type = int, default = 3, help = "simulated ports behind one hub")
+  parser.add_argument("--output", help = "write the JSON report to this file instead of stdout")
+  args = parser.parse_args()
+
+  hasHomeAssistant = loadPackage()
+  report = {
+    "revision": gitRevision(),
+    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    "config": {k: v for k, v in vars(args).items() if k != "output"},
+    "results": asyncio.run(runAll(args, hasHomeAssistant)),
+  }
+  text = json.dumps(report, indent = 2)
+  if (args.output):
+    Path(args.output).write_text(text + "\n")
+  else:
+    print(text)
+
+if __name__ == "__main__":
+  main()
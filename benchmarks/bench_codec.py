@@ -0,0 +1,126 @@
+"""Micro-benchmark of the frame codec against the list and string building it replaced.
+
+Run from the repository root:
+
+    python benchmarks/bench_codec.py --frames 100000
+
+Each step is timed over --frames iterations, and its transient allocation
+is the tracemalloc peak of a single call, averaged over --samples calls.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from bench_bus import loadPackage
+
+# the exchange path as it was before codec: a list per request, a bytearray grown byte by
+# byte, and a hex dump concatenated and thrown away for every frame sent and received
+
+def legacyCalcMessage(values):
+  c = 0
+  b = bytearray()
+  for v in values:
+    c += v
+    b.append(v)
+  c = c & 0xFF
+  c = 0xFF - c
+  b.append(c)
+  return bytes(b)
+
+def legacyDumpMessage(msg):
+  s = ''
+  for c in msg:
+    if (isinstance(c, int)):
+      s += hex(c) + ' '
+    else:
+      s += hex(ord(c)) + ' '
+
+def legacySendReqStatus(modNumber, func, d1 = 0x33, d2 = 0x33):
+  return legacyCalcMessage([0x55, 0x82, func, modNumber, d1, d2])
+
+def legacyGetMsgData(ans):
+  return ans[4], ans[5]
+
+def legacyEvaluteMsgAsLong(ans):
+  (d1, d2) = legacyGetMsgData(ans)
+  return (d1 << 8) + d2
+
+def legacyExchange(mod, reply):
+  msg = legacySendReqStatus(mod, 0x31)
+  legacyDumpMessage(msg)
+  legacyDumpMessage(reply)
+  legacyGetMsgData(reply)
+  return msg
+
+def steps():
+  from domino_hub import codec
+  logger = logging.getLogger("domino_hub.dominoService")
+  reply = codec.encodeFrame(30, 0x30, 0x0B, 0x8A)
+  view = memoryview(bytearray(reply))
+  buffer = bytearray(codec.FRAME_LENGTH)
+
+  def codecExchange(mod, reply):
+    msg = codec.statusRequest(mod, 0x31)
+    dumping = codec.isDumping(logger)
+    if (dumping):
+      logger.debug(f"> {codec.dumpFrame(msg)}")
+    if (dumping):
+      logger.debug(f"< {codec.dumpFrame(reply)}")
+    codec.frameData(reply)
+    return msg
+
+  return {
+    "status_request": (lambda: legacySendReqStatus(30, 0x31), lambda: codec.encodeFrame(30, 0x31)),
+    "write_request": (lambda: legacySendReqStatus(23, 0x10, 0, 70), lambda: codec.encodeFrame(23, 0x10, 0, 70)),
+    "write_request_into": (lambda: legacySendReqStatus(23, 0x10, 0, 70), lambda: codec.encodeFrameInto(buffer, 0, 23, 0x10, 0, 70)),
+    "dump": (lambda: legacyDumpMessage(reply), lambda: codec.isDumping(logger) and codec.dumpFrame(reply)),
+    "decode_value": (lambda: legacyEvaluteMsgAsLong(view), lambda: codec.frameValue(view)),
+    "exchange_path": (lambda: legacyExchange(30, reply), lambda: codecExchange(30, reply)),
+  }
+
+def timePerFrame(step, frames):
+  start = time.perf_counter()
+  for _ in range(frames):
+    step()
+  return (time.perf_counter() - start) / frames * 1e9
+
+def bytesPerFrame(step, samples):
+  step()
+  total = 0
+  tracemalloc.start()
+  try:
+    for _ in range(samples):
+      current = tracemalloc.get_traced_memory()[0]
+      tracemalloc.reset_peak()
+      step()
+      total += tracemalloc.get_traced_memory()[1] - current
+  finally:
+    tracemalloc.stop()
+  return total / samples
+
+def main():
+  parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+  parser.add_argument("--frames", type = int, default = 100000)
+  parser.add_argument("--samples", type = int, default = 1000)
+  args = parser.parse_args()
+
+  loadPackage()
+  results = {}
+  for name, (legacy, current) in steps().items():
+    results[name] = {
+      "legacy_ns": round(timePerFrame(legacy, args.frames), 1),
+      "codec_ns": round(timePerFrame(current, args.frames), 1),
+      "legacy_bytes": round(bytesPerFrame(legacy, args.samples), 1),
+      "codec_bytes": round(bytesPerFrame(current, args.samples), 1),
+    }
+  print(json.dumps({"config": vars(args), "results": results}, indent = 2))
+
+if __name__ == "__main__":
+  main()
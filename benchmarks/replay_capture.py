@@ -0,0 +1,95 @@
+"""Replay a recorded bus capture through the decoder, the bus monitor and the scheduler.
+
+Run from the repository root:
+
+    python benchmarks/replay_capture.py capture.bin --speed 0 --profile
+
+The frames other modules and masters sent are fed back through a replay
+transport into a service with the bus monitor on, with the original timing
+divided by --speed (0 replays as fast as it can) and pauses cut to --max-gap.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import cProfile
+import json
+import pstats
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from bench_bus import loadPackage
+
+async def replay(args):
+  from domino_hub.devicemap import DeviceMap
+  from domino_hub.dominoService import DominoService
+  from domino_hub.recorder import ReplayTransport
+  transport = ReplayTransport(args.capture, args.speed, args.max_gap)
+  svc = DominoService(args.capture, None, deviceMap = DeviceMap(), transport = transport)
+  notifications = 0
+
+  def onStatus(*statuses):
+    nonlocal notifications
+    notifications += 1
+
+  for device in svc.deviceMap.devices():
+    svc.scheduler.register([device], onStatus)
+  svc.listen(True)
+  start = time.perf_counter()
+  await svc.connect()
+  if (args.poll):
+    svc.scheduler.start()
+  try:
+    await transport.finished.wait()
+  finally:
+    elapsed = time.perf_counter() - start
+    frames = len(transport.reader)
+    # read-backs still waiting for a reply the capture no longer has fail right away
+    transport.close()
+    await svc.disconnect()
+  stats = svc.stats()
+  return {
+    "frames": frames,
+    "seconds": elapsed,
+    "frames_per_second": frames / elapsed if elapsed > 0 else None,
+    "notifications": notifications,
+    "requests_sent": transport.sentCount,
+    "decoder": {name: stats[name] for name in ("frames", "resyncs", "checksum_errors", "discarded_bytes")},
+    "monitor": {name: stats[name] for name in ("unsolicited", "monitored_frames", "monitored_writes")},
+  }
+
+def main():
+  parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+  parser.add_argument("capture", help = "capture file written by recorder.BusRecorder")
+  parser.add_argument("--speed", type = float, default = 1.0, help = "replay speed factor, 0 for as fast as possible")
+  parser.add_argument("--max-gap", type = float, default = 5.0, help = "longest pause between two frames, in capture seconds")
+  parser.add_argument("--poll", action = "store_true", help = "run the scheduler during the replay")
+  parser.add_argument("--list", action = "store_true", help = "print the frames instead of replaying them")
+  parser.add_argument("--profile", action = "store_true", help = "print the functions the replay spent the most time in")
+  args = parser.parse_args()
+
+  loadPackage()
+  if (args.list):
+    from domino_hub.recorder import CaptureReader
+    reader = CaptureReader(args.capture)
+    try:
+      for record in reader:
+        print(record)
+    finally:
+      reader.close()
+    return
+
+  profiler = cProfile.Profile() if args.profile else None
+  if (profiler is not None):
+    profiler.enable()
+  result = asyncio.run(replay(args))
+  if (profiler is not None):
+    profiler.disable()
+  print(json.dumps(result, indent = 2))
+  if (profiler is not None):
+    pstats.Stats(profiler, stream = sys.stderr).sort_stats("cumulative").print_stats(25)
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import logging
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+# consecutive timeouts or NAKs before a module is considered dead
+BREAKER_THRESHOLD = 3
+# first retry of a dead module, doubled after every failed retry up to the maximum
+BREAKER_RETRY_MIN = 30
+BREAKER_RETRY_MAX = 600
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreakers:
+  """One circuit breaker per module: dead modules fail fast instead of costing
+  a full timeout on every request, and are retried only now and then."""
+
+  def __init__(self, threshold = BREAKER_THRESHOLD):
+    self.threshold = threshold
+    self._breakers = {}
+    self.rejectedCount = 0
+    # called with the module whenever it becomes unavailable or available again
+    self.onChange = None
+
+  def _breaker(self, mod):
+    breaker = self._breakers.get(mod)
+    if (breaker is None):
+      breaker = self._breakers[mod] = CircuitBreakers.Breaker()
+    return breaker
+
+  def allow(self, mod):
+    breaker = self._breakers.get(mod)
+    if (breaker is None or breaker.state == CLOSED):
+      return True
+    if (breaker.state == OPEN and time.monotonic() >= breaker.retryAt):
+      # let a single request through to see whether the module is back
+      breaker.state = HALF_OPEN
+      _LOGGER.debug(f"Retrying module {mod}")
+      return True
+    self.rejectedCount += 1
+    return False
+
+  def success(self, mod):
+    breaker = self._breakers.get(mod)
+    if (breaker is None):
+      return
+    changed = breaker.state != CLOSED
+    breaker.state = CLOSED
+    breaker.failures = 0
+    breaker.retryDelay = BREAKER_RETRY_MIN
+    if (changed):
+      _LOGGER.info(f"Module {mod} is answering again")
+      self._changed(mod)
+
+  def failure(self, mod):
+    breaker = self._breaker(mod)
+    breaker.failures += 1
+    if (breaker.state == HALF_OPEN):
+      breaker.retryDelay = min(breaker.retryDelay * 2, BREAKER_RETRY_MAX)
+      self._open(mod, breaker)
+    elif (breaker.state == CLOSED and breaker.failures >= self.threshold):
+      _LOGGER.warning(f"Module {mod} failed {breaker.failures} requests in a row, marking it unavailable")
+      self._open(mod, breaker)
+      self._changed(mod)
+
+  def _open(self, mod, breaker):
+    breaker.state = OPEN
+    breaker.retryAt = time.monotonic() + breaker.retryDelay
+    _LOGGER.debug(f"Module {mod} unavailable, next retry in {breaker.retryDelay}s")
+
+  def _changed(self, mod):
+    if (self.onChange is not None):
+      self.onChange(mod)
+
+  def abandon(self, mod):
+    # the request never got a verdict (cancelled, line down), the next one may retry
+    breaker = self._breakers.get(mod)
+    if (breaker is not None and breaker.state == HALF_OPEN):
+      breaker.state = OPEN
+      breaker.retryAt = time.monotonic()
+
+  def isAvailable(self, mod):
+    breaker = self._breakers.get(mod)
+    return breaker is None or breaker.state == CLOSED
+
+  def unavailable(self):
+    return sorted(mod for (mod, breaker) in self._breakers.items() if breaker.state != CLOSED)
+
+  def reset(self):
+    unavailable = self.unavailable()
+    self._breakers.clear()
+    for mod in unavailable:
+      self._changed(mod)
+
+  def stats(self):
+    return {
+      "unavailable_modules": self.unavailable(),
+      "breaker_rejected": self.rejectedCount,
+    }
+
+  class Breaker:
+    def __init__(self):
+      self.state = CLOSED
+      self.failures = 0
+      self.retryAt = 0
+      self.retryDelay = BREAKER_RETRY_MIN
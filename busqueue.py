@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+from collections import deque
+
+_LOGGER = logging.getLogger(__name__)
+
+PRIORITY_COMMAND = 0
+PRIORITY_POLL = 1
+
+# after this many commands in a row a waiting poll gets the bus
+MAX_COMMAND_BURST = 4
+LATENCY_SAMPLES = 1000
+
+def priorityOf(msg):
+  return PRIORITY_COMMAND if msg[2] == 0x10 else PRIORITY_POLL
+
+def percentile(samples, pct):
+  if (len(samples) == 0):
+    return None
+  ordered = sorted(samples)
+  idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+  return ordered[idx]
+
+class BusQueue:
+  """Grants the bus to one exchange at a time, commands before polls."""
+
+  def __init__(self, maxCommandBurst = MAX_COMMAND_BURST):
+    self.maxCommandBurst = maxCommandBurst
+    self._waiters = {PRIORITY_COMMAND: deque(), PRIORITY_POLL: deque()}
+    self._busy = False
+    self._idle = asyncio.Event()
+    self._idle.set()
+    self._commandBurst = 0
+    self.latencies = {
+      PRIORITY_COMMAND: deque(maxlen = LATENCY_SAMPLES),
+      PRIORITY_POLL: deque(maxlen = LATENCY_SAMPLES),
+    }
+
+  def __len__(self):
+    return len(self._waiters[PRIORITY_COMMAND]) + len(self._waiters[PRIORITY_POLL])
+
+  async def acquire(self, priority):
+    if (not self._busy and len(self) == 0):
+      self._granted(priority)
+      return
+    fut = asyncio.get_running_loop().create_future()
+    self._waiters[priority].append(fut)
+    try:
+      await fut
+    except asyncio.CancelledError:
+      if (fut.done() and not fut.cancelled()):
+        # the bus was handed to us right before the cancellation
+        self.release()
+      else:
+        self._waiters[priority].remove(fut)
+      raise
+
+  def release(self):
+    while True:
+      priority = self._next()
+      if (priority is None):
+        self._busy = False
+        self._idle.set()
+        return
+      fut = self._waiters[priority].popleft()
+      if (not fut.done()):
+        self._granted(priority)
+        fut.set_result(None)
+        return
+
+  def _next(self):
+    commands = self._waiters[PRIORITY_COMMAND]
+    polls = self._waiters[PRIORITY_POLL]
+    if (len(commands) > 0 and (len(polls) == 0 or self._commandBurst < self.maxCommandBurst)):
+      return PRIORITY_COMMAND
+    if (len(polls) > 0):
+      return PRIORITY_POLL
+    return None
+
+  def _granted(self, priority):
+    self._busy = True
+    self._idle.clear()
+    if (priority == PRIORITY_COMMAND):
+      self._commandBurst += 1
+    else:
+      self._commandBurst = 0
+
+  @contextlib.asynccontextmanager
+  async def slot(self, priority):
+    await self.acquire(priority)
+    try:
+      yield
+    finally:
+      self.release()
+
+  async def join(self):
+    await self._idle.wait()
+
+  def record(self, priority, latency):
+    self.latencies[priority].append(latency)
+
+  def stats(self):
+    commands = self.latencies[PRIORITY_COMMAND]
+    polls = self.latencies[PRIORITY_POLL]
+    return {
+      "queued": len(self),
+      "command_latency_p50": percentile(commands, 50),
+      "command_latency_p99": percentile(commands, 99),
+      "poll_latency_p50": percentile(polls, 50),
+      "poll_latency_p99": percentile(polls, 99),
+    }
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import logging
+import time
+
+from .framer import FRAME_LENGTH
+
+_LOGGER = logging.getLogger(__name__)
+
+CACHE_LIGHT = "light"
+CACHE_DIMMER = "dimmer"
+CACHE_MOTOR = "motor"
+CACHE_ROOM_TEMPERATURE = "room_temperature"
+CACHE_METEO = "meteo"
+
+# seconds a register stays fresh, which is also how often the scheduler reads it while its
+# device is idle: lights and dimmers follow people around, a motor at rest or a room
+# temperature hardly ever changes, a moving motor is polled fast whatever its TTL
+DEFAULT_TTLS = {
+  CACHE_LIGHT: 30,
+  CACHE_DIMMER: 30,
+  CACHE_MOTOR: 120,
+  CACHE_ROOM_TEMPERATURE: 60,
+  CACHE_METEO: 30,
+}
+
+# a value up to this many TTLs old is still served, while it is refreshed in the background
+STALE_FACTOR = 2
+# snapshot entries older than this are not worth restoring, the house has moved on
+SNAPSHOT_MAX_AGE = 900
+
+FRESH = "fresh"
+STALE = "stale"
+EXPIRED = "expired"
+
+class RegisterCache:
+  """Last frame read from each (module, function) register, timestamped
+  with the monotonic clock."""
+
+  def __init__(self, ttls = None):
+    self.ttls = dict(DEFAULT_TTLS)
+    if (ttls is not None):
+      self.ttls.update(ttls)
+    self._entries = {}
+    self.hits = 0
+    self.staleHits = 0
+    self.misses = 0
+
+  def __contains__(self, key):
+    return key in self._entries
+
+  def __getitem__(self, key):
+    return self._entries[key][0]
+
+  def keys(self):
+    return self._entries.keys()
+
+  def ttl(self, cacheClass):
+    return self.ttls.get(cacheClass, DEFAULT_TTLS[CACHE_LIGHT])
+
+  def age(self, key):
+    entry = self._entries.get(key)
+    return time.monotonic() - entry[1] if entry is not None else None
+
+  def lookup(self, key, cacheClass):
+    entry = self._entries.get(key)
+    if (entry is None):
+      self.misses += 1
+      return EXPIRED, None
+    ttl = self.ttl(cacheClass)
+    age = time.monotonic() - entry[1]
+    if (age <= ttl):
+      self.hits += 1
+      return FRESH, entry[0]
+    if (age <= ttl * STALE_FACTOR):
+      self.staleHits += 1
+      return STALE, entry[0]
+    self.misses += 1
+    return EXPIRED, None
+
+  def peek(self, key):
+    entry = self._entries.get(key)
+    return entry[0] if entry is not None else None
+
+  def store(self, key, frame, timestamp = None):
+    self._entries[key] = (frame, time.monotonic() if timestamp is None else timestamp)
+
+  def patch(self, key, d1, d2):
+    # replace the data bytes of a cached frame, keeping its timestamp so the
+    # next scheduled read still reconciles it with the device
+    entry = self._entries.get(key)
+    if (entry is None):
+      return False
+    frame = bytearray(entry[0])
+    frame[4] = d1
+    frame[5] = d2
+    frame[6] = 0xFF - (sum(frame[:6]) & 0xFF)
+    self._entries[key] = (bytes(frame), entry[1])
+    return True
+
+  def invalidate(self, key):
+    self._entries.pop(key, None)
+
+  def snapshot(self):
+    # ages rather than timestamps, the monotonic clock starts over with the process
+    now = time.monotonic()
+    return [[mod, func, bytes(frame).hex(), round(now - timestamp, 3)] for ((mod, func), (frame, timestamp)) in self._entries.items()]
+
+  def restore(self, entries, elapsed = 0, maxAge = SNAPSHOT_MAX_AGE):
+    # elapsed is the time since the snapshot was taken, values read since then are kept
+    now = time.monotonic()
+    restored = []
+    for (mod, func, frame, age) in entries:
+      key = (mod, func)
+      age += elapsed
+      if (age > maxAge or key in self._entries):
+        continue
+      try:
+        frame = bytes.fromhex(frame)
+      except (TypeError, ValueError):
+        continue
+      if (len(frame) != FRAME_LENGTH):
+        continue
+      self._entries[key] = (frame, now - age)
+      restored.append(key)
+    return restored
+
+  def stats(self):
+    lookups = self.hits + self.staleHits + self.misses
+    return {
+      "cache_entries": len(self._entries),
+      "cache_hits": self.hits,
+      "cache_stale_hits": self.staleHits,
+      "cache_misses": self.misses,
+      "cache_hit_ratio": (self.hits + self.staleHits) / lookups if lookups > 0 else None,
+    }
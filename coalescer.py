@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+class LatestWins:
+  """Serializes the writes of one device, newest target first. While a write
+  is in flight, a newer target replaces the one waiting behind it, so there is
+  at most one write on the bus and one queued however fast targets come in.
+  Callers whose target was replaced get the result of the write that did go out."""
+
+  def __init__(self, write, name = None):
+    self._write = write
+    self.name = name
+    self._task = None
+    # [target, future] of the write waiting for the one in flight
+    self._pending = None
+    self.supersededCount = 0
+
+  @property
+  def busy(self):
+    return self._task is not None and not self._task.done()
+
+  async def submit(self, target):
+    loop = asyncio.get_running_loop()
+    if (self._pending is not None):
+      self.supersededCount += 1
+      _LOGGER.debug(f"{self.name}: {self._pending[0]} superseded by {target}")
+      self._pending[0] = target
+    else:
+      self._pending = [target, loop.create_future()]
+    future = self._pending[1]
+    if (not self.busy):
+      self._task = loop.create_task(self._drain())
+    # a caller giving up does not take the write the others wait for with it
+    return await asyncio.shield(future)
+
+  def discard(self):
+    # a stop or a move in another direction makes the waiting target stale, its callers get None
+    if (self._pending is None):
+      return
+    _, future = self._pending
+    self._pending = None
+    if (not future.done()):
+      future.set_result(None)
+
+  async def _drain(self):
+    while (self._pending is not None):
+      target, future = self._pending
+      self._pending = None
+      try:
+        result = await self._write(target)
+      except asyncio.CancelledError:
+        future.cancel()
+        if (self._pending is not None):
+          self._pending[1].cancel()
+          self._pending = None
+        raise
+      except Exception as e:
+        if (not future.done()):
+          future.set_exception(e)
+      else:
+        if (not future.done()):
+          future.set_result(result)
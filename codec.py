@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import logging
+import struct
+
+from .framer import FRAME_HEADER, FRAME_LENGTH
+
+_LOGGER = logging.getLogger(__name__)
+
+# [0x55, 0x82, function, module, d1, d2, checksum], the checksum makes the frame sum to 0xFF
+FRAME_ADDRESS = 0x82
+FRAME = struct.Struct("7B")
+# status reads carry this in both data bytes
+STATUS_DATA = 0x33
+FUNC_READ_INPUTS = 0x30
+FUNC_READ_OUTPUTS = 0x31
+FUNC_WRITE = 0x10
+
+def checksum(func, mod, d1, d2):
+  return 0xFF - ((FRAME_HEADER + FRAME_ADDRESS + func + mod + d1 + d2) & 0xFF)
+
+def _statusRequests(func):
+  return [FRAME.pack(FRAME_HEADER, FRAME_ADDRESS, func, mod, STATUS_DATA, STATUS_DATA, checksum(func, mod, STATUS_DATA, STATUS_DATA)) for mod in range(256)]
+
+# every status read there can be, indexed by module, the poll loop only ever looks them up
+_READ_INPUTS = _statusRequests(FUNC_READ_INPUTS)
+_READ_OUTPUTS = _statusRequests(FUNC_READ_OUTPUTS)
+
+def statusRequest(mod, func):
+  return _READ_OUTPUTS[mod] if func == FUNC_READ_OUTPUTS else _READ_INPUTS[mod]
+
+def encodeFrame(mod, func, d1 = STATUS_DATA, d2 = STATUS_DATA):
+  if (d1 == STATUS_DATA and d2 == STATUS_DATA and (func == FUNC_READ_OUTPUTS or func == FUNC_READ_INPUTS)):
+    return statusRequest(mod, func)
+  return FRAME.pack(FRAME_HEADER, FRAME_ADDRESS, func, mod, d1, d2, checksum(func, mod, d1, d2))
+
+def encodeFrameInto(buffer, offset, mod, func, d1 = STATUS_DATA, d2 = STATUS_DATA):
+  # for callers that keep their own buffer, nothing is allocated
+  FRAME.pack_into(buffer, offset, FRAME_HEADER, FRAME_ADDRESS, func, mod, d1, d2, checksum(func, mod, d1, d2))
+  return FRAME_LENGTH
+
+def calcMessage(values):
+  # header, address, function, module and the two data bytes, checksum appended
+  return FRAME.pack(*values, 0xFF - (sum(values) & 0xFF))
+
+# replies are read in place, from bytes or from the decoder's memoryview alike
+
+def frameData(frame):
+  return frame[4], frame[5]
+
+def frameValue(frame):
+  return (frame[4] << 8) | frame[5]
+
+def isNak(frame):
+  return frame[2] == 0x0 and (frame[5] == 0xf0 or frame[5] == 0xff)
+
+def isStatusRequest(frame):
+  # a status read from another master, as encodeFrame builds it, carries no data
+  return (frame[2] == FUNC_READ_OUTPUTS or frame[2] == FUNC_READ_INPUTS) and frame[4] == STATUS_DATA and frame[5] == STATUS_DATA
+
+def isDumping(logger):
+  # follows runtime level changes like isEnabledFor, without the thread-local lookup it does per call
+  return logger.getEffectiveLevel() <= logging.DEBUG
+
+def dumpFrame(frame):
+  # only worth the string when someone reads it, callers check isDumping first
+  return bytes(frame).hex(" ")
@@ -1,49 +1,152 @@
 from __future__ import annotations
 
+import logging
+
 import voluptuous as vol
 
 from homeassistant import config_entries
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.data_entry_flow import FlowResult
 import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers import selector
+
+from .devicemap import DeviceMap
+from .discovery import BusDiscovery, ConnectionCheck
+from .dominoService import DominoService
+from .storage import async_save_discovery
+from .cache import DEFAULT_TTLS, CACHE_DIMMER, CACHE_LIGHT, CACHE_METEO, CACHE_MOTOR, CACHE_ROOM_TEMPERATURE
+from .const import (
+    DOMAIN,
+    CONF_COM_PORT,
+    CONF_COM_BAUD,
+    COM_BAUD_DEFAULT,
+    CONF_RTT_MS,
+    CONF_TTL_LIGHT,
+    CONF_TTL_DIMMER,
+    CONF_TTL_MOTOR,
+    CONF_TTL_ROOM_TEMPERATURE,
+    CONF_TTL_METEO,
+    CONF_DEVICE_MAP,
+    CONF_DEVICE_MAP_FILE,
+    CONF_DISCOVER,
+    CONF_ALLOW_SILENT,
+    CONF_MONITOR,
+    CONF_CAPTURE_FILE,
+    CONF_BUSES,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+TTL_OPTIONS = {
+    CONF_TTL_LIGHT: CACHE_LIGHT,
+    CONF_TTL_DIMMER: CACHE_DIMMER,
+    CONF_TTL_MOTOR: CACHE_MOTOR,
+    CONF_TTL_ROOM_TEMPERATURE: CACHE_ROOM_TEMPERATURE,
+    CONF_TTL_METEO: CACHE_METEO,
+}
+
+
+def cacheTimes(options) -> dict:
+    """Map the TTL options of an entry to register cache classes."""
+    return {cacheClass: options[conf] for conf, cacheClass in TTL_OPTIONS.items() if conf in options}
+
+
+async def async_discover(hass: HomeAssistant, api: DominoService) -> dict:
+    """Scan the bus behind a service, store and return what answered."""
+    discovery = BusDiscovery(api)
+    result = await discovery.scan()
+    result["deviceMap"] = discovery.deviceMapDraft()
+    await async_save_discovery(hass, api.com_port, result)
+    return result
+
+
+async def _async_check_connection(comPort: str, comBaud: int, allowSilent: bool = False) -> dict | None:
+    """Entry data for a port that carries traffic, at the baud rate it does, None otherwise.
+
+    A port that opens but stays silent at every baud rate, which is also what a wrong baud rate
+    looks like, is only accepted at the configured rate when allowSilent confirms it.
+    """
+    check = ConnectionCheck(comPort)
+    try:
+        heard = await check.run(comBaud)
+    except (OSError, ValueError) as e:
+        _LOGGER.warning(f"Unable to open {comPort}: {e}")
+        return None
+    if not heard:
+        if not allowSilent:
+            return None
+        _LOGGER.warning(f"No bus traffic on {comPort}, setting it up at {comBaud} baud as confirmed")
+        return {CONF_COM_PORT: comPort, CONF_COM_BAUD: comBaud}
+    data = {CONF_COM_PORT: comPort, CONF_COM_BAUD: check.baudRate}
+    if check.rtt is not None:
+        data[CONF_RTT_MS] = round(check.rtt * 1000, 1)
+    return data
+
+
+def _validBuses(buses) -> bool:
+    """Check the extra buses option: a list of mappings with a port and a valid inline map."""
+    if buses is None:
+        return True
+    if not isinstance(buses, list):
+        return False
+    for bus in buses:
+        if not isinstance(bus, dict) or not isinstance(bus.get(CONF_COM_PORT), str):
+            return False
+        try:
+            if bus.get(CONF_DEVICE_MAP) is not None:
+                DeviceMap(bus[CONF_DEVICE_MAP])
+        except ValueError:
+            return False
+    return True
 
-from .const import DOMAIN, CONF_COM_PORT, CONF_COM_BAUD, COM_BAUD_DEFAULT
 
 class DominoHubConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for Domino Hub."""
 
     VERSION = 1
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: config_entries.ConfigEntry) -> DominoHubOptionsFlow:
+        """Get the options flow for this handler."""
+        return DominoHubOptionsFlow()
+
     async def async_step_user(self, user_input=None) -> FlowResult:
         """Handle the initial step."""
         errors = {}
 
         if user_input is not None:
-            # TODO: Validate connection here
-            # Example:
-            # api = DominoAPI(user_input["comPort"], user_input["comBaud"])
-            # if not await api.test_connection():
-            #     errors["base"] = "cannot_connect"
-            # else:
-            #     return self.async_create_entry(
-            #         title="Domino Hub",
-            #         data=user_input,
-            #     )
-            data = {
-                CONF_COM_PORT: user_input[CONF_COM_PORT],
-                CONF_COM_BAUD: user_input[CONF_COM_BAUD],
-            }
-
-            # For now, accept everything
-            return self.async_create_entry(
-                title="Domino Hub",
-                data=data,
+            data = await _async_check_connection(
+                user_input[CONF_COM_PORT], user_input[CONF_COM_BAUD], user_input.get(CONF_ALLOW_SILENT, False)
             )
+            if data is None:
+                errors["base"] = "cannot_connect"
+
+            if not errors and user_input.get(CONF_DISCOVER):
+                # the scan and its device map draft are stored for review, not applied: off dimmers
+                # and motor containers answer like light containers, a draft cannot tell them apart
+                api = DominoService(data[CONF_COM_PORT], data[CONF_COM_BAUD])
+                await api.connect()
+                try:
+                    if api.connection.isConnected:
+                        await async_discover(self.hass, api)
+                    else:
+                        errors["base"] = "cannot_connect"
+                finally:
+                    await api.disconnect()
+
+            if not errors:
+                return self.async_create_entry(
+                    title="Domino Hub",
+                    data=data,
+                )
 
         schema = vol.Schema(
             {
                 vol.Required(CONF_COM_PORT, default='/dev/ttyUSB0'): cv.string,
-                vol.Optional(CONF_COM_BAUD, default=COM_BAUD_DEFAULT): cv.positive_int
+                vol.Optional(CONF_COM_BAUD, default=COM_BAUD_DEFAULT): cv.positive_int,
+                vol.Optional(CONF_DISCOVER, default=False): cv.boolean,
+                vol.Optional(CONF_ALLOW_SILENT, default=False): cv.boolean,
             }
         )
 
@@ -52,3 +155,42 @@ class DominoHubConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             data_schema=schema,
             errors=errors,
         )
+
+
+class DominoHubOptionsFlow(config_entries.OptionsFlow):
+    """Handle the register cache and device map options for Domino Hub."""
+
+    async def async_step_init(self, user_input=None) -> FlowResult:
+        """Manage the cache times and the device map."""
+        errors = {}
+
+        if user_input is not None:
+            try:
+                if user_input.get(CONF_DEVICE_MAP) is not None:
+                    DeviceMap(user_input[CONF_DEVICE_MAP])
+            except ValueError:
+                errors[CONF_DEVICE_MAP] = "invalid_device_map"
+            if not _validBuses(user_input.get(CONF_BUSES)):
+                errors[CONF_BUSES] = "invalid_buses"
+            if not errors:
+                return self.async_create_entry(data=user_input)
+
+        options = self.config_entry.options
+        fields = {
+            vol.Optional(conf, default=options.get(conf, DEFAULT_TTLS[cacheClass])): cv.positive_int
+            for conf, cacheClass in TTL_OPTIONS.items()
+        }
+        fields[vol.Optional(CONF_MONITOR, default=options.get(CONF_MONITOR, False))] = cv.boolean
+        # left empty, nothing is recorded
+        fields[vol.Optional(CONF_CAPTURE_FILE, description={"suggested_value": options.get(CONF_CAPTURE_FILE)})] = cv.string
+        # left empty, the built-in device map is used
+        fields[vol.Optional(CONF_DEVICE_MAP_FILE, description={"suggested_value": options.get(CONF_DEVICE_MAP_FILE)})] = cv.string
+        fields[vol.Optional(CONF_DEVICE_MAP, description={"suggested_value": options.get(CONF_DEVICE_MAP)})] = selector.ObjectSelector()
+        # more serial ports behind this entry, each with its own device map
+        fields[vol.Optional(CONF_BUSES, description={"suggested_value": options.get(CONF_BUSES)})] = selector.ObjectSelector()
+
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(fields),
+            errors=errors,
+        )
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+from .exceptions import BusConnectionError
+
+_LOGGER = logging.getLogger(__name__)
+
+RECONNECT_MIN_DELAY = 1
+RECONNECT_MAX_DELAY = 60
+# the line is considered stalled after STALL_TIMEOUTS timeouts in a row from at least two different
+# devices (a meteo station alone reads four addresses), with not a single frame heard for STALL_SILENCE
+# seconds, other masters and modules included
+STALL_TIMEOUTS = 3
+STALL_SILENCE = 30
+
+class ConnectionManager:
+  """Keeps one transport open for the lifetime of the service and reopens
+  it with exponential backoff when it is lost or stops answering."""
+
+  def __init__(self, transport):
+    self.transport = transport
+    transport.onLost = self.connectionLost
+    self._connected = asyncio.Event()
+    self._task = None
+    self._closing = False
+    self._timeouts = 0
+    self._timedOutDevices = set()
+    self._connectedAt = None
+    # module -> the device reading it, so the modules of one device count once, the module itself by default
+    self.deviceOf = None
+    self.connectCount = 0
+    self.lostCount = 0
+
+  @property
+  def isConnected(self):
+    return self._connected.is_set()
+
+  async def start(self):
+    self._closing = False
+    try:
+      await self._open()
+    except Exception as e:
+      _LOGGER.warning(f"Unable to open bus connection: {e}")
+      self._scheduleReconnect()
+
+  async def _open(self):
+    await self.transport.connect()
+    self._timeouts = 0
+    self._timedOutDevices.clear()
+    self._connectedAt = time.monotonic()
+    self.connectCount += 1
+    self._connected.set()
+    _LOGGER.info("Bus connection established")
+
+  async def get(self, timeout):
+    if (not self._connected.is_set()):
+      if (self._closing):
+        raise BusConnectionError("bus connection closed")
+      try:
+        async with asyncio.timeout(timeout):
+          await self._connected.wait()
+      except TimeoutError:
+        raise BusConnectionError("bus not connected") from None
+    return self.transport
+
+  def exchangeSucceeded(self):
+    self._timeouts = 0
+    self._timedOutDevices.clear()
+
+  def exchangeTimedOut(self, mod):
+    # a single dead device times out forever, a stalled line times out for everyone and hears nothing
+    self._timeouts += 1
+    device = self.deviceOf(mod) if self.deviceOf is not None else None
+    self._timedOutDevices.add(device if device is not None else mod)
+    if (self._timeouts >= STALL_TIMEOUTS and len(self._timedOutDevices) > 1 and self.silence() >= STALL_SILENCE):
+      self.connectionLost(BusConnectionError(f"no reply to the last {self._timeouts} requests, nothing heard for {self.silence():.0f}s"))
+
+  def silence(self):
+    # seconds since the last frame of any kind, or since the connection was opened
+    heard = max(self._connectedAt or 0, self.transport.lastFrameTime or 0)
+    return time.monotonic() - heard
+
+  def connectionLost(self, exc):
+    if (not self._connected.is_set() or self._closing):
+      return
+    _LOGGER.warning(f"Bus connection lost: {exc}")
+    self.lostCount += 1
+    self._connected.clear()
+    self.transport.close()
+    self._scheduleReconnect()
+
+  def _scheduleReconnect(self):
+    if (self._task is None or self._task.done()):
+      self._task = asyncio.get_running_loop().create_task(self._reconnect())
+
+  async def _reconnect(self):
+    delay = RECONNECT_MIN_DELAY
+    while not self._closing:
+      await asyncio.sleep(delay)
+      try:
+        await self._open()
+        return
+      except Exception as e:
+        _LOGGER.debug(f"Reconnect failed, retrying in {delay}s: {e}")
+        delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+  async def close(self):
+    self._closing = True
+    if (self._task is not None):
+      self._task.cancel()
+      try:
+        await self._task
+      except asyncio.CancelledError:
+        pass
+      self._task = None
+    self._connected.clear()
+    self.transport.close()
+    _LOGGER.info("Bus connection closed")
+
+  def stats(self):
+    return {
+      "connected": self.isConnected,
+      "connects": self.connectCount,
+      "connection_lost": self.lostCount,
+    }
@@ -5,4 +5,38 @@ DOMAIN = "domino_hub"
 CONF_COM_PORT = "comPort"
 CONF_COM_BAUD = "comBaud"
 
-COM_BAUD_DEFAULT = 19200
\ No newline at end of file
+COM_BAUD_DEFAULT = 19200
+
+# round trip of a status read in milliseconds, measured by the config flow connection check,
+# absent when no module answered in time
+CONF_RTT_MS = "rttMs"
+
+# seconds a cached register stays fresh, and so between idle polls of it, per device class
+CONF_TTL_LIGHT = "ttlLight"
+CONF_TTL_DIMMER = "ttlDimmer"
+CONF_TTL_MOTOR = "ttlMotor"
+CONF_TTL_ROOM_TEMPERATURE = "ttlRoomTemperature"
+CONF_TTL_METEO = "ttlMeteo"
+
+# device map, inline in the options or in a YAML file relative to the config directory
+CONF_DEVICE_MAP = "deviceMap"
+CONF_DEVICE_MAP_FILE = "deviceMapFile"
+
+# scan the bus for modules while setting up the entry, what answered and a device map
+# draft are stored for review, the entry keeps its device map
+CONF_DISCOVER = "discover"
+
+# set the entry up on a port that opens but carries no bus traffic, modules powered off
+# or none in reach of the connection check, instead of reporting cannot_connect
+CONF_ALLOW_SILENT = "allowSilent"
+
+# update entities from frames other masters put on the bus, polling only reconciles
+CONF_MONITOR = "monitor"
+
+# more buses on the same entry: [{comPort, comBaud, id, deviceMap, deviceMapFile}], the first
+# bus is the one of the entry data and keeps the built-in device map when it has none
+CONF_BUSES = "buses"
+CONF_BUS_ID = "id"
+
+# record every frame on the first bus to this ring capture file, relative to the config directory
+CONF_CAPTURE_FILE = "captureFile"
@@ -4,18 +4,26 @@ import logging
 from typing import Any
 
 from homeassistant.components.cover import (
+    ATTR_CURRENT_POSITION,
     CoverEntity,
     CoverState,
     CoverDeviceClass,
     CoverEntityFeature
 )
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_call_later
 
-from .dominoService import DominoService, MotorContainer, Motor
+from .dominoService import DominoService, Motor
+from .hub import DominoHub
+from .travel import CLOSING, OPENING
 
 _LOGGER = logging.getLogger(__name__)
 
+# seconds between position estimates written while a cover moves, no bus traffic involved
+TRACK_INTERVAL = 1
+ATTR_OPEN_TIME = "open_time"
+ATTR_CLOSE_TIME = "close_time"
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -24,19 +32,13 @@ async def async_setup_entry(
 ) -> None:
     """Set up Domino covers from a config entry."""
 
-    # Retrieve the shared API instance created in __init__.py
-    domService: DominoService = entry.runtime_data
-
-    motor1 = MotorContainer(17)
-    motor2 = MotorContainer(19)
-    motor3 = MotorContainer(20)
+    # Retrieve the shared hub created in __init__.py
+    hub: DominoHub = entry.runtime_data
 
     tende = [
-        DominoAwningEntity(domService, Motor(motor1, 1), "Tenda - Cucina", "tenda_cucina"),
-        DominoAwningEntity(domService, Motor(motor1, 2), "Tenda - Soggiorno", "tenda_soggiorno"),
-        DominoAwningEntity(domService, Motor(motor2, 2), "Tenda - Camera Matrimoniale", "tenda_camera_matrimoniale"),
-        DominoAwningEntity(domService, Motor(motor3, 1), "Tenda - Camera Francesco sx", "tenda_camera_francesco_sx"),
-        DominoAwningEntity(domService, Motor(motor3, 2), "Tenda - Camera Francesco dx", "tenda_camera_francesco_dx"),
+        DominoAwningEntity(domService, item.device, item.name, item.deviceId)
+        for domService in hub.buses
+        for item in domService.deviceMap.covers
     ]
 
     async_add_entities(tende)
@@ -49,6 +51,7 @@ class DominoCoverEntity(CoverEntity):
         CoverEntityFeature.OPEN | CoverEntityFeature.CLOSE | CoverEntityFeature.SET_POSITION
     )
     #_attr_device_class = CoverDeviceClass.AWNING
+    _attr_should_poll = False
 
     def __init__(self, domService: DominoService, motor: Motor, name: str, deviceId: str, deviceName: str = None) -> None:
         self._domService = domService
@@ -58,13 +61,14 @@ class DominoCoverEntity(CoverEntity):
         self._attr_is_closed = None  # unknown at start, will be updated in async_update
         self._attr_is_closing = None
         self._attr_is_opening = None
+        self._cancelTracking = None
 
         # Unique ID based on motor address
-        self._attr_unique_id = f"domino_motor_{motor.mod}_{motor.num}"
+        self._attr_unique_id = domService.uniqueId(f"domino_motor_{motor.mod}_{motor.num}")
 
         # Optional: group all motors under one device
         self._attr_device_info = {
-            "identifiers": {("domino_hub", deviceId)},
+            "identifiers": {("domino_hub", domService.uniqueId(deviceId))},
             "name": deviceName if deviceName is not None else "Domino Hub - Motors",
             "manufacturer": "Domino",
             "model": "Domino Serial Hub",
@@ -90,15 +94,71 @@ class DominoCoverEntity(CoverEntity):
         """Fetch the latest state from the device."""
         try:
             status = await self._getCoverStatus()
-
-            _LOGGER.debug(f"Update {self._attr_name} status: {status}")
-
-            #self._attr_is_closed = status == MotorContainer.MotorStatus.MotorMovement.STOPPED
-            self._attr_is_opening = status == MotorContainer.MotorStatus.MotorMovement.OPENING
-            self._attr_is_closing = status == MotorContainer.MotorStatus.MotorMovement.CLOSING
-            #self._attr_current_cover_position = status
+            self._updateStatus(status)
         except Exception as e:
             _LOGGER.error(f"Error updating {self._attr_name}: {e}")
+
+    @callback
+    def _onStatus(self, status) -> None:
+        """Handle a status pushed by the bus scheduler."""
+        self._updateStatus(status)
+        self.async_write_ha_state()
+
+    @callback
+    def _onAvailable(self, available: bool) -> None:
+        """Handle the module of this entity going offline or coming back."""
+        self._attr_available = available
+        self.async_write_ha_state()
+
+    def _updateStatus(self, status) -> None:
+        _LOGGER.debug(f"Update {self._attr_name} status: {status}")
+
+        self._motor.observe(status)
+        self._applyTravel()
+        if self.hass is not None:
+            self._scheduleTracking()
+
+    def _applyTravel(self) -> None:
+        """Copy the estimated position and movement to the entity state."""
+        travel = self._motor.travel
+        position = travel.positionAt()
+        self._attr_is_opening = travel.direction == OPENING
+        self._attr_is_closing = travel.direction == CLOSING
+        if position is None:
+            return
+        self._attr_current_cover_position = round(position)
+        self._attr_is_closed = self._attr_current_cover_position == 0
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Travel times the position is estimated with."""
+        return {
+            ATTR_OPEN_TIME: self._motor.travel.openTime,
+            ATTR_CLOSE_TIME: self._motor.travel.closeTime,
+        }
+
+    def _scheduleTracking(self) -> None:
+        if self._cancelTracking is not None:
+            self._cancelTracking()
+            self._cancelTracking = None
+        # the scheduler polls a moving motor until it stops, in between the estimate moves on its own
+        arrival = self._motor.travel.arrival()
+        if arrival is None or arrival <= 0:
+            return
+        self._cancelTracking = async_call_later(self.hass, min(TRACK_INTERVAL, arrival), self._onTrack)
+
+    @callback
+    def _onTrack(self, _now) -> None:
+        self._cancelTracking = None
+        self._applyTravel()
+        self.async_write_ha_state()
+        self._scheduleTracking()
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Stop tracking the position."""
+        if self._cancelTracking is not None:
+            self._cancelTracking()
+            self._cancelTracking = None
     
     async def async_added_to_hass(self):
         """Called when entity is added to Home Assistant."""
@@ -109,32 +169,44 @@ class DominoCoverEntity(CoverEntity):
         if old_state is not None and old_state.state != "unavailable":
             self._restoreState(old_state)
 
-    def open_cover(self, **kwargs: Any) -> None:
+        self.async_on_remove(self._domService.scheduler.register([self._motor], self._onStatus, self._onAvailable))
+
+    async def async_open_cover(self, **kwargs: Any) -> None:
         """Open the cover."""
-        #self._motor.doOpen(self._domService)
-        self._motor.setPosition(self._domService, 100)
-        self._attr_is_closed = False
+        #await self._motor.doOpen(self._domService)
+        await self._setCover(100)
 
-    def close_cover(self, **kwargs: Any) -> None:
+    async def async_close_cover(self, **kwargs: Any) -> None:
         """Close cover."""
-        #self._motor.doClose(self._domService)
-        self._motor.setPosition(self._domService, 0)
-        self._attr_is_closed = True
-        
-    def set_cover_position(self, **kwargs: Any) -> None:
+        #await self._motor.doClose(self._domService)
+        await self._setCover(0)
+
+    async def async_set_cover_position(self, **kwargs: Any) -> None:
         """Move the cover to a specific position."""
         position = kwargs.get("position")
         if position is not None:
-            self._motor.setPosition(self._domService, 100 - position)
+            # the position estimate follows the motor, the value sent is what it is driven to
+            await self._setCover(100 - position if self._motor.invertPosition else position)
 
-    def stop_cover(self, **kwargs: Any) -> None:
+    async def async_stop_cover(self, **kwargs: Any) -> None:
         """Stop the cover."""
-        self._motor.doStop(self._domService)
-    
+        await self._motor.doStop(self._domService)
+        self._onMoved()
+
     def _restoreState(self, old_state):
             # Restore on/off state
             self._attr_is_closed = old_state.state == "closed"
-            
+
+            # Restore the estimated position and the calibrated travel times
+            travel = self._motor.travel
+            position = old_state.attributes.get(ATTR_CURRENT_POSITION)
+            if position is not None and travel.position is None:
+                travel.position = position
+                self._attr_current_cover_position = position
+            if not travel.configured:
+                travel.openTime = old_state.attributes.get(ATTR_OPEN_TIME)
+                travel.closeTime = old_state.attributes.get(ATTR_CLOSE_TIME)
+
             # Optional: log it
             _LOGGER.info(
                 f"Restored state for {self.entity_id}: "
@@ -145,10 +217,16 @@ class DominoCoverEntity(CoverEntity):
             )
 
     async def _getCoverStatus(self):
-        return await self.hass.async_add_executor_job(self._motor.status, self._domService) 
+        return await self._motor.status(self._domService)
 
     async def _setCover(self, pct):
-        return await self.hass.async_add_executor_job(self._motor.setPosition, self._domService, pct) 
+        await self._motor.setPosition(self._domService, pct)
+        self._onMoved()
+
+    def _onMoved(self) -> None:
+        self._applyTravel()
+        self.async_write_ha_state()
+        self._scheduleTracking()
 
 class DominoAwningEntity(DominoCoverEntity):
     """Representation of a Domino cover."""
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import logging
+
+from .dominoService import Dimmer, Light, LightContainer, Meteo, Motor, MotorContainer, RoomTemperature
+
+_LOGGER = logging.getLogger(__name__)
+
+# The house as it was wired in the platform setups. A device map has the same shape,
+# from the entry options or a YAML file:
+#
+#   dimmers: [{mod: 23, name: "Dimmer sala - Cucina"}]
+#   lights: [{mod: 2, num: 1, name: "Luce - Cucina", deviceId: ..., deviceName: ...}]
+#   groups: [{id: all, name: "Luci - Tutte", lights: ["2.1", ...]}]   (no lights: every light)
+#   covers: [{mod: 17, num: 1, name: "Tenda - Cucina", deviceId: tenda_cucina, openTime: 25, closeTime: 22}]
+#           (without openTime/closeTime the travel times are calibrated from full runs,
+#           invertPosition: false sends a set position as it is instead of 100 - position)
+#   rooms: [{mod: 30, name: "Cucina Temperature"}]
+#   meteo: [80, 90]
+BALCONY_LIGHTS = {"deviceId": "balcony_lights", "deviceName": "Domino Hub - Balcony Lights"}
+
+DEFAULT_DEVICE_MAP = {
+  "dimmers": [
+    {"mod": 23, "name": "Dimmer sala - Cucina"},
+    {"mod": 24, "name": "Dimmer sala - TV"},
+    {"mod": 25, "name": "Dimmer sala - Balcone"},
+  ],
+  "lights": [
+    {"mod": 2, "num": 1, "name": "Luce - Cucina"},
+    {"mod": 2, "num": 2, "name": "Luce - Boh"},
+    {"mod": 2, "num": 3, "name": "Luce - Ingresso"},
+    {"mod": 5, "num": 4, "name": "Luce - Corridoio"},
+    {"mod": 3, "num": 4, "name": "Luce - Bagno Grande"},
+    {"mod": 3, "num": 2, "name": "Luce - Camera Matrimoniale"},
+    {"mod": 5, "num": 3, "name": "Luce - Bagno Piccolo"},
+    {"mod": 5, "num": 2, "name": "Luce - Camera Leti"},
+    {"mod": 4, "num": 1, "name": "Luce - Camera Francesco"},
+    {"mod": 1, "num": 4, "name": "Luce - Balcone sala", **BALCONY_LIGHTS},
+    {"mod": 3, "num": 1, "name": "Luce - Balcone camera", **BALCONY_LIGHTS},
+    {"mod": 4, "num": 2, "name": "Luce - Balcone camera fra", **BALCONY_LIGHTS},
+  ],
+  "groups": [
+    {"id": "all", "name": "Luci - Tutte"},
+  ],
+  "covers": [
+    {"mod": 17, "num": 1, "name": "Tenda - Cucina", "deviceId": "tenda_cucina"},
+    {"mod": 17, "num": 2, "name": "Tenda - Soggiorno", "deviceId": "tenda_soggiorno"},
+    {"mod": 19, "num": 2, "name": "Tenda - Camera Matrimoniale", "deviceId": "tenda_camera_matrimoniale"},
+    {"mod": 20, "num": 1, "name": "Tenda - Camera Francesco sx", "deviceId": "tenda_camera_francesco_sx"},
+    {"mod": 20, "num": 2, "name": "Tenda - Camera Francesco dx", "deviceId": "tenda_camera_francesco_dx"},
+  ],
+  "rooms": [
+    {"mod": 30, "name": "Cucina Temperature"},
+    {"mod": 35, "name": "Camera Francesco Temperature"},
+    {"mod": 40, "name": "Camera Leti Temperature"},
+    {"mod": 45, "name": "Camera Matrimoniale Temperature"},
+    {"mod": 75, "name": "Sala Temperature"},
+  ],
+  "meteo": [80, 90],
+}
+
+SECTIONS = ("dimmers", "lights", "groups", "covers", "rooms", "meteo")
+
+def _module(value, where):
+  if (isinstance(value, bool) or not isinstance(value, int) or value < 0 or value > 0xFF):
+    raise ValueError(f"{where}: module address must be 0-255, got {value!r}")
+  return value
+
+def _output(value, where, count):
+  if (isinstance(value, bool) or not isinstance(value, int) or value < 1 or value > count):
+    raise ValueError(f"{where}: output number must be 1-{count}, got {value!r}")
+  return value
+
+def _seconds(value, where):
+  if (value is None):
+    return None
+  if (isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0):
+    raise ValueError(f"{where}: travel time must be a positive number of seconds, got {value!r}")
+  return value
+
+def _flag(item, key, where, default):
+  value = item.get(key)
+  if (value is None):
+    return default
+  if (not isinstance(value, bool)):
+    raise ValueError(f"{where}: {key} must be true or false, got {value!r}")
+  return value
+
+def _name(item, where):
+  name = item.get("name")
+  if (not isinstance(name, str) or name == ""):
+    raise ValueError(f"{where}: missing name")
+  return name
+
+def _items(config, section):
+  items = config.get(section) or []
+  if (not isinstance(items, list)):
+    raise ValueError(f"{section}: expected a list")
+  for idx, item in enumerate(items):
+    if (section != "meteo" and not isinstance(item, dict)):
+      raise ValueError(f"{section}[{idx}]: expected a mapping")
+  return items
+
+class DeviceMap:
+  """Compiled device map: the device objects the platforms turn into entities.
+  Frames reach them through the scheduler, which indexes the registers of the
+  devices whose entities registered."""
+
+  def __init__(self, config = None, source = None):
+    if (config is None):
+      config = DEFAULT_DEVICE_MAP
+    if (not isinstance(config, dict)):
+      raise ValueError("device map: expected a mapping")
+    unknown = set(config) - set(SECTIONS)
+    if (len(unknown) > 0):
+      raise ValueError(f"device map: unknown sections {sorted(unknown)}")
+    # what the map was loaded from, so a reload can tell whether it changed
+    self.source = source
+    self.dimmers = []
+    self.lights = []
+    self.groups = []
+    self.covers = []
+    self.rooms = []
+    self.meteos = []
+    self._containers = {}
+    self._motors = {}
+    self._compile(config)
+
+  def _compile(self, config):
+    for idx, item in enumerate(_items(config, "dimmers")):
+      where = f"dimmers[{idx}]"
+      self._add(self.dimmers, DeviceMap.Entry(Dimmer(_module(item.get("mod"), where)), _name(item, where)))
+
+    lightsByAddress = {}
+    for idx, item in enumerate(_items(config, "lights")):
+      where = f"lights[{idx}]"
+      mod = _module(item.get("mod"), where)
+      num = _output(item.get("num"), where, 4)
+      if ((mod, num) in lightsByAddress):
+        raise ValueError(f"{where}: light {mod}.{num} is already mapped")
+      container = self._containers.get(mod)
+      if (container is None):
+        container = self._containers[mod] = LightContainer(mod)
+      entry = DeviceMap.Entry(Light(container, num), _name(item, where), item.get("deviceId", "lights"), item.get("deviceName"))
+      lightsByAddress[(mod, num)] = entry
+      self._add(self.lights, entry)
+
+    for idx, item in enumerate(_items(config, "groups")):
+      where = f"groups[{idx}]"
+      groupId = item.get("id")
+      if (not isinstance(groupId, str) or groupId == ""):
+        raise ValueError(f"{where}: missing id")
+      members = item.get("lights")
+      if (members is None):
+        entries = list(self.lights)
+      else:
+        entries = []
+        for member in members:
+          entry = lightsByAddress.get(self._lightAddress(member, where))
+          if (entry is None):
+            raise ValueError(f"{where}: light {member} is not mapped")
+          entries.append(entry)
+      self.groups.append(DeviceMap.Group(groupId, _name(item, where), entries))
+
+    seen = set()
+    for idx, item in enumerate(_items(config, "covers")):
+      where = f"covers[{idx}]"
+      mod = _module(item.get("mod"), where)
+      num = _output(item.get("num"), where, 2)
+      if ((mod, num) in seen):
+        raise ValueError(f"{where}: cover {mod}.{num} is already mapped")
+      seen.add((mod, num))
+      motor = self._motors.get(mod)
+      if (motor is None):
+        motor = self._motors[mod] = MotorContainer(mod)
+      deviceId = item.get("deviceId") or f"cover_{mod}_{num}"
+      openTime = _seconds(item.get("openTime"), where)
+      closeTime = _seconds(item.get("closeTime"), where)
+      invertPosition = _flag(item, "invertPosition", where, True)
+      self._add(self.covers, DeviceMap.Entry(Motor(motor, num, openTime, closeTime, invertPosition), _name(item, where), deviceId))
+
+    for idx, item in enumerate(_items(config, "rooms")):
+      where = f"rooms[{idx}]"
+      self._add(self.rooms, DeviceMap.Entry(RoomTemperature(_module(item.get("mod"), where)), _name(item, where)))
+
+    for idx, mod in enumerate(_items(config, "meteo")):
+      self._add(self.meteos, DeviceMap.Entry(Meteo(_module(mod, f"meteo[{idx}]")), f"Meteo {mod}"))
+
+  def _lightAddress(self, member, where):
+    # "mod.num" as written in YAML, or a [mod, num] pair
+    try:
+      if (isinstance(member, str)):
+        mod, num = (int(part) for part in member.split("."))
+      else:
+        mod, num = member
+    except (TypeError, ValueError):
+      raise ValueError(f"{where}: light {member!r} is not a mod.num address") from None
+    return (mod, num)
+
+  def _add(self, entries, entry):
+    entries.append(entry)
+
+  def registerKeys(self):
+    return sorted({key for device in self.devices() for key in device.registers()})
+
+  def modules(self):
+    return sorted({mod for (mod, _) in self.registerKeys()})
+
+  def devices(self):
+    return [entry.device for entry in self.dimmers + self.lights + self.covers + self.rooms + self.meteos]
+
+  def __repr__(self):
+    return (f"DeviceMap: {len(self.dimmers)} dimmers, {len(self.lights)} lights, {len(self.groups)} groups, "
+      f"{len(self.covers)} covers, {len(self.rooms)} rooms, {len(self.meteos)} meteo on {len(self.modules())} modules")
+
+  class Entry:
+    def __init__(self, device, name, deviceId = None, deviceName = None):
+      self.device = device
+      self.name = name
+      self.deviceId = deviceId
+      self.deviceName = deviceName
+
+  class Group:
+    def __init__(self, groupId, name, entries):
+      self.groupId = groupId
+      self.name = name
+      self.entries = entries
@@ -0,0 +1,32 @@
+"""Diagnostics support for Domino Hub."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+
+from . import DominoConfigEntry
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: DominoConfigEntry) -> dict[str, Any]:
+    """Return the bus counters of every bus of the entry, too busy to be state attributes."""
+    hub = entry.runtime_data
+    return {
+        "data": dict(entry.data),
+        "options": dict(entry.options),
+        "buses": {
+            bus.com_port: {
+                "stats": bus.stats(),
+                "modules": {mod: _moduleSummary(bus, mod) for mod in bus.metrics.modules()},
+            }
+            for bus in hub.buses
+        },
+    }
+
+
+def _moduleSummary(bus, mod: int) -> dict:
+    summary = bus.metrics.moduleSummary(mod)
+    latency = summary.pop("latency")
+    summary["latencyP95"] = latency.percentile(95)
+    return summary
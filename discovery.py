@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from .codec import FUNC_READ_OUTPUTS, statusRequest
+from .dominoService import evaluteMsgAsLong, getMsgData, isNak
+from .transport import createTransport
+
+_LOGGER = logging.getLogger(__name__)
+
+# a module answers within a few frame times, anything slower is re-probed with RETRY_TIMEOUT
+PROBE_TIMEOUT = 0.04
+RETRY_TIMEOUT = 0.5
+ADDRESSES = range(1, 256)
+
+KIND_OUTPUT = "output"
+KIND_DIMMER = "dimmer"
+KIND_TEMPERATURE = "temperature"
+KIND_INPUT = "input"
+KIND_UNKNOWN = "unknown"
+
+# kelvin * 10 readings between -40 and 100 °C
+TEMPERATURE_RANGE = (2331, 3731)
+
+# connection check, per baud rate: listen for the traffic of other masters, then read the status
+# of one address after another with a short timeout until something answers or the sweep time is up,
+# so a silent port is given up on in under two seconds
+BAUD_RATES = (19200, 9600, 38400, 57600, 115200)
+CHECK_TIMEOUT = 0.025
+LISTEN_TIME = 0.1
+SWEEP_TIME = 0.25
+
+class ConnectionCheck:
+  """Finds the baud rate a port carries bus traffic at. Any frame with a good
+  checksum will do, a reply, a NAK, a late reply or two other devices talking,
+  so the check needs no module at a known address. The round trip is measured
+  on the first reply in time."""
+
+  def __init__(self, com_port, baudRates = BAUD_RATES, timeout = CHECK_TIMEOUT,
+               listenTime = LISTEN_TIME, sweepTime = SWEEP_TIME, addresses = ADDRESSES):
+    self.com_port = com_port
+    self.addresses = addresses
+    self.baudRates = baudRates
+    self.timeout = timeout
+    self.listenTime = listenTime
+    self.sweepTime = sweepTime
+    self.baudRate = None
+    self.rtt = None
+
+  async def run(self, firstBaudRate):
+    candidates = [firstBaudRate] + [baud for baud in self.baudRates if baud != firstBaudRate]
+    for baud in candidates:
+      transport = createTransport(self.com_port, baud)
+      await transport.connect()
+      try:
+        heard = await self._probe(transport)
+      finally:
+        transport.close()
+      if (heard):
+        self.baudRate = baud
+        rtt = f", round trip {self.rtt * 1000:.1f}ms" if self.rtt is not None else ""
+        _LOGGER.info(f"{self.com_port} carries bus traffic at {baud} baud{rtt}")
+        return True
+      if (not transport.setsBaudRate):
+        # the line settings of a socket gateway are not ours to try, one baud rate will do
+        break
+    _LOGGER.info(f"No bus traffic on {self.com_port} at {', '.join(str(baud) for baud in candidates)} baud")
+    return False
+
+  async def _probe(self, transport):
+    loop = asyncio.get_running_loop()
+    decoder = transport.decoder
+    await asyncio.sleep(self.listenTime)
+    if (decoder.frameCount > 0):
+      return True
+    deadline = loop.time() + self.sweepTime
+    for mod in self.addresses:
+      if (loop.time() >= deadline):
+        break
+      start = loop.time()
+      try:
+        await transport.exchange(statusRequest(mod, FUNC_READ_OUTPUTS), self.timeout)
+      except TimeoutError:
+        # a reply too late for its request is decoded all the same
+        if (decoder.frameCount > 0):
+          return True
+        continue
+      self.rtt = loop.time() - start
+      return True
+    # the last probe gets its time for a late reply too
+    await asyncio.sleep(self.timeout)
+    return decoder.frameCount > 0
+
+class BusDiscovery:
+  """Probes the module address space with status reads and classifies the
+  modules that answer by their reply pattern."""
+
+  def __init__(self, svc, addresses = ADDRESSES, timeout = PROBE_TIMEOUT):
+    self._svc = svc
+    self.addresses = addresses
+    self.timeout = timeout
+    self.modules = {}
+    self.probeCount = 0
+    self.duration = None
+
+  async def scan(self):
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    self.modules = {}
+    late = set()
+
+    def onFrame(frame):
+      # replies that come in after their probe timed out name a slow module
+      if (frame[2] in (0x30, 0x31) and frame[3] in self.addresses):
+        late.add(frame[3])
+
+    removeListener = self._svc.addFrameListener(onFrame)
+    try:
+      for mod in self.addresses:
+        await self._probeModule(mod, self.timeout, late)
+    finally:
+      removeListener()
+    # ask the slow ones again, patiently
+    for mod in sorted(late - set(self.modules)):
+      await self._probeModule(mod, RETRY_TIMEOUT, set())
+    self.duration = loop.time() - start
+    _LOGGER.info(f"Bus discovery found {len(self.modules)} modules with {self.probeCount} probes in {self.duration:.1f}s")
+    return self.result()
+
+  async def _probeModule(self, mod, timeout, late):
+    # a module that speaks the protocol answers even an unsupported status read with a NAK,
+    # so silence on 0x31 means nobody is there and 0x30 is not worth a second timeout
+    outputs = await self._probe(mod, 0x31, timeout, late)
+    if (outputs is None):
+      return
+    inputs = await self._probe(mod, 0x30, timeout, late) if isNak(outputs) else None
+    module = BusDiscovery.Module(mod, outputs, inputs)
+    self.modules[mod] = module
+    _LOGGER.debug(f"Discovered {module}")
+
+  async def _probe(self, mod, func, timeout, late):
+    self.probeCount += 1
+    ans = await self._svc.probe(mod, func, timeout)
+    if (ans is not None and ans[3] != mod):
+      late.add(ans[3])
+      return None
+    return ans
+
+  def result(self):
+    return {
+      "duration": self.duration,
+      "probes": self.probeCount,
+      "modules": [module.asDict() for (_, module) in sorted(self.modules.items())],
+    }
+
+  def deviceMapDraft(self):
+    # output modules could drive lights or motors, a status read looks the same for both,
+    # they are drafted as lights with generic names to be edited
+    config = {"dimmers": [], "lights": [], "rooms": [], "meteo": []}
+    kinds = {mod: module.kind for (mod, module) in self.modules.items()}
+    claimed = set()
+    for mod in sorted(kinds):
+      if (kinds[mod] == KIND_TEMPERATURE and all(kinds.get(mod + i) == KIND_INPUT for i in range(1, 4))):
+        config["meteo"].append(mod)
+        claimed.update(range(mod, mod + 4))
+    for mod in sorted(kinds):
+      kind = kinds[mod]
+      if (kind == KIND_DIMMER):
+        config["dimmers"].append({"mod": mod, "name": f"Dimmer {mod}"})
+      elif (kind == KIND_OUTPUT):
+        for num in range(1, 5):
+          config["lights"].append({"mod": mod, "num": num, "name": f"Luce {mod}.{num}"})
+      elif (kind == KIND_TEMPERATURE and mod not in claimed):
+        # RoomTemperature(mod) reads its value from the following address, which may
+        # or may not be the one that answered first
+        room = mod if kinds.get(mod + 1) == KIND_TEMPERATURE else mod - 1
+        claimed.update((room, room + 1))
+        config["rooms"].append({"mod": room, "name": f"Temperature {room}"})
+    return {section: items for (section, items) in config.items() if len(items) > 0}
+
+  class Module:
+    def __init__(self, mod, outputs, inputs):
+      self.mod = mod
+      self.outputs = None if isNak(outputs) else getMsgData(outputs)
+      self.inputs = None if inputs is None or isNak(inputs) else getMsgData(inputs)
+      self.inputValue = evaluteMsgAsLong(inputs) if self.inputs is not None else None
+      self.kind = self._classify()
+
+    def _classify(self):
+      if (self.outputs is not None):
+        # light and motor containers only use the low nibble, a dimmer reports its level
+        # (so a dimmer that is off reads like an output module)
+        return KIND_DIMMER if self.outputs[1] > 0x0F else KIND_OUTPUT
+      if (self.inputValue is not None):
+        low, high = TEMPERATURE_RANGE
+        return KIND_TEMPERATURE if low <= self.inputValue <= high else KIND_INPUT
+      return KIND_UNKNOWN
+
+    def asDict(self):
+      return {
+        "mod": self.mod,
+        "kind": self.kind,
+        "outputs": list(self.outputs) if self.outputs is not None else None,
+        "inputs": list(self.inputs) if self.inputs is not None else None,
+      }
+
+    def __repr__(self):
+      return f"Module {self.mod}: {self.kind} outputs {self.outputs} inputs {self.inputs}"
@@ -1,148 +1,307 @@
 from __future__ import annotations
 
+import asyncio
 import logging
-import serial
 import time
-import threading
+
+from .breaker import CircuitBreakers
+from .busqueue import BusQueue, PRIORITY_POLL, priorityOf
+from .cache import RegisterCache, CACHE_DIMMER, CACHE_LIGHT, CACHE_METEO, CACHE_MOTOR, CACHE_ROOM_TEMPERATURE, EXPIRED, STALE
+from .codec import dumpFrame, encodeFrame, frameData, frameValue, isDumping, isNak, isStatusRequest, statusRequest
+from .coalescer import LatestWins
+from .connection import ConnectionManager
+from .exceptions import ModuleError, ModuleNakError, ModuleTimeoutError, ModuleUnavailableError
+from .metrics import BusMetrics, OUTCOME_ERROR, OUTCOME_NAK, OUTCOME_OK, OUTCOME_TIMEOUT
+from .scheduler import BusScheduler
+from .transport import createTransport
+from .travel import TravelModel, CLOSING, OPENING, STOPPED
 
 _LOGGER = logging.getLogger(__name__)
 
-_exchange_lock = threading.Lock() 
-
-def readMessage(ser):
-  #maxWait = 20
-  #timeToSleep = 0.5
-  #maxWait = 40
-  #timeToSleep = 0.25
-  maxWait = 100
-  wait = maxWait
-  timeToSleep = 0.1
-  bytesToRead = ser.inWaiting()
-  #print ('bytesToRead: ' + str(bytesToRead))
-  while (bytesToRead == 0):
-    time.sleep(timeToSleep)
-    bytesToRead = ser.inWaiting()
-    #print ('bytesToRead: ' + str(bytesToRead))
-    wait -= 1
-    if (wait == 0):
-      raise Exception("timeout")
-  if (bytesToRead > 0):
-    #_LOGGER.info("Reading " + str(bytesToRead) + " bytes from serial after waiting " + str((maxWait - wait) * timeToSleep) + " seconds")
-    return ser.read(bytesToRead)
-  else:
-    return None
-
-def calcMessage(values):
-  c = 0
-  b = bytearray()
-  #print(b)
-  for v in values:
-    c += v
-    b.append(v)
-  c = c & 0xFF
-  c = 0xFF - c
-  b.append(c)
-  return bytes(b)
-
-def dumpMessage(msg):
-  s = ''
-  for c in msg:
-    #s += hex(ord(c)) + ' '
-    if (isinstance(c, int)):
-      s += hex(c) + ' '
-    else:
-      s += hex(ord(c)) + ' '
-  #print (s)
-
-def sendReqStatus(modNumber, func, d1 = 0x33, d2 = 0x33):
-  values = [
-    0x55,
-    0x82,
-    func,
-    modNumber,
-    d1,
-    d2
-  ]
-  s = calcMessage(values)
-  return s
-
-def sendMessage(ser, msg):
-    #print( "writing " + str(len(msg)))
-    dumpMessage(msg)
-    return ser.write(msg)
-
-def exchangeMsg(ser, msg):
-    with _exchange_lock:
-      sendMessage(ser, msg)
-
-      ans = readMessage(ser)
-      #if (ord(ans[2]) == 0x0 and ord(ans[5]) == 0xf0):
-      if (ans[2] == 0x0 and ans[5] == 0xf0):
-        return None
-      if (ans[2] == 0x0 and ans[5] == 0xff):
-        return None
-      dumpMessage(ans)
-      return ans
+EXCHANGE_TIMEOUT = 10
+
+# the frame helpers live in codec, under the names the rest of the integration knows them by
+dumpMessage = dumpFrame
+sendReqStatus = encodeFrame
+getMsgData = frameData
+evaluteMsgAsLong = frameValue
 
-def getMsgData(ans):
-  return ans[4], ans[5]
+def applyLightMask(status, b2):
+  mask = b2 >> 4
+  return (status & ~mask) | (b2 & mask)
 
-def evaluteMsgAsLong(ans):
-  (d1, d2) = getMsgData(ans)
-  return (d1 << 8) + d2
+def applyMotorMovement(status, num, movement):
+  # each motor has an opening and a closing bit, motor 1 in bits 0-1, motor 2 in bits 2-3
+  shift = (num - 1) * 2
+  status &= ~(0x03 << shift)
+  if (movement == MotorContainer.MotorStatus.MotorMovement.OPENING):
+    status |= 0x01 << shift
+  elif (movement == MotorContainer.MotorStatus.MotorMovement.CLOSING):
+    status |= 0x02 << shift
+  return status
 
 class DominoService:
-  def __init__(self, com_port, com_baud):
+  def __init__(self, com_port, com_baud, cacheTimes = None, deviceMap = None, transport = None, busId = None):
     self.com_port = com_port
     self.com_baud = com_baud
-    self.ser = None
-    self.openCount = 0
+    # set on the extra buses of an entry, so their entities do not collide with the first bus ones
+    self.busId = busId
+    # devicemap.DeviceMap the platforms create their entities from
+    self.deviceMap = deviceMap
+    # a serial port, or a socket:// or rfc2217:// bus gateway, unless told otherwise,
+    # recorder.ReplayTransport plays a capture back
+    self.transport = transport if transport is not None else createTransport(com_port, com_baud)
+    self.connection = ConnectionManager(self.transport)
+    self.timeout = EXCHANGE_TIMEOUT
+    self.queue = BusQueue()
+    self.metrics = BusMetrics()
+    self.breakers = CircuitBreakers()
+    self.cache = RegisterCache(cacheTimes)
+    self._inflight = {}
+    self.busReads = 0
+    self.coalescedReads = 0
+    self.scheduler = BusScheduler(self)
+    self.breakers.onChange = lambda mod: self.scheduler.updateAvailability()
+    self.connection.deviceOf = self.scheduler.deviceOf
+    self.listening = False
+    self.monitoredFrames = 0
+    self.monitoredWrites = 0
+    self._frameListeners = []
+    self.transport.onUnsolicited = self._onUnsolicited
     _LOGGER.info(f"DominoService initialized with com_port: {com_port}, com_baud: {com_baud}")
   
-  def open(self):
-    if (self.ser is None):
-      self.ser = serial.Serial(self.com_port, baudrate = self.com_baud,
-            parity=serial.PARITY_NONE,
-            stopbits=serial.STOPBITS_ONE,
-            bytesize=serial.EIGHTBITS,
-            rtscts=False,
-            dsrdtr=False,
-            xonxoff=False,
-            timeout=5)
-    self.openCount += 1
-    _LOGGER.debug(f"DominoService open called. openCount: {self.openCount}")
-    return self.ser
-
-  def close(self):
-    if (self.ser is not None):
-      self.openCount -= 1
-      _LOGGER.debug(f"DominoService close called. openCount: {self.openCount}")
-      if (self.openCount == 0):
-        self.ser.close()
-        self.ser = None
-        _LOGGER.debug("DominoService serial connection closed.")
+  def uniqueId(self, base):
+    return base if self.busId is None else f"{base}_{self.busId}"
+
+  async def connect(self):
+    await self.connection.start()
+
+  async def disconnect(self, drainTimeout = EXCHANGE_TIMEOUT):
+    await self.scheduler.stop()
+    try:
+      async with asyncio.timeout(drainTimeout):
+        await self.queue.join()
+    except TimeoutError:
+      _LOGGER.warning(f"Bus queue not drained after {drainTimeout}s, closing anyway")
+    await self.connection.close()
+
+  async def exchange(self, msg, priority = None):
+    mod = msg[3]
+    if (not self.breakers.allow(mod)):
+      raise ModuleUnavailableError(mod, "not answering, request not sent")
+    try:
+      ans = await self._exchange(msg, priority)
+    except ModuleError:
+      # a timeout counts against the module even when it was the one that made the line look
+      # stalled, a dead module would never reach the threshold otherwise
+      self.breakers.failure(mod)
+      raise
+    except BaseException:
+      # the line went down or the caller gave up, not the module
+      self.breakers.abandon(mod)
+      raise
+    self.breakers.success(mod)
+    return ans
+
+  async def _exchange(self, msg, priority):
+    if (priority is None):
+      priority = priorityOf(msg)
+    start = time.monotonic()
+    async with self.queue.slot(priority):
+      transport = await self.connection.get(self.timeout)
+      dumping = isDumping(_LOGGER)
+      if (dumping):
+        _LOGGER.debug(f"> {dumpMessage(msg)}")
+      sent = time.monotonic()
+      try:
+        ans = await transport.exchange(msg, self.timeout)
+      except TimeoutError:
+        self.metrics.record(msg[3], msg[2], time.monotonic() - sent, OUTCOME_TIMEOUT)
+        self.connection.exchangeTimedOut(msg[3])
+        raise ModuleTimeoutError(msg[3], f"no reply to function {hex(msg[2])} in {self.timeout}s") from None
+      except Exception:
+        self.metrics.record(msg[3], msg[2], time.monotonic() - sent, OUTCOME_ERROR)
+        raise
+      self.connection.exchangeSucceeded()
+      elapsed = time.monotonic() - sent
+    self.queue.record(priority, time.monotonic() - start)
+    if (isNak(ans)):
+      self.metrics.record(msg[3], msg[2], elapsed, OUTCOME_NAK)
+      raise ModuleNakError(msg[3], msg[2])
+    self.metrics.record(msg[3], msg[2], elapsed, OUTCOME_OK)
+    if (dumping):
+      _LOGGER.debug(f"< {dumpMessage(ans)}")
+    return ans
+
+  async def probe(self, mod, func, timeout):
+    # discovery probes: short timeout, raw reply with NAKs, and no metrics or stall
+    # accounting, most of the address space is expected to stay silent
+    async with self.queue.slot(PRIORITY_POLL):
+      transport = await self.connection.get(self.timeout)
+      try:
+        return await transport.exchange(statusRequest(mod, func), timeout)
+      except TimeoutError:
+        return None
+
+  async def readRegister(self, mod, func):
+    # concurrent readers of the same register share the one outstanding bus read
+    key = (mod, func)
+    task = self._inflight.get(key)
+    if (task is None):
+      task = self._startRead(key)
+    else:
+      self.coalescedReads += 1
+      _LOGGER.debug(f"Joining in-flight read of register {hex(func)} of module {mod}")
+    return await asyncio.shield(task)
+
+  def _startRead(self, key):
+    task = asyncio.ensure_future(self._readAndStore(key))
+    self._inflight[key] = task
+    task.add_done_callback(lambda t: self._readDone(key, t))
+    self.busReads += 1
+    return task
+
+  async def _readAndStore(self, key):
+    (mod, func) = key
+    ans = await self.exchange(statusRequest(mod, func))
+    self.cache.store(key, ans)
+    return ans
+
+  def _readDone(self, key, task):
+    self._inflight.pop(key, None)
+    if (not task.cancelled()):
+      # mark the exception as retrieved in case every reader went away
+      task.exception()
+
+  async def readRegisters(self, keys):
+    registers = {}
+    for (mod, func) in keys:
+      registers[(mod, func)] = await self.readRegister(mod, func)
+    return registers
+
+  async def readCached(self, keys, cacheClass):
+    registers = {}
+    for key in keys:
+      state, frame = self.cache.lookup(key, cacheClass)
+      if (state == EXPIRED):
+        frame = await self.readRegister(*key)
+      elif (state == STALE and key not in self._inflight):
+        # serve the stale value now, refresh it in the background
+        self._startRead(key)
+      registers[key] = frame
+    return registers
+
+  async def setLights(self, lights, pct):
+    # one frame per container, whatever the number of lights on it
+    containers = {}
+    for light in lights:
+      containers.setdefault(light.container, []).append(light.num)
+    for container, nums in containers.items():
+      await container.setLights(self, nums, pct)
+    return len(containers)
+    return len(containers)
+
+  def listen(self, enabled = True):
+    # frames other masters and modules put on the line update the cache and the entities
+    # as they pass by, the scheduler then only has to reconcile now and then
+    self.listening = enabled
+    self.scheduler.setReconciling(enabled)
+    _LOGGER.info(f"Bus monitor {'enabled' if enabled else 'disabled'}")
+
+  def addFrameListener(self, listener):
+    self._frameListeners.append(listener)
+
+    def remove():
+      if (listener in self._frameListeners):
+        self._frameListeners.remove(listener)
+
+    return remove
+
+  def _onUnsolicited(self, frame):
+    for listener in list(self._frameListeners):
+      listener(frame)
+    if (not self.listening or isNak(frame) or isStatusRequest(frame)):
+      return
+    mod = frame[3]
+    if (frame[2] != 0x10):
+      # whatever it says, the module is alive
+      self.breakers.success(mod)
+    if (frame[2] == 0x10):
+      key = (mod, 0x31)
+      if (self.scheduler.isRegistered(key)):
+        # someone else switched this module, read back what it did
+        self.monitoredWrites += 1
+        self.cache.invalidate(key)
+        self._readBack(key)
+        self.scheduler.boost([key])
+      return
+    key = (mod, frame[2])
+    if (not self.scheduler.isRegistered(key)):
+      return
+    self.monitoredFrames += 1
+    previous = self.cache.peek(key)
+    self.cache.store(key, frame)
+    self.scheduler.schedule(key)
+    if (previous is None or getMsgData(previous) != getMsgData(frame)):
+      _LOGGER.debug(f"Monitored register {hex(frame[2])} of module {mod} changed: {frame.hex(' ')}")
+      self.scheduler.notify({key})
+
+  def _readBack(self, key):
+    task = self._inflight.get(key)
+    if (task is None):
+      task = self._startRead(key)
+    task.add_done_callback(lambda t: self._readBackDone(key, t))
+
+  def _readBackDone(self, key, task):
+    if (not task.cancelled() and task.exception() is None):
+      self.scheduler.notify({key})
+
+  def snapshot(self):
+    return {"registers": self.cache.snapshot()}
+
+  def restoreSnapshot(self, snapshot, elapsed):
+    # before the entities register, so they start from the restored values
+    keys = self.cache.restore(snapshot.get("registers", []), elapsed)
+    self.scheduler.warmStart(keys)
+    _LOGGER.info(f"Restored {len(keys)} registers of {self.com_port} from the last snapshot")
+    return keys
+
+  def stats(self):
+    stats = self.transport.stats()
+    stats.update(self.connection.stats())
+    stats["bus_reads"] = self.busReads
+    stats["coalesced_reads"] = self.coalescedReads
+    # dimmer levels and cover positions replaced before they were sent
+    devices = self.deviceMap.devices() if self.deviceMap is not None else []
+    stats["superseded_writes"] = sum(device.writes.supersededCount for device in devices if isinstance(device, (Dimmer, Motor)))
+    stats["monitored_frames"] = self.monitoredFrames
+    stats["monitored_writes"] = self.monitoredWrites
+    stats.update(self.queue.stats())
+    stats.update(self.metrics.totals())
+    stats.update(self.cache.stats())
+    stats.update(self.breakers.stats())
+    stats.update(self.scheduler.stats())
+    stats["utilization"] = self.metrics.utilization()
+    return stats
 
 class RoomTemperature:
+  cacheClass = CACHE_ROOM_TEMPERATURE
+
   def __init__(self, mod):
     self.mod = mod
-    self.lastStatus = None
-    self.lastStatusTime = 0
-    self.cacheTime = 60
   
-  def status(self, svc: DominoService):
-    statusTime = int(round(time.time()))
-    if ((self.lastStatus is None) or ((statusTime - self.lastStatusTime) > self.cacheTime)):
-      ser = svc.open()
-      try:
-        self.lastStatus = self.readStatus(ser)
-        self.lastStatusTime = statusTime
-      finally:
-        svc.close()
-    return self.lastStatus
+  async def status(self, svc: DominoService):
+    return self.decode(await svc.readCached(self.registers(), self.cacheClass))
   
-  def readStatus(self, ser):
-    #d1 = exchangeMsg(ser, sendReqStatus(self.mod, 0x30))
-    d2 = exchangeMsg(ser, sendReqStatus(self.mod + 1, 0x30))
+  async def readStatus(self, svc: DominoService):
+    return self.decode(await svc.readRegisters(self.registers()))
+
+  def registers(self):
+    return [(self.mod + 1, 0x30)]
+
+  def decode(self, registers):
+    #d1 = registers[(self.mod, 0x30)]
+    d2 = registers[(self.mod + 1, 0x30)]
     kelvin = evaluteMsgAsLong(d2)
     #print (kelvin)
     return RoomTemperature.Status(kelvin)
@@ -161,37 +320,34 @@ class RoomTemperature:
       return "RoomTemperature.Status: " + str(self.getCelsius()) + "°C / " + str(self.getKelvin()) + "K"
 
 class Meteo:
+  cacheClass = CACHE_METEO
+
   def __init__(self, mod, num = None):
     self.mod = mod
     self.num = num
-    self.lastStatus = None
-    self.lastStatusTime = 0
-    self.cacheTime = 60
   
-  def status(self, svc: DominoService):
-    statusTime = int(round(time.time()))
-    if ((self.lastStatus is None) or ((statusTime - self.lastStatusTime) > self.cacheTime)):
-      ser = svc.open()
-      try:
-        self.lastStatus = self.readStatus(ser)
-        self.lastStatusTime = statusTime
-      finally:
-        svc.close()
-    return self.lastStatus
+  async def status(self, svc: DominoService):
+    return self.decode(await svc.readCached(self.registers(), self.cacheClass))
   
-  def readStatus(self, ser):
+  async def readStatus(self, svc: DominoService):
+    return self.decode(await svc.readRegisters(self.registers()))
+
+  def registers(self):
+    return [(self.mod + i, 0x30) for i in range(4)]
+
+  def decode(self, registers):
     # contains temperature in kelvin (x 10)
-    d1 = exchangeMsg(ser, sendReqStatus(self.mod, 0x30))
+    d1 = registers[(self.mod, 0x30)]
     kelvin = evaluteMsgAsLong(d1)
     # contains lux in decine di lux (so you have to divide by 10)
-    d2 = exchangeMsg(ser, sendReqStatus(self.mod + 1, 0x30))
+    d2 = registers[(self.mod + 1, 0x30)]
     lux = evaluteMsgAsLong(d2)
     # contains wind in decimi di m/s (so you have to multiple by 10 for m/s)
-    d3 = exchangeMsg(ser, sendReqStatus(self.mod + 2, 0x30))
+    d3 = registers[(self.mod + 2, 0x30)]
     wind = evaluteMsgAsLong(d3)
     #b1, b2 = getMsgData(d3)
     #_LOGGER.info(f"Meteo1 b1: {hex(b1)}, b2: {hex(b2)}, wind: {wind}")
-    d4 = exchangeMsg(ser, sendReqStatus(self.mod + 3, 0x30))
+    d4 = registers[(self.mod + 3, 0x30)]
     b1, b2 = getMsgData(d4)
     isRain = (b2 & 0x01) != 0
     isTwilight = (b2 & 0x02) != 0
@@ -240,84 +396,111 @@ class Meteo:
       return "MeteoStatus: " + str(self.getCelsius()) + "°C / " + str(self.getKelvin()) + "K" + " / " + str(self.getLux()) + " lux" + " / " + str(self.getWind()) + " m/s" + " / " + ("raining" if self.isRaining else "not raining") + " / " + ("twilight" if self.isTwilight else "day")  
 
 class Dimmer:
+  cacheClass = CACHE_DIMMER
+
   def __init__(self, mod, num = None):
     self.mod = mod
     self.num = num
+    # a dragged brightness slider only needs its last level on the bus
+    self.writes = LatestWins(lambda target: self._setLight(*target), f"dimmer {mod}")
 
-  def status(self, svc: DominoService):
-    ser = svc.open()
-    try:
-      return self.readStatus(ser)
-    finally:
-      svc.close()
+  async def status(self, svc: DominoService):
+    return self.decode(await svc.readCached(self.registers(), self.cacheClass))
+
+  async def readStatus(self, svc: DominoService):
+    return self.decode(await svc.readRegisters(self.registers()))
 
-  def readStatus(self, ser):
-    d1 = exchangeMsg(ser, sendReqStatus(self.mod, 0x31))
+  def registers(self):
+    return [(self.mod, 0x31)]
+
+  def decode(self, registers):
+    d1 = registers[(self.mod, 0x31)]
     b1, b2 = getMsgData(d1)
     return b2 if b1 == 0 else 0
 
-  def setLight(self, svc: DominoService, pct):
-    ser = svc.open()
-    try:
-      return self._setLight(ser, pct)
-    finally:
-      svc.close()
+  async def setLight(self, svc: DominoService, pct):
+    return await self.writes.submit((svc, pct))
 
-  def _setLight(self, ser, pct):
+  async def _setLight(self, svc: DominoService, pct):
     pct = min(max(0, pct), 100)
-    return exchangeMsg(ser, sendReqStatus(self.mod, 0x10, d1 = 0, d2 = pct))
+    key = (self.mod, 0x31)
+    try:
+      ans = await svc.exchange(sendReqStatus(self.mod, 0x10, d1 = 0, d2 = pct))
+    except Exception:
+      svc.cache.invalidate(key)
+      raise
+    # write-through: the dimmer now sits at the level we just sent
+    svc.cache.patch(key, 0, pct)
+    return ans
 
 class LightContainer:
+  cacheClass = CACHE_LIGHT
+
   def __init__(self, mod):
     self.mod = mod
-    self.lastStatus = None
-    self.lastStatusTime = 0
-    self.cacheTime = 60
-
-  def status(self, svc: DominoService):
-    statusTime = int(round(time.time()))
-    if ((self.lastStatus is None) or ((statusTime - self.lastStatusTime) > self.cacheTime)):
-      ser = svc.open()
-      try:
-        self.lastStatus = self.readStatus(ser)
-        self.lastStatusTime = statusTime
-      finally:
-        svc.close()
-    return self.lastStatus
-
-  def readStatus(self, ser):
-    d1 = exchangeMsg(ser, sendReqStatus(self.mod, 0x31))
+
+  async def status(self, svc: DominoService):
+    return self.decode(await svc.readCached(self.registers(), self.cacheClass))
+
+  async def readStatus(self, svc: DominoService):
+    return self.decode(await svc.readRegisters(self.registers()))
+
+  def registers(self):
+    return [(self.mod, 0x31)]
+
+  def decode(self, registers):
+    d1 = registers[(self.mod, 0x31)]
     b1, b2 = getMsgData(d1)
     return b2
 
-  def setLight(self, svc: DominoService, num, pct):
-    ser = svc.open()
-    try:
-      if (pct == 0):
-        return self.off(ser, num)
-      else:
-        return self.on(ser, num)
-    finally:
-      svc.close()
-      self.lastStatus = None
-
-  def on(self, ser, num):
+  async def setLight(self, svc: DominoService, num, pct):
+    if (pct == 0):
+      return await self.off(svc, num)
+    else:
+      return await self.on(svc, num)
+
+  async def setLights(self, svc: DominoService, nums, pct):
+    # the mask layout addresses all four outputs at once, so any subset is a single frame
+    mask = 0
+    for num in nums:
+      mask |= 1 << (num - 1)
+    b2 = (mask << 4) | (mask if pct > 0 else 0)
+    return await self._write(svc, b2)
+
+  async def on(self, svc: DominoService, num):
     #print ("num: " + str(num))
     bit = 1 << (num - 1)
     #print (hex(bit))
     b2 = (bit << 4) | bit
     #print (hex(b2))
-    exchangeMsg(ser, sendReqStatus(self.mod, 0x10, 0, b2))
+    return await self._write(svc, b2)
 
-  def off(self, ser, num):
+  async def off(self, svc: DominoService, num):
     #print ("num: " + str(num))
     bit = 1 << (num - 1)
     #print (hex(bit))
     b2 = (bit << 4)
     #print (hex(b2))
-    exchangeMsg(ser, sendReqStatus(self.mod, 0x10, 0, b2))
+    return await self._write(svc, b2)
+
+  async def _write(self, svc: DominoService, b2):
+    key = (self.mod, 0x31)
+    try:
+      ans = await svc.exchange(sendReqStatus(self.mod, 0x10, 0, b2))
+    except Exception:
+      svc.cache.invalidate(key)
+      raise
+    frame = svc.cache.peek(key)
+    if (frame is not None):
+      # write-through: the ack does not carry the outputs, but the high nibble
+      # says which ones we changed and the low nibble their new value
+      b1, status = getMsgData(frame)
+      svc.cache.patch(key, b1, applyLightMask(status, b2))
+    return ans
 
 class Light:
+  cacheClass = CACHE_LIGHT
+
   def __init__(self, container:LightContainer, num):
     self.container = container
     self.num = num
@@ -326,83 +509,87 @@ class Light:
   def mod(self):
       return self.container.mod
     
-  def status(self, svc: DominoService):
-    status = self.container.status(svc)
+  async def status(self, svc: DominoService):
+    status = await self.container.status(svc)
+    return self._isOn(status)
+
+  def registers(self):
+    return self.container.registers()
+
+  def decode(self, registers):
+    return self._isOn(self.container.decode(registers))
+
+  def _isOn(self, status):
     bit = 1 << (self.num - 1)
     #print (hex(bit))
     isOn = (status & bit) != 0
     return isOn
 
-  def setLight(self, svc: DominoService, pct):
-    self.container.setLight(svc, self.num, pct)
+  async def setLight(self, svc: DominoService, pct):
+    await self.container.setLight(svc, self.num, pct)
 
 class Light2:
   def __init__(self, mod, num):
     self.mod = mod
     self.num = num
 
-  def status(self, svc: DominoService):
-    ser = svc.open()
-    try:
-      return self.readStatus(ser)
-    finally:
-      svc.close()
+  async def status(self, svc: DominoService):
+    return await self.readStatus(svc)
 
-  def readStatus(self, ser):
-    d1 = exchangeMsg(ser, sendReqStatus(self.mod, 0x31))
+  async def readStatus(self, svc: DominoService):
+    return self.decode(await svc.readRegisters(self.registers()))
+
+  def registers(self):
+    return [(self.mod, 0x31)]
+
+  def decode(self, registers):
+    d1 = registers[(self.mod, 0x31)]
     b1, b2 = getMsgData(d1)
     bit = 1 << (self.num - 1)
     #print (hex(bit))
     isOn = (b2 & bit) != 0
     return isOn
 
-  def setLight(self, svc: DominoService, pct):
-    ser = svc.open()
-    try:
-      if (pct == 0):
-        return self.off(ser)
-      else:
-        return self.on(ser)
-    finally:
-      svc.close()
-
-  def on(self, ser):
+  async def setLight(self, svc: DominoService, pct):
+    if (pct == 0):
+      return await self.off(svc)
+    else:
+      return await self.on(svc)
+
+  async def on(self, svc: DominoService):
     #print ("num: " + str(self.num))
     bit = 1 << (self.num - 1)
     #print (hex(bit))
     b2 = (bit << 4) | bit
     #print (hex(b2))
-    exchangeMsg(ser, sendReqStatus(self.mod, 0x10, 0, b2))
+    await svc.exchange(sendReqStatus(self.mod, 0x10, 0, b2))
 
-  def off(self, ser):
+  async def off(self, svc: DominoService):
     #print ("num: " + str(self.num))
     bit = 1 << (self.num - 1)
     #print (hex(bit))
     b2 = (bit << 4)
     #print (hex(b2))
-    exchangeMsg(ser, sendReqStatus(self.mod, 0x10, 0, b2))
+    await svc.exchange(sendReqStatus(self.mod, 0x10, 0, b2))
 
 
 class MotorContainer:
+  cacheClass = CACHE_MOTOR
+
   def __init__(self, mod):
     self.mod = mod
-    self.lastStatus = None
-    self.lastStatusTime = 0
-    self.cacheTime = 10
-
-  def status(self, svc: DominoService):
-    statusTime = int(round(time.time()))
-    if ((self.lastStatus is None) or ((statusTime - self.lastStatusTime) > self.cacheTime)):
-      ser = svc.open()
-      try:
-        self.lastStatus = self.readStatus(ser)
-        self.lastStatusTime = statusTime
-      finally:
-        svc.close()
-    return self.lastStatus
-
-  def readStatus(self, ser) -> MotorContainer.MotorStatus:
-    d = exchangeMsg(ser, sendReqStatus(self.mod, 0x31))
+
+  async def status(self, svc: DominoService):
+    return self.decode(await svc.readCached(self.registers(), self.cacheClass))
+
+  async def readStatus(self, svc: DominoService) -> MotorContainer.MotorStatus:
+    return self.decode(await svc.readRegisters(self.registers()))
+
+  def registers(self):
+    return [(self.mod, 0x31)]
+
+  def decode(self, registers) -> MotorContainer.MotorStatus:
+    d = registers[(self.mod, 0x31)]
     b1, b2 = getMsgData(d)
     _LOGGER.debug(f"Motor {self.mod} -> b1: {hex(b1)}, b2: {hex(b2)}")
     
@@ -433,69 +620,66 @@ class MotorContainer:
       m2s = None
 
     return MotorContainer.MotorStatus(m1s, m2s)
-    
-    # d1 = exchangeMsg(ser, sendReqStatus(self.mod + 1, 0x30))
-    # b1, b2 = getMsgData(d1)
-    # if (self.mod == 17 and num == 2):
-    #   _LOGGER.info(f"Motor3 {self.mod + 1} - {num} -> b1: {hex(b1)}, b2: {hex(b2)}")
-    # d1 = exchangeMsg(ser, sendReqStatus(self.mod + 1, 0x31))
-    # b1, b2 = getMsgData(d1)
-    # if (self.mod == 17 and num == 2):
-    #   _LOGGER.info(f"Motor4 {self.mod + 1} - {num} -> b1: {hex(b1)}, b2: {hex(b2)}")
-    return b2
 
-  def setPosition(self, svc: DominoService, num, pct):
-    ser = svc.open()
-    try:
-      return self._setPosition(ser, num, pct)
-    finally:
-      svc.close()
+  def isActive(self, registers):
+    # either motor still running, the bits are set while it moves
+    b1, b2 = getMsgData(registers[(self.mod, 0x31)])
+    return (b2 & 0x0F) != 0
 
-  def _setPosition(self, ser, num, pct):
+  async def setPosition(self, svc: DominoService, num, pct):
+    return await self._setPosition(svc, num, pct)
+
+  async def _setPosition(self, svc: DominoService, num, pct):
     d1 = 0x01 if num == 1 else 0x02
     pct = min(max(0, pct), 100)
     d2 = int(pct * 55 / 100)
     _LOGGER.info(f"setPosition on {self.mod}, num: {num}, pct: {pct}, d2: {d2}, d2hex: {hex(d2)}")
-    return exchangeMsg(ser, sendReqStatus(self.mod, 0x10, d1 = d1, d2 = d2))
+    # the direction depends on where the motor is now, which the bus does not tell us
+    return await self._write(svc, num, d1, d2, None)
 
-  def doOpen(self, svc: DominoService, num):
-    ser = svc.open()
-    try:
-      return self._doOpen(ser, num)
-    finally:
-      svc.close()
+  async def doOpen(self, svc: DominoService, num):
+    return await self._doOpen(svc, num)
 
-  def _doOpen(self, ser, num):
+  async def _doOpen(self, svc: DominoService, num):
     d1 = 0x01 if num == 1 else 0x04
     d2 = 0x01 if num == 1 else 0x04
     _LOGGER.info(f"doOpen on {self.mod}, num: {num}, d1: {hex(d1)}, d2: {hex(d2)}")
-    return exchangeMsg(ser, sendReqStatus(self.mod, 0x10, d1 = d1, d2 = d2))
+    return await self._write(svc, num, d1, d2, MotorContainer.MotorStatus.MotorMovement.OPENING)
 
-  def doClose(self, svc: DominoService, num):
-    ser = svc.open()
-    try:
-      return self._doClose(ser, num)
-    finally:
-      svc.close()
+  async def doClose(self, svc: DominoService, num):
+    return await self._doClose(svc, num)
 
-  def _doClose(self, ser, num):
+  async def _doClose(self, svc: DominoService, num):
     d1 = 0x01 if num == 1 else 0x08
     d2 = 0x02 if num == 2 else 0x08
     _LOGGER.info(f"doClose on {self.mod}, num: {num}, d1: {hex(d1)}, d2: {hex(d2)}")
-    return exchangeMsg(ser, sendReqStatus(self.mod, 0x10, d1 = d1, d2 = d2))
+    return await self._write(svc, num, d1, d2, MotorContainer.MotorStatus.MotorMovement.CLOSING)
 
-  def doStop(self, svc: DominoService, num):
-    ser = svc.open()
-    try:
-      return self._doStop(ser, num)
-    finally:
-      svc.close()
+  async def doStop(self, svc: DominoService, num):
+    return await self._doStop(svc, num)
   
-  def _doStop(self, ser, num):
+  async def _doStop(self, svc: DominoService, num):
     d1 = 0x03 if num == 1 else 0x0C
     d2 = 0
     _LOGGER.info(f"doStop on {self.mod}, num: {num}, d1: {hex(d1)}, d2: {hex(d2)}")
-    return exchangeMsg(ser, sendReqStatus(self.mod, 0x10, d1 = d1, d2 = d2))
+    return await self._write(svc, num, d1, d2, MotorContainer.MotorStatus.MotorMovement.STOPPED)
+
+  async def _write(self, svc: DominoService, num, d1, d2, movement):
+    key = (self.mod, 0x31)
+    try:
+      ans = await svc.exchange(sendReqStatus(self.mod, 0x10, d1 = d1, d2 = d2))
+    except Exception:
+      svc.cache.invalidate(key)
+      raise
+    frame = svc.cache.peek(key)
+    svc.scheduler.boost([key])
+    if (movement is None):
+      svc.cache.invalidate(key)
+    elif (frame is not None):
+      # write-through: the commanded motor is now moving (or stopped) the way we asked
+      b1, b2 = getMsgData(frame)
+      svc.cache.patch(key, b1, applyMotorMovement(b2, num, movement))
+    return ans
 
   class MotorStatus:
 
@@ -518,26 +702,68 @@ class MotorContainer:
       return "MotorStatus: motor 1 " + str(self.getMotor1()) + " motor 2 " + str(self.getMotor2())
 
 class Motor:
-  def __init__(self, motor:MotorContainer, num):
+  cacheClass = CACHE_MOTOR
+
+  def __init__(self, motor:MotorContainer, num, openTime = None, closeTime = None, invertPosition = True):
     self.motor = motor
     self.num = num
+    # a set position drives the motor to 100 - position, as it always did, open and close are not affected
+    self.invertPosition = invertPosition
+    self.travel = TravelModel(openTime, closeTime)
+    # positions set faster than the motor container takes them, only the last one is sent
+    self.writes = LatestWins(lambda target: self._setPosition(*target), f"motor {motor.mod}.{num}")
   
   @property
   def mod(self):
       return self.motor.mod
   
-  def status(self, svc: DominoService):
-    status = self.motor.status(svc)
+  async def status(self, svc: DominoService):
+    status = await self.motor.status(svc)
+    return self._motorStatus(status)
+
+  def registers(self):
+    return self.motor.registers()
+
+  async def readStatus(self, svc: DominoService):
+    return self._motorStatus(await self.motor.readStatus(svc))
+
+  def decode(self, registers):
+    return self._motorStatus(self.motor.decode(registers))
+
+  def _motorStatus(self, status):
     return status.getMotor1() if self.num == 1 else status.getMotor2()
+
+  def isActive(self, registers):
+    # the container is polled as a whole, until both its motors have stopped
+    return self.motor.isActive(registers)
+
+  def observe(self, movement):
+    # feed the motion bits read from the bus to the position estimate
+    directions = {
+      MotorContainer.MotorStatus.MotorMovement.OPENING: OPENING,
+      MotorContainer.MotorStatus.MotorMovement.CLOSING: CLOSING,
+      MotorContainer.MotorStatus.MotorMovement.STOPPED: STOPPED,
+    }
+    return self.travel.observe(directions[movement])
   
-  def setPosition(self, svc: DominoService, pct):
-    self.motor.setPosition(svc, self.num, pct)
+  async def setPosition(self, svc: DominoService, pct):
+    await self.writes.submit((svc, pct))
+
+  async def _setPosition(self, svc: DominoService, pct):
+    await self.motor.setPosition(svc, self.num, pct)
+    self.travel.move(min(max(0, pct), 100))
   
-  def doOpen(self, svc: DominoService):
-    self.motor.doOpen(svc, self.num)
+  async def doOpen(self, svc: DominoService):
+    self.writes.discard()
+    await self.motor.doOpen(svc, self.num)
+    self.travel.move(100)
   
-  def doClose(self, svc: DominoService):
-    self.motor.doClose(svc, self.num)
+  async def doClose(self, svc: DominoService):
+    self.writes.discard()
+    await self.motor.doClose(svc, self.num)
+    self.travel.move(0)
   
-  def doStop(self, svc: DominoService):
-    self.motor.doStop(svc, self.num)
+  async def doStop(self, svc: DominoService):
+    self.writes.discard()
+    await self.motor.doStop(svc, self.num)
+    self.travel.stop()
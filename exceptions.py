@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+class DominoError(Exception):
+  """Base class of the errors raised talking to the Domino bus."""
+
+class BusConnectionError(DominoError, ConnectionError):
+  """The serial line is closed or could not be (re)opened."""
+
+class ModuleError(DominoError):
+  def __init__(self, mod, message):
+    super().__init__(f"module {mod}: {message}")
+    self.mod = mod
+
+class ModuleTimeoutError(ModuleError, TimeoutError):
+  """The module did not answer in time."""
+
+class ModuleNakError(ModuleError):
+  """The module answered with a NAK."""
+
+  def __init__(self, mod, func):
+    super().__init__(mod, f"NAK to function {hex(func)}")
+    self.func = func
+
+class ModuleUnavailableError(ModuleError):
+  """The circuit breaker of the module is open, the request was not sent."""
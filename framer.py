@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+FRAME_HEADER = 0x55
+FRAME_LENGTH = 7
+
+def isValidFrame(frame):
+  # calcMessage appends 0xFF - (sum & 0xFF), so a good frame always sums to 0xFF
+  return (sum(frame) & 0xFF) == 0xFF
+
+class FrameDecoder:
+  """Incremental decoder that cuts the bus byte stream into checked frames.
+
+  Bytes are appended to a preallocated buffer and complete frames are
+  yielded as memoryview slices of it, they are only valid until the next
+  call to feed().
+  """
+
+  def __init__(self, capacity = 256):
+    self._buf = bytearray(capacity)
+    self._view = memoryview(self._buf)
+    self._start = 0
+    self._end = 0
+    self.frameCount = 0
+    self.resyncCount = 0
+    self.checksumErrorCount = 0
+    self.discardedBytes = 0
+
+  def __len__(self):
+    return self._end - self._start
+
+  def clear(self):
+    self.discardedBytes += self._end - self._start
+    self._start = 0
+    self._end = 0
+
+  def feed(self, data):
+    size = len(data)
+    if (self._end + size > len(self._buf)):
+      pending = self._end - self._start
+      if (pending + size > len(self._buf)):
+        buf = bytearray(max(2 * len(self._buf), pending + size))
+        buf[0:pending] = self._view[self._start:self._end]
+        self._buf = buf
+        self._view = memoryview(buf)
+      elif (pending > 0):
+        self._buf[0:pending] = self._view[self._start:self._end]
+      self._start = 0
+      self._end = pending
+    self._buf[self._end:self._end + size] = data
+    self._end += size
+
+  def frames(self):
+    buf = self._buf
+    while (self._end - self._start >= FRAME_LENGTH):
+      start = self._start
+      if (buf[start] != FRAME_HEADER):
+        self.resyncCount += 1
+        idx = buf.find(FRAME_HEADER, start + 1, self._end)
+        if (idx < 0):
+          idx = self._end
+        _LOGGER.debug(f"Resync: skipping {idx - start} bytes")
+        self.discardedBytes += idx - start
+        self._start = idx
+        continue
+      frame = self._view[start:start + FRAME_LENGTH]
+      if (not isValidFrame(frame)):
+        # the header we locked on may be a data byte, look for the next one
+        self.checksumErrorCount += 1
+        self.discardedBytes += 1
+        self._start = start + 1
+        continue
+      self._start = start + FRAME_LENGTH
+      self.frameCount += 1
+      yield frame
+    if (self._start == self._end):
+      self._start = 0
+      self._end = 0
+
+  def stats(self):
+    return {
+      "frames": self.frameCount,
+      "resyncs": self.resyncCount,
+      "checksum_errors": self.checksumErrorCount,
+      "discarded_bytes": self.discardedBytes,
+    }
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+class DominoHub:
+  """The buses behind one config entry. Each DominoService owns its transport,
+  queue and scheduler, so the buses are polled side by side and a poll cycle
+  takes as long as the slowest bus, not all of them in a row."""
+
+  def __init__(self, buses, source = None):
+    if (len(buses) == 0):
+      raise ValueError("a hub needs at least one bus")
+    self.buses = list(buses)
+    # what the buses were set up from, so a reload can tell whether it changed
+    self.source = source
+
+  @property
+  def primary(self):
+    # the bus of the entry data, its entities keep the unique ids they had before there were others
+    return self.buses[0]
+
+  def bus(self, com_port):
+    return next((bus for bus in self.buses if bus.com_port == com_port), None)
+
+  async def connect(self):
+    await asyncio.gather(*[bus.connect() for bus in self.buses])
+
+  async def disconnect(self):
+    await asyncio.gather(*[bus.disconnect() for bus in self.buses])
+
+  def listen(self, enabled = True):
+    for bus in self.buses:
+      bus.listen(enabled)
+
+  def setCacheTimes(self, ttls):
+    for bus in self.buses:
+      bus.cache.ttls.update(ttls)
+      bus.scheduler.replan()
+
+  def start(self):
+    for bus in self.buses:
+      bus.scheduler.start()
+
+  async def stop(self):
+    await asyncio.gather(*[bus.scheduler.stop() for bus in self.buses])
+
+  async def refresh(self):
+    # one full sweep of every bus, in parallel
+    results = await asyncio.gather(*[bus.scheduler.refresh() for bus in self.buses], return_exceptions = True)
+    for bus, result in zip(self.buses, results):
+      if (isinstance(result, Exception)):
+        _LOGGER.error(f"Error during poll cycle on {bus.com_port}: {result}")
+
+  def snapshot(self):
+    return {bus.com_port: bus.snapshot() for bus in self.buses}
+
+  def restoreSnapshot(self, snapshot, elapsed):
+    for bus in self.buses:
+      if (bus.com_port in snapshot):
+        bus.restoreSnapshot(snapshot[bus.com_port], elapsed)
+
+  def stats(self):
+    return {bus.com_port: bus.stats() for bus in self.buses}
+
+  def __repr__(self):
+    return f"DominoHub: {', '.join(bus.com_port for bus in self.buses)}"
@@ -8,10 +8,11 @@ from homeassistant.components.light import (
     ColorMode,
     ATTR_BRIGHTNESS,
 )
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .dominoService import DominoService, Dimmer, Light, LightContainer
+from .dominoService import DominoService, Dimmer, Light
+from .hub import DominoHub
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -23,50 +24,35 @@ async def async_setup_entry(
 ) -> None:
     """Set up Domino dimmer lights from a config entry."""
 
-    # Retrieve the shared API instance created in __init__.py
-    domService: DominoService = entry.runtime_data
-
-    dimmers = [
-        DimmerEntity(domService, Dimmer(23), "Dimmer sala - Cucina"),
-        DimmerEntity(domService, Dimmer(24), "Dimmer sala - TV"),
-        DimmerEntity(domService, Dimmer(25), "Dimmer sala - Balcone"),
-    ]
-
-    lightContainer1 = LightContainer(1)
-    lightContainer2 = LightContainer(2)
-    lightContainer3 = LightContainer(3)
-    lightContainer4 = LightContainer(4)
-    lightContainer5 = LightContainer(5)
-
-    lights = [
-        DominoLightEntity(domService, Light(lightContainer2, 1), "Luce - Cucina"),
-        DominoLightEntity(domService, Light(lightContainer2, 2), "Luce - Boh"),
-        DominoLightEntity(domService, Light(lightContainer2, 3), "Luce - Ingresso"),
-        DominoLightEntity(domService, Light(lightContainer5, 4), "Luce - Corridoio"),
-        DominoLightEntity(domService, Light(lightContainer3, 4), "Luce - Bagno Grande"),
-        DominoLightEntity(domService, Light(lightContainer3, 2), "Luce - Camera Matrimoniale"),
-        DominoLightEntity(domService, Light(lightContainer5, 3), "Luce - Bagno Piccolo"),
-        DominoLightEntity(domService, Light(lightContainer5, 2), "Luce - Camera Leti"),
-        DominoLightEntity(domService, Light(lightContainer4, 1), "Luce - Camera Francesco"),
-    ]
-
-    deviceName = "Domino Hub - Balcony Lights"
-    deviceId = 'balcony_lights'
-    lightsBalcony = [
-        DominoLightEntity(domService, Light(lightContainer1, 4), "Luce - Balcone sala", deviceName, deviceId),
-        DominoLightEntity(domService, Light(lightContainer3, 1), "Luce - Balcone camera", deviceName, deviceId),
-        DominoLightEntity(domService, Light(lightContainer4, 2), "Luce - Balcone camera fra", deviceName, deviceId),
-    ]
-
-    async_add_entities(dimmers)
-    async_add_entities(lights)
-    async_add_entities(lightsBalcony)
+    # Retrieve the shared hub created in __init__.py
+    hub: DominoHub = entry.runtime_data
+
+    for domService in hub.buses:
+        deviceMap = domService.deviceMap
+
+        dimmers = [DimmerEntity(domService, item.device, item.name) for item in deviceMap.dimmers]
+
+        lightsByEntry = {
+            id(item): DominoLightEntity(domService, item.device, item.name, item.deviceName, item.deviceId)
+            for item in deviceMap.lights
+        }
+        lights = list(lightsByEntry.values())
+
+        groups = [
+            DominoLightGroupEntity(domService, [lightsByEntry[id(item)] for item in group.entries], group.name, group.groupId)
+            for group in deviceMap.groups
+        ]
+
+        async_add_entities(dimmers)
+        async_add_entities(lights)
+        async_add_entities(groups)
 
 class DominoLightEntity(LightEntity):
     """Representation of a Domino light."""
 
     _attr_supported_color_modes = {ColorMode.ONOFF}
     _attr_color_mode = ColorMode.ONOFF
+    _attr_should_poll = False
 
     def __init__(self, domService: DominoService, light: Light, name: str, deviceName: str = None, deviceId: str = "lights") -> None:
         self._domService = domService
@@ -75,11 +61,11 @@ class DominoLightEntity(LightEntity):
         self._attr_is_on = False
 
         # Unique ID based on light address
-        self._attr_unique_id = f"domino_light_{light.mod}_{light.num}"
+        self._attr_unique_id = domService.uniqueId(f"domino_light_{light.mod}_{light.num}")
 
         # Optional: group all lights under one device
         self._attr_device_info = {
-            "identifiers": {("domino_hub", deviceId)},
+            "identifiers": {("domino_hub", domService.uniqueId(deviceId))},
             "name": deviceName if deviceName is not None else "Domino Hub - Lights",
             "manufacturer": "Domino",
             "model": "Domino Serial Hub",
@@ -122,12 +108,26 @@ class DominoLightEntity(LightEntity):
         """Fetch the latest state from the device."""
         try:
             status = await self._getLightStatus()
-
-            _LOGGER.debug(f"Update {self._attr_name} status: {status}")
-
-            self._attr_is_on = status
+            self._updateStatus(status)
         except Exception as e:
             _LOGGER.error(f"Error updating {self._attr_name}: {e}")
+
+    @callback
+    def _onStatus(self, status) -> None:
+        """Handle a status pushed by the bus scheduler."""
+        self._updateStatus(status)
+        self.async_write_ha_state()
+
+    @callback
+    def _onAvailable(self, available: bool) -> None:
+        """Handle the module of this entity going offline or coming back."""
+        self._attr_available = available
+        self.async_write_ha_state()
+
+    def _updateStatus(self, status) -> None:
+        _LOGGER.debug(f"Update {self._attr_name} status: {status}")
+
+        self._attr_is_on = status
     
     async def async_added_to_hass(self):
         """Called when entity is added to Home Assistant."""
@@ -138,6 +138,15 @@ class DominoLightEntity(LightEntity):
         if old_state is not None and old_state.state != "unavailable":
             self._restoreState(old_state)
 
+        self.async_on_remove(self._domService.scheduler.register([self._light], self._onStatus, self._onAvailable))
+
+    @callback
+    def _groupSwitched(self, isOn: bool) -> None:
+        """Reflect a group command that already switched this light."""
+        self._attr_is_on = isOn
+        if self.hass is not None:
+            self.async_write_ha_state()
+
     def _restoreState(self, old_state):
             # Restore on/off state
             self._attr_is_on = old_state.state == "on"
@@ -149,16 +158,75 @@ class DominoLightEntity(LightEntity):
             )
 
     async def _getLightStatus(self):
-        return await self.hass.async_add_executor_job(self._light.status, self._domService) 
+        return await self._light.status(self._domService)
 
     async def _setLight(self, pct):
-        return await self.hass.async_add_executor_job(self._light.setLight, self._domService, pct) 
+        return await self._light.setLight(self._domService, pct)
+
+class DominoLightGroupEntity(LightEntity):
+    """Several Domino lights switched together, with one frame per light container."""
+
+    _attr_supported_color_modes = {ColorMode.ONOFF}
+    _attr_color_mode = ColorMode.ONOFF
+    _attr_should_poll = False
+
+    def __init__(self, domService: DominoService, members: list[DominoLightEntity], name: str, groupId: str) -> None:
+        self._domService = domService
+        self._members = members
+        self._attr_name = name
+        self._attr_is_on = False
+
+        self._attr_unique_id = domService.uniqueId(f"domino_light_group_{groupId}")
+
+        self._attr_device_info = {
+            "identifiers": {("domino_hub", domService.uniqueId("lights"))},
+            "name": "Domino Hub - Lights",
+            "manufacturer": "Domino",
+            "model": "Domino Serial Hub",
+        }
+
+    @property
+    def is_on(self):
+        return self._attr_is_on
+
+    async def async_turn_on(self, **kwargs: Any) -> None:
+        """Turn on every light of the group."""
+        await self._switch(True)
+
+    async def async_turn_off(self, **kwargs: Any) -> None:
+        """Turn off every light of the group."""
+        await self._switch(False)
+
+    async def _switch(self, isOn: bool) -> None:
+        try:
+            frames = await self._domService.setLights([m._light for m in self._members], 100 if isOn else 0)
+        except Exception as e:
+            _LOGGER.error(f"Error switching {self._attr_name}: {e}")
+            return
+
+        for member in self._members:
+            member._groupSwitched(isOn)
+        self._attr_is_on = isOn
+
+        _LOGGER.info(f"Turn {'ON' if isOn else 'OFF'} {self._attr_name} with {frames} bus frames")
+        self.async_write_ha_state()
+
+    async def async_added_to_hass(self):
+        """Called when entity is added to Home Assistant."""
+        self.async_on_remove(self._domService.scheduler.register([m._light for m in self._members], self._onStatus))
+
+    @callback
+    def _onStatus(self, *statuses) -> None:
+        """Handle the statuses pushed by the bus scheduler."""
+        self._attr_is_on = any(statuses)
+        self.async_write_ha_state()
 
 class DimmerEntity(LightEntity):
     """Representation of a Domino dimmer light."""
 
     _attr_supported_color_modes = {ColorMode.BRIGHTNESS}
     _attr_color_mode = ColorMode.BRIGHTNESS
+    _attr_should_poll = False
 
     def __init__(self, domService: DominoService, light: Dimmer, name: str) -> None:
         self._domService = domService
@@ -169,11 +237,11 @@ class DimmerEntity(LightEntity):
         self._attr_prev_brightness = 0
 
         # Unique ID based on dimmer address
-        self._attr_unique_id = f"domino_dimmer_{light.mod}"
+        self._attr_unique_id = domService.uniqueId(f"domino_dimmer_{light.mod}")
 
         # Optional: group all lights under one device
         self._attr_device_info = {
-            "identifiers": {("domino_hub", "dimmers")},
+            "identifiers": {("domino_hub", domService.uniqueId("dimmers"))},
             "name": "Domino Hub - Dimmers",
             "manufacturer": "Domino",
             "model": "Domino Serial Hub",
@@ -236,19 +304,32 @@ class DimmerEntity(LightEntity):
         """Fetch the latest state from the device."""
         try:
             status = await self._getLightStatus()
+            self._updateStatus(status)
+        except Exception as e:
+            _LOGGER.error(f"Error updating {self._attr_name}: {e}")
 
-            pct = status # 0–100
-            bri = int(pct * 255 / 100)
-            
-            _LOGGER.debug(f"Update {self._attr_name} status: {status} -> brightness={bri}")
+    @callback
+    def _onStatus(self, status) -> None:
+        """Handle a status pushed by the bus scheduler."""
+        self._updateStatus(status)
+        self.async_write_ha_state()
 
-            self._attr_brightness = bri
-            self._attr_is_on = pct > 0
-            if (self._attr_prev_brightness == 0 and self._attr_brightness > 0):
-                self._attr_prev_brightness = self._attr_brightness
+    @callback
+    def _onAvailable(self, available: bool) -> None:
+        """Handle the module of this entity going offline or coming back."""
+        self._attr_available = available
+        self.async_write_ha_state()
 
-        except Exception as e:
-            _LOGGER.error(f"Error updating {self._attr_name}: {e}")
+    def _updateStatus(self, status) -> None:
+        pct = status # 0–100
+        bri = int(pct * 255 / 100)
+        
+        _LOGGER.debug(f"Update {self._attr_name} status: {status} -> brightness={bri}")
+
+        self._attr_brightness = bri
+        self._attr_is_on = pct > 0
+        if (self._attr_prev_brightness == 0 and self._attr_brightness > 0):
+            self._attr_prev_brightness = self._attr_brightness
     
     async def async_added_to_hass(self):
         """Called when entity is added to Home Assistant."""
@@ -274,9 +355,11 @@ class DimmerEntity(LightEntity):
                 f"is_on={self._attr_is_on}, brightness={self._attr_brightness}, prev_brightness={self._attr_prev_brightness}"
             )
 
+        self.async_on_remove(self._domService.scheduler.register([self._light], self._onStatus, self._onAvailable))
+
     async def _getLightStatus(self):
-        return await self.hass.async_add_executor_job(self._light.status, self._domService) 
+        return await self._light.status(self._domService)
 
     async def _setLight(self, pct):
-        return await self.hass.async_add_executor_job(self._light.setLight, self._domService, pct) 
+        return await self._light.setLight(self._domService, pct)
 
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import logging
+import time
+from collections import deque
+
+_LOGGER = logging.getLogger(__name__)
+
+# upper bounds, in seconds, of the latency histogram buckets, the last one catches everything else
+LATENCY_BUCKETS = (0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, float("inf"))
+UTILIZATION_WINDOW = 60
+
+OUTCOME_OK = "ok"
+OUTCOME_NAK = "nak"
+OUTCOME_TIMEOUT = "timeout"
+OUTCOME_ERROR = "error"
+
+class LatencyHistogram:
+  def __init__(self):
+    self.buckets = [0] * len(LATENCY_BUCKETS)
+    self.count = 0
+    self.total = 0.0
+    self.max = 0.0
+
+  def add(self, latency):
+    for idx, bound in enumerate(LATENCY_BUCKETS):
+      if (latency <= bound):
+        self.buckets[idx] += 1
+        break
+    self.count += 1
+    self.total += latency
+    self.max = max(self.max, latency)
+
+  def mean(self):
+    return self.total / self.count if self.count > 0 else None
+
+  def percentile(self, pct):
+    # upper bound of the bucket holding the requested rank, capped by the observed maximum
+    if (self.count == 0):
+      return None
+    rank = pct / 100 * self.count
+    seen = 0
+    for idx, hits in enumerate(self.buckets):
+      seen += hits
+      if (seen >= rank and hits > 0):
+        return min(LATENCY_BUCKETS[idx], self.max)
+    return self.max
+
+  def asDict(self):
+    labels = [f"le_{int(b * 1000)}ms" if b != float("inf") else "le_inf" for b in LATENCY_BUCKETS]
+    return dict(zip(labels, self.buckets))
+
+class ExchangeMetrics:
+  def __init__(self):
+    self.latency = LatencyHistogram()
+    self.ok = 0
+    self.naks = 0
+    self.timeouts = 0
+    self.errors = 0
+    self.retries = 0
+    self.busTime = 0.0
+    self.lastOutcome = None
+
+  def record(self, latency, outcome):
+    # nothing re-sends a failed frame by itself, the next request for a register that
+    # failed last time is the retry as far as the bus is concerned
+    if (self.lastOutcome is not None and self.lastOutcome != OUTCOME_OK):
+      self.retries += 1
+    self.lastOutcome = outcome
+    self.busTime += latency
+    if (outcome == OUTCOME_OK):
+      self.ok += 1
+      self.latency.add(latency)
+    elif (outcome == OUTCOME_NAK):
+      self.naks += 1
+      self.latency.add(latency)
+    elif (outcome == OUTCOME_TIMEOUT):
+      self.timeouts += 1
+    else:
+      self.errors += 1
+
+  @property
+  def requests(self):
+    return self.ok + self.naks + self.timeouts + self.errors
+
+  def asDict(self):
+    p95 = self.latency.percentile(95)
+    mean = self.latency.mean()
+    return {
+      "requests": self.requests,
+      "naks": self.naks,
+      "timeouts": self.timeouts,
+      "errors": self.errors,
+      "retries": self.retries,
+      "latency_mean_ms": round(mean * 1000, 1) if mean is not None else None,
+      "latency_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+      "latency_max_ms": round(self.latency.max * 1000, 1),
+      "histogram": self.latency.asDict(),
+    }
+
+class BusMetrics:
+  """Latency histograms and error counts per (module, function), plus bus utilization."""
+
+  def __init__(self):
+    self.exchanges = {}
+    self._busy = deque()
+    self._moduleListeners = []
+
+  def addModuleListener(self, listener):
+    self._moduleListeners.append(listener)
+
+    def remove():
+      if (listener in self._moduleListeners):
+        self._moduleListeners.remove(listener)
+
+    return remove
+
+  def record(self, mod, func, latency, outcome):
+    key = (mod, func)
+    metrics = self.exchanges.get(key)
+    if (metrics is None):
+      isNewModule = mod not in self.modules()
+      metrics = self.exchanges[key] = ExchangeMetrics()
+      if (isNewModule):
+        for listener in list(self._moduleListeners):
+          listener(mod)
+    metrics.record(latency, outcome)
+    now = time.monotonic()
+    self._busy.append((now, latency))
+    self._expire(now)
+    if (outcome != OUTCOME_OK):
+      _LOGGER.debug(f"Exchange {hex(func)} with module {mod}: {outcome} after {latency:.3f}s")
+
+  def _expire(self, now):
+    while (len(self._busy) > 0 and self._busy[0][0] < now - UTILIZATION_WINDOW):
+      self._busy.popleft()
+
+  def utilization(self):
+    # share of the last UTILIZATION_WINDOW seconds the bus spent on exchanges
+    now = time.monotonic()
+    self._expire(now)
+    busy = sum(latency for (_, latency) in self._busy)
+    return min(1.0, busy / UTILIZATION_WINDOW)
+
+  def modules(self):
+    return sorted({mod for (mod, _) in self.exchanges})
+
+  def module(self, mod):
+    return {func: metrics for ((m, func), metrics) in self.exchanges.items() if m == mod}
+
+  def moduleSummary(self, mod):
+    functions = self.module(mod)
+    latency = LatencyHistogram()
+    summary = {"requests": 0, "naks": 0, "timeouts": 0, "errors": 0, "retries": 0, "busTime": 0.0}
+    for metrics in functions.values():
+      for name in summary:
+        summary[name] += getattr(metrics, name)
+      for idx, hits in enumerate(metrics.latency.buckets):
+        latency.buckets[idx] += hits
+      latency.count += metrics.latency.count
+      latency.total += metrics.latency.total
+      latency.max = max(latency.max, metrics.latency.max)
+    summary["latency"] = latency
+    summary["functions"] = {hex(func): metrics.asDict() for (func, metrics) in sorted(functions.items())}
+    return summary
+
+  def slowestModule(self):
+    # the module costing the bus the most time, timeouts included
+    worst = None
+    worstCost = 0
+    for mod in self.modules():
+      cost = sum(metrics.busTime for metrics in self.module(mod).values())
+      if (cost > worstCost):
+        worst = mod
+        worstCost = cost
+    return worst
+
+  def totals(self):
+    totals = {"requests": 0, "naks": 0, "timeouts": 0, "errors": 0, "retries": 0}
+    for metrics in self.exchanges.values():
+      for name in totals:
+        totals[name] += getattr(metrics, name)
+    return totals
@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import mmap
+import os
+import struct
+import time
+
+from .exceptions import BusConnectionError
+from .transport import DIRECTION_RECEIVED, DIRECTION_SENT, BusTransport
+
+_LOGGER = logging.getLogger(__name__)
+
+# A capture is a fixed size ring file: a header, then CAPTURE_CAPACITY records written
+# round-robin, so a recorder left running keeps the latest traffic without growing.
+#
+#   header: magic, version, capacity (records), count (records ever written), start (epoch seconds)
+#   record: nanoseconds since start, direction, module, frame
+CAPTURE_MAGIC = b"DOMCAP"
+CAPTURE_VERSION = 1
+HEADER = struct.Struct("<6sHIQd")
+RECORD = struct.Struct("<qBB7s")
+# the record up to its frame, the frame bytes are copied in after it
+RECORD_PREFIX = struct.Struct("<qBB")
+CAPTURE_CAPACITY = 65536
+# records held in memory before they go to the file in one write
+FLUSH_RECORDS = 256
+# longest pause replayed between two frames, in capture seconds: a quiet night or a
+# restart in the middle of a capture is skipped over rather than waited out
+REPLAY_MAX_GAP = 5
+
+class BusRecorder:
+  """Writes every frame the transport sends and receives to a capture file.
+  Frames are buffered on the event loop and written by a thread of its own, in
+  order, so a slow disk never holds up the bus."""
+
+  def __init__(self, path, capacity = CAPTURE_CAPACITY):
+    self.path = path
+    self.capacity = capacity
+    self.count = 0
+    self._fd = None
+    self._start = None
+    self._startTime = None
+    # records not yet written, and the ring slot the first of them goes to
+    self._buffer = bytearray(FLUSH_RECORDS * RECORD.size)
+    self._buffered = 0
+    self._bufferSlot = 0
+    self._writer = None
+
+  @property
+  def isOpen(self):
+    return self._fd is not None
+
+  def open(self):
+    # blocking, run it in an executor from the event loop
+    self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+    size = HEADER.size + self.capacity * RECORD.size
+    header = os.pread(self._fd, HEADER.size, 0)
+    if (len(header) == HEADER.size and os.fstat(self._fd).st_size == size
+        and HEADER.unpack(header)[:3] == (CAPTURE_MAGIC, CAPTURE_VERSION, self.capacity)):
+      # a restart goes on with the same capture, the traffic before it is usually what matters
+      (_, _, _, self.count, self._startTime) = HEADER.unpack(header)
+    else:
+      os.ftruncate(self._fd, 0)
+      os.ftruncate(self._fd, size)
+      self.count = 0
+      self._startTime = time.time()
+    # timestamps count from the start of the capture, across restarts
+    self._start = time.monotonic_ns() - int((time.time() - self._startTime) * 1e9)
+    self._buffered = 0
+    self._bufferSlot = self.count % self.capacity
+    self._writeHeader(self.count)
+    self._writer = ThreadPoolExecutor(max_workers = 1, thread_name_prefix = "domino_hub_recorder")
+    _LOGGER.info(f"Recording bus traffic to {self.path}, {self.count} of {self.capacity} frames recorded")
+
+  def record(self, direction, frame):
+    if (self._fd is None):
+      return
+    offset = self._buffered * RECORD.size
+    RECORD_PREFIX.pack_into(self._buffer, offset, time.monotonic_ns() - self._start, direction, frame[3])
+    self._buffer[offset + RECORD_PREFIX.size:offset + RECORD.size] = frame
+    self._buffered += 1
+    self.count += 1
+    if (self._buffered == FLUSH_RECORDS):
+      self.flush()
+
+  def flush(self):
+    # hands the buffered records to the writer thread, returns at once
+    if (self._fd is None or self._buffered == 0):
+      return None
+    records = bytes(memoryview(self._buffer)[:self._buffered * RECORD.size])
+    slot = self._bufferSlot
+    self._buffered = 0
+    self._bufferSlot = self.count % self.capacity
+    return self._writer.submit(self._write, records, slot, self.count)
+
+  def _write(self, records, slot, count):
+    view = memoryview(records)
+    while (len(view) > 0):
+      # up to the end of the ring, then around to its first slot
+      size = min(len(view), (self.capacity - slot) * RECORD.size)
+      os.pwrite(self._fd, view[:size], HEADER.size + slot * RECORD.size)
+      view = view[size:]
+      slot = 0
+    self._writeHeader(count)
+
+  def _writeHeader(self, count):
+    os.pwrite(self._fd, HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, self.capacity, count, self._startTime), 0)
+
+  def close(self):
+    # blocking, run it in an executor once the recorder is off the transport
+    if (self._fd is None):
+      return
+    try:
+      self.flush()
+      self._writer.shutdown(wait = True)
+    finally:
+      os.close(self._fd)
+      self._fd = None
+      self._writer = None
+    _LOGGER.info(f"Recorded {self.count} frames to {self.path}")
+
+class CaptureReader:
+  """Memory-mapped view of a capture file, iterated oldest frame first."""
+
+  def __init__(self, path):
+    self.path = path
+    with open(path, "rb") as f:
+      self._mmap = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+    magic, version, self.capacity, self.count, self.startTime = HEADER.unpack_from(self._mmap, 0)
+    if (magic != CAPTURE_MAGIC or version != CAPTURE_VERSION):
+      self.close()
+      raise ValueError(f"{path}: not a version {CAPTURE_VERSION} bus capture")
+
+  def __len__(self):
+    return min(self.count, self.capacity)
+
+  def __iter__(self):
+    # a ring that went around starts at the slot written next, the oldest one
+    first = self.count % self.capacity if self.count > self.capacity else 0
+    for idx in range(len(self)):
+      offset = HEADER.size + ((first + idx) % self.capacity) * RECORD.size
+      yield CaptureReader.Record(*RECORD.unpack_from(self._mmap, offset))
+
+  def close(self):
+    self._mmap.close()
+
+  class Record:
+    __slots__ = ("timestamp", "direction", "mod", "frame")
+
+    def __init__(self, nanoseconds, direction, mod, frame):
+      self.timestamp = nanoseconds / 1e9
+      self.direction = direction
+      self.mod = mod
+      self.frame = frame
+
+    def __repr__(self):
+      arrow = ">" if self.direction == DIRECTION_SENT else "<"
+      return f"{self.timestamp:.6f} {arrow} {self.mod}: {self.frame.hex(' ')}"
+
+class ReplayTransport(BusTransport):
+  """Plays the received side of a capture into the decoder, with the original
+  timing divided by speed (0 for as fast as possible) and pauses cut to maxGap.
+  Requests go nowhere and get whatever reply the capture has for their module
+  at that point."""
+
+  def __init__(self, path, speed = 1.0, maxGap = REPLAY_MAX_GAP):
+    super().__init__(path, None)
+    self.speed = speed
+    self.maxGap = maxGap
+    self.reader = None
+    self.sentCount = 0
+    self.finished = asyncio.Event()
+    self._task = None
+
+  @property
+  def isOpen(self):
+    return self.reader is not None
+
+  def open(self):
+    if (self.reader is not None):
+      return
+    self._loop = asyncio.get_running_loop()
+    self.reader = CaptureReader(self.com_port)
+    self.decoder.clear()
+    self.finished.clear()
+    self._task = self._loop.create_task(self._play())
+    _LOGGER.debug(f"Replaying {len(self.reader)} frames from {self.com_port}")
+
+  def close(self):
+    if (self.reader is None):
+      return
+    if (self._task is not None):
+      self._task.cancel()
+      self._task = None
+    self.reader.close()
+    self.reader = None
+    self._fail(BusConnectionError("capture closed"))
+
+  def _write(self, msg):
+    self.sentCount += 1
+
+  async def _play(self):
+    # paced from the first frame played, not from the start of the capture: a ring that went
+    # around, or a capture across restarts, starts hours into its clock
+    due = self._loop.time()
+    previous = None
+    for record in self.reader:
+      if (record.direction != DIRECTION_RECEIVED):
+        continue
+      if (self.speed > 0 and previous is not None):
+        due += min(max(0.0, record.timestamp - previous), self.maxGap) / self.speed
+        delay = due - self._loop.time()
+        if (delay > 0):
+          await asyncio.sleep(delay)
+      previous = record.timestamp
+      self._onData(record.frame)
+    self.finished.set()
@@ -7,4 +7,5 @@ sudo mkdir -p ${DST}
 sudo rm -rf ${DST}/*
 sudo cp *.py ${DST}/
 sudo cp *.json ${DST}/
+sudo cp *.yaml ${DST}/
 ls -al ${DST}/
\ No newline at end of file
@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+from .exceptions import ModuleError
+from .travel import START_LAG
+
+_LOGGER = logging.getLogger(__name__)
+
+# idle cadence of a device without a cache class, and the wait while nothing is registered
+POLL_INTERVAL = 30
+# with the bus monitor pushing changes as they happen, polling only reconciles missed frames
+RECONCILE_INTERVAL = 300
+# registers of a device in motion are read this often, until it reports it has stopped
+FAST_POLL_INTERVAL = 1
+# a commanded device may take this long before its status shows it moving
+BOOST_WINDOW = START_LAG
+# registers restored from a snapshot are re-read one after the other over this many seconds
+WARM_START_SPREAD = POLL_INTERVAL
+
+class BusScheduler:
+  """Reads every (module, function) register needed by the registered devices
+  on its own cadence and pushes the decoded status to their listeners: fast
+  while a device is moving, otherwise as soon as the cached value of its class
+  goes stale."""
+
+  def __init__(self, svc):
+    self._svc = svc
+    # only reconcile, at RECONCILE_INTERVAL at the most, while the bus monitor keeps the cache current
+    self.reconciling = False
+    # every successful read lands in the service register cache, decode from there
+    self.registers = svc.cache
+    self._subscriptions = []
+    # register -> subscriptions reading it, so a refreshed register reaches its listeners directly
+    self._index = {}
+    # register -> monotonic time of its next read, and the end of its post-command fast window
+    self._due = {}
+    self._boosted = {}
+    # register -> first read of a register restored from a snapshot, taken when it is registered
+    self._warmDue = {}
+    self._wake = asyncio.Event()
+    self._task = None
+    self.cycleCount = 0
+    self.lastCycleDuration = None
+
+  def register(self, devices, listener, onAvailable = None):
+    subscription = BusScheduler.Subscription(devices, listener, onAvailable)
+    self._subscriptions.append(subscription)
+    for key in subscription.keys:
+      self._index.setdefault(key, []).append(subscription)
+      self._due.setdefault(key, self._warmDue.pop(key, 0))
+    if (all(key in self.registers for key in subscription.keys)):
+      # what the cache already holds is served right away, not after the first read
+      asyncio.get_running_loop().call_soon(self._dispatch, subscription)
+    self._wake.set()
+    _LOGGER.debug(f"Registered {len(devices)} device(s) on {sorted(subscription.keys)}")
+
+    def unregister():
+      if (subscription in self._subscriptions):
+        self._subscriptions.remove(subscription)
+        for key in subscription.keys:
+          subscriptions = self._index[key]
+          subscriptions.remove(subscription)
+          if (len(subscriptions) == 0):
+            del self._index[key]
+            self._due.pop(key, None)
+            self._boosted.pop(key, None)
+
+    return unregister
+
+  def registerKeys(self):
+    return sorted(self._index)
+
+  def warmStart(self, keys, spread = WARM_START_SPREAD):
+    # restored registers are served as they are and re-read spread out, the oldest first, instead of all at once
+    keys = sorted(keys, key = lambda key: -self.registers.age(key))
+    now = time.monotonic()
+    for (i, key) in enumerate(keys):
+      self._warmDue[key] = now + spread * i / len(keys)
+
+  def setReconciling(self, enabled):
+    self.reconciling = enabled
+    self.replan()
+
+  def replan(self):
+    # a shorter cadence applies now, not after the reads already planned on the old one
+    now = time.monotonic()
+    for key in self._due:
+      self._due[key] = min(self._due[key], now + self.idleInterval(key))
+    self._wake.set()
+
+  def idleInterval(self, key):
+    # the register TTL of the most demanding device class reading it
+    ttls = [
+      self.registers.ttl(device.cacheClass) if hasattr(device, "cacheClass") else POLL_INTERVAL
+      for subscription in self._index.get(key, ()) for device in subscription.devices
+    ]
+    interval = min(ttls, default = POLL_INTERVAL)
+    return max(interval, RECONCILE_INTERVAL) if self.reconciling else interval
+
+  def deviceOf(self, mod):
+    # the first registered device reading a module, None for a module nobody reads
+    for func in (0x31, 0x30):
+      for subscription in self._index.get((mod, func), ()):
+        for device in subscription.devices:
+          if ((mod, func) in device.registers()):
+            return device
+    return None
+
+  def isActive(self, key):
+    # some device on this register reported it is moving in its last frame
+    for subscription in self._index.get(key, ()):
+      for device in subscription.devices:
+        isActive = getattr(device, "isActive", None)
+        if (isActive is not None and all(k in self.registers for k in device.registers()) and isActive(self.registers)):
+          return True
+    return False
+
+  def boost(self, keys, window = BOOST_WINDOW):
+    # a device was told to move: poll it fast until it is seen moving and then stopped
+    now = time.monotonic()
+    for key in keys:
+      if (not any(hasattr(device, "isActive") for subscription in self._index.get(key, ()) for device in subscription.devices)):
+        continue
+      self._boosted[key] = now + window
+      self._due[key] = min(self._due[key], now + FAST_POLL_INTERVAL)
+    self._wake.set()
+
+  def isFast(self, key, now = None):
+    now = time.monotonic() if now is None else now
+    return self._boosted.get(key, 0) > now or self.isActive(key)
+
+  def schedule(self, key):
+    # plan the next read of a register from what it just said
+    if (key not in self._index):
+      return
+    now = time.monotonic()
+    if (self.isFast(key, now)):
+      self._due[key] = now + FAST_POLL_INTERVAL
+    else:
+      self._boosted.pop(key, None)
+      self._due[key] = now + self.idleInterval(key)
+
+  async def refresh(self):
+    # one read of every register, whatever its cadence
+    await self._refresh(self.registerKeys())
+
+  async def refreshDue(self):
+    now = time.monotonic()
+    await self._refresh(sorted(key for (key, due) in self._due.items() if due <= now))
+
+  def nextDue(self):
+    return min(self._due.values(), default = time.monotonic() + POLL_INTERVAL)
+
+  async def _refresh(self, keys):
+    if (len(keys) == 0):
+      return
+    start = asyncio.get_running_loop().time()
+    refreshed = set()
+    for key in keys:
+      mod, func = key
+      fast = self.isFast(key)
+      previous = self.registers.peek(key)
+      try:
+        frame = await self._svc.readRegister(mod, func)
+      except ModuleError as e:
+        # dead modules are the circuit breakers' business, their entities go unavailable
+        _LOGGER.debug(f"Error reading register {hex(func)} of module {mod}: {e}")
+        continue
+      except Exception as e:
+        _LOGGER.warning(f"Error reading register {hex(func)} of module {mod}: {e}")
+        continue
+      finally:
+        self.schedule(key)
+      # fast reads only bother the listeners when something changed or is still moving, a moving
+      # device needs every sighting (travel.TravelModel times its runs from the last one)
+      if (not fast or previous is None or previous[4:6] != frame[4:6] or self.isActive(key)):
+        refreshed.add(key)
+    self.cycleCount += 1
+    self.lastCycleDuration = asyncio.get_running_loop().time() - start
+    _LOGGER.debug(f"Poll cycle {self.cycleCount}: {len(refreshed)}/{len(keys)} registers in {self.lastCycleDuration:.3f}s")
+    self.notify(refreshed)
+
+  def isRegistered(self, key):
+    return key in self._index
+
+  def notify(self, refreshed):
+    # a subscription spanning several refreshed registers is notified once
+    subscriptions = {}
+    for key in sorted(refreshed):
+      for subscription in self._index.get(key, ()):
+        subscriptions[id(subscription)] = subscription
+    for subscription in subscriptions.values():
+      self._dispatch(subscription)
+
+  def _dispatch(self, subscription):
+    if (subscription not in self._subscriptions or not all(key in self.registers for key in subscription.keys)):
+      return
+    try:
+      statuses = [device.decode(self.registers) for device in subscription.devices]
+      subscription.listener(*statuses)
+    except Exception as e:
+      _LOGGER.error(f"Error dispatching status to {subscription.listener}: {e}")
+
+  def updateAvailability(self):
+    for subscription in list(self._subscriptions):
+      if (subscription.onAvailable is None):
+        continue
+      available = all(self._svc.breakers.isAvailable(mod) for (mod, _) in subscription.keys)
+      if (available == subscription.available):
+        continue
+      subscription.available = available
+      try:
+        subscription.onAvailable(available)
+      except Exception as e:
+        _LOGGER.error(f"Error dispatching availability to {subscription.onAvailable}: {e}")
+
+  def start(self):
+    if (self._task is None):
+      self._task = asyncio.get_running_loop().create_task(self._run())
+
+  async def stop(self):
+    if (self._task is not None):
+      self._task.cancel()
+      try:
+        await self._task
+      except asyncio.CancelledError:
+        pass
+      self._task = None
+
+  async def _run(self):
+    while True:
+      try:
+        await self.refreshDue()
+      except Exception as e:
+        _LOGGER.error(f"Error during poll cycle: {e}")
+      # sleep until the next register is due, or a command or a new registration moves it closer
+      self._wake.clear()
+      delay = self.nextDue() - time.monotonic()
+      if (delay > 0):
+        try:
+          async with asyncio.timeout(delay):
+            await self._wake.wait()
+        except TimeoutError:
+          pass
+
+  def stats(self):
+    now = time.monotonic()
+    return {
+      "poll_cycles": self.cycleCount,
+      "poll_fast_registers": sum(1 for key in self._index if self.isFast(key, now)),
+    }
+
+  class Subscription:
+    def __init__(self, devices, listener, onAvailable):
+      self.devices = list(devices)
+      self.listener = listener
+      self.onAvailable = onAvailable
+      self.available = True
+      self.keys = set()
+      for device in self.devices:
+        self.keys.update(device.registers())
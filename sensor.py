@@ -8,12 +8,13 @@ from homeassistant.components.sensor import (
     SensorEntity,
     SensorStateClass,
 )
-from homeassistant.const import UnitOfTemperature, UnitOfSpeed
-from homeassistant.core import HomeAssistant
+from homeassistant.const import MATCH_ALL, PERCENTAGE, EntityCategory, UnitOfTemperature, UnitOfSpeed, UnitOfTime
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
 from .const import DOMAIN
 from .dominoService import DominoService, Meteo, RoomTemperature
+from .hub import DominoHub
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -24,39 +25,55 @@ async def async_setup_entry(
 ) -> None:
     """Set up Domino sensors from a config entry."""
 
-    # Retrieve the API instance created in __init__.py
-    domService: DominoService = entry.runtime_data
+    # Retrieve the hub created in __init__.py
+    hub: DominoHub = entry.runtime_data
 
+    for domService in hub.buses:
+        _setupBus(entry, domService, async_add_entities)
+
+def _setupBus(entry, domService: DominoService, async_add_entities: AddEntitiesCallback) -> None:
+    """Set up the sensors of one bus."""
     sensors = []
 
+    deviceMap = domService.deviceMap
+
     # Room temperature sensors
-    roomTemps = [
-      [30, "Cucina Temperature"],
-      [35, "Camera Francesco Temperature"],
-      [40, "Camera Leti Temperature"],
-      [45, "Camera Matrimoniale Temperature"],
-      #[50, "Room5 Temperature"],
-      [75, "Sala Temperature"]
-    ]
-    for temp in roomTemps:
-      sensors.append(TempSensor(domService, RoomTemperature(temp[0]), temp[1]))
+    for item in deviceMap.rooms:
+      sensors.append(TempSensor(domService, item.device, item.name))
 
     # Meteo sensors
-    meteos = [Meteo(80), Meteo(90)]
-    sensors.append(MeteoSensorTemp(domService, meteos, "External Temperature"))
-    sensors.append(MeteoSensorLux(domService, meteos, "External Illuminance"))
-    sensors.append(MeteoSensorWind(domService, meteos, "External Wind Speed"))
-    sensors.append(MeteoSensorRain(domService, meteos, "External Rain"))
+    meteos = [item.device for item in deviceMap.meteos]
+    if len(meteos) > 0:
+      sensors.append(MeteoSensorTemp(domService, meteos, "External Temperature"))
+      sensors.append(MeteoSensorLux(domService, meteos, "External Illuminance"))
+      sensors.append(MeteoSensorWind(domService, meteos, "External Wind Speed"))
+      sensors.append(MeteoSensorRain(domService, meteos, "External Rain"))
+
+    # Bus diagnostics on the hub device
+    deviceInfo = hubDeviceInfo(entry, domService)
+    sensors.append(BusUtilizationSensor(domService, deviceInfo))
+    sensors.append(BusSlowestModuleSensor(domService, deviceInfo))
 
     async_add_entities(sensors)
 
-class MeteoSensorWind(SensorEntity):
-    """Representation of a Sensor."""
+    # one latency sensor per module, added as soon as the module is first talked to
+    modules = set()
 
-    _attr_name = "Meteo Wind Speed"
-    _attr_native_unit_of_measurement = UnitOfSpeed.METERS_PER_SECOND
-    _attr_device_class = SensorDeviceClass.WIND_SPEED
-    _attr_state_class = SensorStateClass.MEASUREMENT
+    @callback
+    def addModuleSensor(mod: int) -> None:
+        if mod not in modules:
+            modules.add(mod)
+            async_add_entities([BusModuleSensor(domService, mod, deviceInfo)])
+
+    for mod in domService.metrics.modules():
+        addModuleSensor(mod)
+    entry.async_on_unload(domService.metrics.addModuleListener(addModuleSensor))
+
+class MeteoSensor(SensorEntity):
+    """Base class for sensors aggregating the readings of several meteo stations."""
+
+    _sensorType = None
+    _attr_should_poll = False
 
     def __init__(self, domService: DominoService, meteos: list[Meteo], name: str) -> None:
         """Initialize the sensor."""
@@ -66,18 +83,47 @@ class MeteoSensorWind(SensorEntity):
 
         # Unique ID based on sensor address
         ids = "_".join(str(m.mod) for m in meteos)
-        self._attr_unique_id = f"domino_sensor_wind_{ids}"
+        self._attr_unique_id = domService.uniqueId(f"domino_sensor_{self._sensorType}_{ids}")
+
+    async def async_update(self) -> None:
+        """Fetch new state data for the sensor."""
+        statuses = [await meteo.status(self._domService) for meteo in self._meteos]
+        self._updateStatus(statuses)
+
+    async def async_added_to_hass(self) -> None:
+        """Subscribe to the bus scheduler."""
+        self.async_on_remove(self._domService.scheduler.register(self._meteos, self._onStatus, self._onAvailable))
+
+    @callback
+    def _onStatus(self, *statuses) -> None:
+        """Handle the statuses pushed by the bus scheduler."""
+        self._updateStatus(list(statuses))
+        self.async_write_ha_state()
+
+    @callback
+    def _onAvailable(self, available: bool) -> None:
+        """Handle the module of this entity going offline or coming back."""
+        self._attr_available = available
+        self.async_write_ha_state()
 
-    def update(self) -> None:
-        """Fetch new state data for the sensor.
+    def _updateStatus(self, statuses: list[Meteo.MeteoStatus]) -> None:
+        raise NotImplementedError
 
-        This is the only method that should fetch new data for Home Assistant.
-        """
+class MeteoSensorWind(MeteoSensor):
+    """Representation of a Sensor."""
+
+    _attr_name = "Meteo Wind Speed"
+    _attr_native_unit_of_measurement = UnitOfSpeed.METERS_PER_SECOND
+    _attr_device_class = SensorDeviceClass.WIND_SPEED
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    _sensorType = "wind"
+
+    def _updateStatus(self, statuses: list[Meteo.MeteoStatus]) -> None:
         maxWind = 0
         minWind = 0
         winds = []
-        for meteo in self._meteos:
-          status = meteo.status(self._domService)
+        for status in statuses:
           _LOGGER.debug(f"Meteo status: {status}")
           wind = status.getWind()
           #if (int(wind) == 35):
@@ -96,7 +142,7 @@ class MeteoSensorWind(SensorEntity):
         _LOGGER.info(f"External wind speed: {wind} - max: {maxWind} - min: {minWind}")
         self._attr_native_value = wind
 
-class MeteoSensorLux(SensorEntity):
+class MeteoSensorLux(MeteoSensor):
     """Representation of a Sensor."""
 
     _attr_name = "Meteo Illuminance"
@@ -104,25 +150,11 @@ class MeteoSensorLux(SensorEntity):
     _attr_device_class = SensorDeviceClass.ILLUMINANCE
     _attr_state_class = SensorStateClass.MEASUREMENT
 
-    def __init__(self, domService: DominoService, meteos: list[Meteo], name: str) -> None:
-        """Initialize the sensor."""
-        self._domService = domService
-        self._meteos = meteos
-        self._attr_name = name
+    _sensorType = "lux"
 
-        # Unique ID based on sensor address
-        ids = "_".join(str(m.mod) for m in meteos)
-        self._attr_unique_id = f"domino_sensor_lux_{ids}"
-
-
-    def update(self) -> None:
-        """Fetch new state data for the sensor.
-
-        This is the only method that should fetch new data for Home Assistant.
-        """
+    def _updateStatus(self, statuses: list[Meteo.MeteoStatus]) -> None:
         maxLux = 0
-        for meteo in self._meteos:
-          status = meteo.status(self._domService)
+        for status in statuses:
           _LOGGER.debug(f"Meteo status: {status}")
           lux = status.getLux()
           if (lux > maxLux):
@@ -130,7 +162,7 @@ class MeteoSensorLux(SensorEntity):
         _LOGGER.debug(f"External illuminance: {maxLux}")
         self._attr_native_value = maxLux
 
-class MeteoSensorTemp(SensorEntity):
+class MeteoSensorTemp(MeteoSensor):
     """Representation of a Sensor."""
 
     _attr_name = "Meteo Temperature"
@@ -138,31 +170,18 @@ class MeteoSensorTemp(SensorEntity):
     _attr_device_class = SensorDeviceClass.TEMPERATURE
     _attr_state_class = SensorStateClass.MEASUREMENT
 
-    def __init__(self, domService: DominoService, meteos: list[Meteo], name: str) -> None:
-        """Initialize the sensor."""
-        self._domService = domService
-        self._meteos = meteos
-        self._attr_name = name
-
-        # Unique ID based on sensor address
-        ids = "_".join(str(m.mod) for m in meteos)
-        self._attr_unique_id = f"domino_sensor_temp_{ids}"
+    _sensorType = "temp"
 
-    def update(self) -> None:
-        """Fetch new state data for the sensor.
-
-        This is the only method that should fetch new data for Home Assistant.
-        """
+    def _updateStatus(self, statuses: list[Meteo.MeteoStatus]) -> None:
         temp = 0
-        for meteo in self._meteos:
-          status = meteo.status(self._domService)
+        for status in statuses:
           _LOGGER.debug(f"Meteo status: {status}")
           temp += status.getCelsius()
-        avgTemp = round(temp / len(self._meteos), 2)
+        avgTemp = round(temp / len(statuses), 2)
         _LOGGER.debug(f"External temperature: {avgTemp}")
         self._attr_native_value = avgTemp
 
-class MeteoSensorRain(SensorEntity):
+class MeteoSensorRain(MeteoSensor):
     """Representation of a Sensor."""
 
     _attr_name = "Meteo Raining"
@@ -171,25 +190,11 @@ class MeteoSensorRain(SensorEntity):
     _attr_state_class = None
     options = ["Rain", "No Rain"]
 
-    def __init__(self, domService: DominoService, meteos: list[Meteo], name: str) -> None:
-        """Initialize the sensor."""
-        self._domService = domService
-        self._meteos = meteos
-        self._attr_name = name
-
-        # Unique ID based on sensor address
-        ids = "_".join(str(m.mod) for m in meteos)
-        self._attr_unique_id = f"domino_sensor_rain_{ids}"
-
+    _sensorType = "rain"
 
-    def update(self) -> None:
-        """Fetch new state data for the sensor.
-
-        This is the only method that should fetch new data for Home Assistant.
-        """
+    def _updateStatus(self, statuses: list[Meteo.MeteoStatus]) -> None:
         isRaining = False
-        for meteo in self._meteos:
-          status = meteo.status(self._domService)
+        for status in statuses:
           _LOGGER.debug(f"Meteo status: {status}")
           if (status.getIsRaining()):
             isRaining = True
@@ -204,6 +209,7 @@ class TempSensor(SensorEntity):
     _attr_native_unit_of_measurement = UnitOfTemperature.CELSIUS
     _attr_device_class = SensorDeviceClass.TEMPERATURE
     _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_should_poll = False
 
     def __init__(self, domService: DominoService, room: RoomTemperature, name: str) -> None:
         """Initialize the sensor."""
@@ -212,18 +218,113 @@ class TempSensor(SensorEntity):
         self._attr_name = name
 
         # Unique ID based on sensor address
-        self._attr_unique_id = f"domino_sensor_temp_{room.mod}"
-
-
-    def update(self) -> None:
-        """Fetch new state data for the sensor.
-
-        This is the only method that should fetch new data for Home Assistant.
-        """
-        status = self._room.status(self._domService)
+        self._attr_unique_id = domService.uniqueId(f"domino_sensor_temp_{room.mod}")
+
+    async def async_update(self) -> None:
+        """Fetch new state data for the sensor."""
+        status = await self._room.status(self._domService)
+        self._updateStatus(status)
+
+    async def async_added_to_hass(self) -> None:
+        """Subscribe to the bus scheduler."""
+        self.async_on_remove(self._domService.scheduler.register([self._room], self._onStatus, self._onAvailable))
+
+    @callback
+    def _onStatus(self, status) -> None:
+        """Handle a status pushed by the bus scheduler."""
+        self._updateStatus(status)
+        self.async_write_ha_state()
+
+    @callback
+    def _onAvailable(self, available: bool) -> None:
+        """Handle the module of this entity going offline or coming back."""
+        self._attr_available = available
+        self.async_write_ha_state()
+
+    def _updateStatus(self, status: RoomTemperature.Status) -> None:
         _LOGGER.debug(f"Room temperature: {status}")
         temp = status.getCelsius()
         if (temp < -20 or temp > 50):
             _LOGGER.warning(f"Temperature value {temp}°C for {self._attr_name} is out of expected range. Setting to 0.")
         else:
             self._attr_native_value = temp
+
+def hubDeviceInfo(entry, domService: DominoService) -> dict:
+    """Device of the bus diagnostics, one per bus of each entry."""
+    name = "Domino Hub" if domService.busId is None else f"Domino Hub - {domService.busId}"
+    return {
+        "identifiers": {(DOMAIN, domService.uniqueId(f"hub_{entry.entry_id}"))},
+        "name": name,
+        "manufacturer": "Domino",
+        "model": "Domino Serial Hub",
+    }
+
+class BusUtilizationSensor(SensorEntity):
+    """Share of time the bus is busy with exchanges."""
+
+    _attr_name = "Bus Utilization"
+    _attr_native_unit_of_measurement = PERCENTAGE
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, domService: DominoService, deviceInfo: dict) -> None:
+        """Initialize the sensor."""
+        self._domService = domService
+        self._attr_unique_id = f"domino_bus_utilization_{domService.com_port}"
+        self._attr_device_info = deviceInfo
+
+    async def async_update(self) -> None:
+        """Read the in-memory bus metrics, the full counters are in the diagnostics download."""
+        self._attr_native_value = round(self._domService.metrics.utilization() * 100, 1)
+
+class BusSlowestModuleSensor(SensorEntity):
+    """Module costing the bus the most time, timeouts included."""
+
+    _attr_name = "Bus Slowest Module"
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    # counters that change with every exchange, not worth a recorder row each
+    _unrecorded_attributes = frozenset({MATCH_ALL})
+
+    def __init__(self, domService: DominoService, deviceInfo: dict) -> None:
+        """Initialize the sensor."""
+        self._domService = domService
+        self._attr_unique_id = f"domino_bus_slowest_module_{domService.com_port}"
+        self._attr_device_info = deviceInfo
+
+    async def async_update(self) -> None:
+        """Read the in-memory bus metrics."""
+        mod = self._domService.metrics.slowestModule()
+        self._attr_native_value = mod
+        if mod is None:
+            self._attr_extra_state_attributes = {}
+            return
+        summary = self._domService.metrics.moduleSummary(mod)
+        self._attr_extra_state_attributes = {
+            name: value for name, value in summary.items() if name != "latency"
+        }
+
+class BusModuleSensor(SensorEntity):
+    """95th percentile bus latency of one module, with its error counts and histograms."""
+
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _unrecorded_attributes = frozenset({MATCH_ALL})
+
+    def __init__(self, domService: DominoService, mod: int, deviceInfo: dict) -> None:
+        """Initialize the sensor."""
+        self._domService = domService
+        self._mod = mod
+        self._attr_device_info = deviceInfo
+        self._attr_name = f"Bus Module {mod} Latency"
+        self._attr_unique_id = f"domino_bus_module_{mod}_{domService.com_port}"
+
+    async def async_update(self) -> None:
+        """Read the in-memory bus metrics."""
+        summary = self._domService.metrics.moduleSummary(self._mod)
+        p95 = summary["latency"].percentile(95)
+        self._attr_native_value = round(p95 * 1000, 1) if p95 is not None else None
+        self._attr_extra_state_attributes = {
+            name: value for name, value in summary.items() if name != "latency"
+        }
@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import pty
+import random
+import tty
+
+from .codec import calcMessage
+from .framer import FrameDecoder
+
+_LOGGER = logging.getLogger(__name__)
+
+class SimLightContainer:
+  def __init__(self, state = 0):
+    self.state = state
+
+  def read(self, mod, func):
+    if (func == 0x31):
+      return 0, self.state
+    return None
+
+  def write(self, mod, d1, d2):
+    # high nibble selects the outputs to change, low nibble holds their new value
+    mask = d2 >> 4
+    self.state = (self.state & ~mask) | (d2 & mask)
+    return d1, d2
+
+class SimDimmer:
+  def __init__(self, pct = 0):
+    self.pct = pct
+
+  def read(self, mod, func):
+    if (func == 0x31):
+      return 0, self.pct
+    return None
+
+  def write(self, mod, d1, d2):
+    self.pct = min(d2, 100)
+    return d1, d2
+
+class SimMotorContainer:
+  def __init__(self, travelTime = 30):
+    self.travelTime = travelTime
+    self.position = [0.0, 0.0]
+    self.target = [0.0, 0.0]
+    self.since = [0.0, 0.0]
+    self.speed = [0.0, 0.0]
+
+  def _now(self):
+    return asyncio.get_running_loop().time()
+
+  def _update(self, idx):
+    if (self.speed[idx] == 0):
+      return
+    now = self._now()
+    pos = self.position[idx] + self.speed[idx] * (now - self.since[idx])
+    self.since[idx] = now
+    if ((self.speed[idx] > 0 and pos >= self.target[idx]) or (self.speed[idx] < 0 and pos <= self.target[idx])):
+      pos = self.target[idx]
+      self.speed[idx] = 0
+    self.position[idx] = pos
+
+  def _move(self, idx, target):
+    self._update(idx)
+    self.target[idx] = target
+    self.since[idx] = self._now()
+    if (target > self.position[idx]):
+      self.speed[idx] = 1 / self.travelTime
+    elif (target < self.position[idx]):
+      self.speed[idx] = -1 / self.travelTime
+    else:
+      self.speed[idx] = 0
+
+  def read(self, mod, func):
+    if (func != 0x31):
+      return None
+    b2 = 0
+    for idx in range(2):
+      self._update(idx)
+      if (self.speed[idx] > 0):
+        b2 |= 0x01 << (idx * 2)
+      elif (self.speed[idx] < 0):
+        b2 |= 0x02 << (idx * 2)
+    return 0, b2
+
+  def write(self, mod, d1, d2):
+    if (d1 in (0x01, 0x02)):
+      self._move(d1 - 1, min(d2, 55) / 55)
+    elif (d1 in (0x03, 0x0C)):
+      idx = 0 if d1 == 0x03 else 1
+      self._update(idx)
+      self._move(idx, self.position[idx])
+    elif (d1 in (0x04, 0x08)):
+      self._move(1, 1.0 if d1 == 0x04 else 0.0)
+    return d1, d2
+
+class SimRoomTemperature:
+  def __init__(self, celsius = 20.0):
+    self.celsius = celsius
+
+  def read(self, mod, func):
+    if (func == 0x30):
+      kelvin = int(round((self.celsius + 273.15) * 10))
+      return kelvin >> 8, kelvin & 0xFF
+    return None
+
+class SimMeteo:
+  def __init__(self, base, celsius = 15.0, lux = 10000, wind = 0.0, raining = False, twilight = False, badSensor = False):
+    self.base = base
+    self.celsius = celsius
+    self.lux = lux
+    self.wind = wind
+    self.raining = raining
+    self.twilight = twilight
+    self.badSensor = badSensor
+
+  def read(self, mod, func):
+    if (func != 0x30):
+      return None
+    reg = mod - self.base
+    if (reg == 0):
+      value = int(round((self.celsius + 273.15) * 10))
+    elif (reg == 1):
+      value = int(round(self.lux / 10))
+    elif (reg == 2):
+      value = int(round(self.wind * 10))
+    else:
+      b1 = 0x40 if self.badSensor else 0
+      b2 = (0x01 if self.raining else 0) | (0x02 if self.twilight else 0)
+      return b1, b2
+    value = min(value, 0xFFFF)
+    return value >> 8, value & 0xFF
+
+class SimulatedBus:
+  """Domino bus answering on a pseudo-terminal, DominoService can use the
+  returned port name exactly like /dev/ttyUSB0. startServer puts the same bus
+  behind a TCP port, as a serial bridge would, for socket:// transports."""
+
+  def __init__(self, latency = 0.005, jitter = 0.0, dropRate = 0.0, corruptRate = 0.0, seed = None):
+    self.latency = latency
+    self.jitter = jitter
+    self.dropRate = dropRate
+    self.corruptRate = corruptRate
+    self.modules = {}
+    self.requestCount = 0
+    self.droppedCount = 0
+    self.corruptedCount = 0
+    self.port = None
+    self._random = random.Random(seed)
+    self._decoder = FrameDecoder()
+    self._master = None
+    self._slave = None
+    self._loop = None
+    self._server = None
+    self._clients = set()
+
+  def addLightContainer(self, mod, state = 0):
+    return self._add(SimLightContainer(state), [mod])
+
+  def addDimmer(self, mod, pct = 0):
+    return self._add(SimDimmer(pct), [mod])
+
+  def addMotorContainer(self, mod, travelTime = 30):
+    return self._add(SimMotorContainer(travelTime), [mod])
+
+  def addRoomTemperature(self, mod, celsius = 20.0):
+    # RoomTemperature reads its value from the following address
+    return self._add(SimRoomTemperature(celsius), [mod, mod + 1])
+
+  def addMeteo(self, mod, **kwargs):
+    return self._add(SimMeteo(mod, **kwargs), [mod + i for i in range(4)])
+
+  def _add(self, model, mods):
+    for mod in mods:
+      self.modules[mod] = model
+    return model
+
+  async def start(self):
+    self._loop = asyncio.get_running_loop()
+    self._master, self._slave = pty.openpty()
+    tty.setraw(self._slave)
+    self.port = os.ttyname(self._slave)
+    self._loop.add_reader(self._master, self._onReadable)
+    _LOGGER.debug(f"Simulated bus listening on {self.port}")
+    return self.port
+
+  async def startServer(self, host = "127.0.0.1", port = 0):
+    self._loop = asyncio.get_running_loop()
+    self._server = await self._loop.create_server(lambda: SimulatedBus.Client(self), host, port)
+    host, port = self._server.sockets[0].getsockname()[:2]
+    self.port = f"socket://{host}:{port}"
+    _LOGGER.debug(f"Simulated bus listening on {self.port}")
+    return self.port
+
+  def dropClients(self):
+    # the bridge going away under its clients, they see their connection reset
+    for client in list(self._clients):
+      client.abort()
+    self._clients.clear()
+
+  def stop(self):
+    if (self._server is not None):
+      self.dropClients()
+      self._server.close()
+      self._server = None
+    if (self._master is None):
+      return
+    self._loop.remove_reader(self._master)
+    os.close(self._master)
+    os.close(self._slave)
+    self._master = None
+    self._slave = None
+
+  def _onReadable(self):
+    try:
+      data = os.read(self._master, 256)
+    except OSError:
+      return
+    self._onData(data)
+
+  def _onData(self, data):
+    self._decoder.feed(data)
+    for frame in self._decoder.frames():
+      self._handle(bytes(frame))
+
+  def _handle(self, frame):
+    self.requestCount += 1
+    func = frame[2]
+    mod = frame[3]
+    model = self.modules.get(mod)
+    if (model is None):
+      return
+    if (func == 0x10):
+      write = getattr(model, "write", None)
+      data = write(mod, frame[4], frame[5]) if write is not None else None
+    else:
+      data = model.read(mod, func)
+    if (data is None):
+      # NAK
+      d1, d2 = 0, 0xf0
+      func = 0x0
+    else:
+      d1, d2 = data
+    self.send(calcMessage([0x55, frame[1], func, mod, d1, d2]))
+
+  def announce(self, mod, func = 0x31):
+    # a module reporting its state on its own, as after a wall switch press
+    data = self.modules[mod].read(mod, func)
+    self.send(calcMessage([0x55, 0x82, func, mod, data[0], data[1]]))
+
+  def switch(self, mod, d1, d2):
+    # another master writing to a module, the write frame is all we get to see
+    self.modules[mod].write(mod, d1, d2)
+    self.send(calcMessage([0x55, 0x82, 0x10, mod, d1, d2]))
+
+  def send(self, reply):
+    if (self._random.random() < self.dropRate):
+      self.droppedCount += 1
+      return
+    if (self._random.random() < self.corruptRate):
+      self.corruptedCount += 1
+      reply = reply[:-1] + bytes([reply[-1] ^ 0xFF])
+    delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+    self._loop.call_later(delay, self._write, reply)
+
+  def _write(self, reply):
+    if (self._master is not None):
+      os.write(self._master, reply)
+    for client in self._clients:
+      client.write(reply)
+
+  class Client(asyncio.Protocol):
+    def __init__(self, bus):
+      self._bus = bus
+      self._transport = None
+
+    def connection_made(self, transport):
+      self._transport = transport
+      self._bus._clients.add(transport)
+
+    def data_received(self, data):
+      self._bus._onData(data)
+
+    def connection_lost(self, exc):
+      self._bus._clients.discard(self._transport)
@@ -0,0 +1,53 @@
+"""Persistent storage for the Domino integration."""
+
+from __future__ import annotations
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+
+STORAGE_VERSION = 1
+DISCOVERY_KEY = f"{DOMAIN}.discovery"
+SNAPSHOT_KEY = f"{DOMAIN}.snapshot"
+
+
+async def async_save_discovery(hass: HomeAssistant, comPort: str, result: dict) -> None:
+    """Store the result of a bus scan, one per serial port."""
+    store = Store(hass, STORAGE_VERSION, DISCOVERY_KEY)
+    data = await store.async_load() or {}
+    data[comPort] = {**result, "timestamp": dt_util.utcnow().isoformat()}
+    await store.async_save(data)
+
+
+async def async_load_discovery(hass: HomeAssistant, comPort: str) -> dict | None:
+    """Return the last bus scan stored for a serial port."""
+    store = Store(hass, STORAGE_VERSION, DISCOVERY_KEY)
+    data = await store.async_load() or {}
+    return data.get(comPort)
+
+
+def _snapshotStore(hass: HomeAssistant, entryId: str) -> Store:
+    return Store(hass, STORAGE_VERSION, f"{SNAPSHOT_KEY}.{entryId}")
+
+
+async def async_save_snapshot(hass: HomeAssistant, entryId: str, buses: dict) -> None:
+    """Store the register snapshot of the buses of an entry."""
+    await _snapshotStore(hass, entryId).async_save({"timestamp": dt_util.utcnow().isoformat(), "buses": buses})
+
+
+async def async_load_snapshot(hass: HomeAssistant, entryId: str) -> tuple[dict, float] | None:
+    """Return the register snapshot of an entry and the seconds since it was taken."""
+    data = await _snapshotStore(hass, entryId).async_load()
+    if not data:
+        return None
+    timestamp = dt_util.parse_datetime(data.get("timestamp") or "")
+    if timestamp is None:
+        return None
+    return data.get("buses", {}), max(0.0, (dt_util.utcnow() - timestamp).total_seconds())
+
+
+async def async_remove_snapshot(hass: HomeAssistant, entryId: str) -> None:
+    """Remove the register snapshot of a removed entry."""
+    await _snapshotStore(hass, entryId).async_remove()
@@ -0,0 +1,37 @@
+"""Loads the integration as the domino_hub package, with or without Home Assistant,
+the bus modules the tests exercise do not need it."""
+from __future__ import annotations
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+from bench_bus import PACKAGE, ROOT, loadPackage
+
+loadPackage()
+# pytest imports the repository root as a package too, named after its directory, to look
+# for setup_module in __init__.py: hand it the package loaded above instead
+sys.modules.setdefault(ROOT.name, sys.modules[PACKAGE])
+
+@pytest.fixture
+def simulatedBus():
+  """A SimulatedBus started on a pseudo-terminal, run(scenario) drives it."""
+  from domino_hub.simulator import SimulatedBus
+
+  class Harness:
+    def __init__(self):
+      self.bus = SimulatedBus(latency = 0.002)
+
+    def run(self, scenario):
+      async def main():
+        port = await self.bus.start()
+        try:
+          return await scenario(port)
+        finally:
+          self.bus.stop()
+      return asyncio.run(main())
+
+  return Harness()
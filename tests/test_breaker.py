@@ -0,0 +1,81 @@
+import pytest
+
+from domino_hub import breaker
+from domino_hub.breaker import BREAKER_RETRY_MIN, CircuitBreakers
+
+class Clock:
+  def __init__(self):
+    self.now = 1000.0
+
+  def monotonic(self):
+    return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+  clock = Clock()
+  monkeypatch.setattr(breaker, "time", clock)
+  return clock
+
+def test_opens_after_threshold(clock):
+  breakers = CircuitBreakers(threshold = 3)
+  changed = []
+  breakers.onChange = changed.append
+  for _ in range(2):
+    breakers.failure(5)
+  assert breakers.allow(5)
+  breakers.failure(5)
+  assert not breakers.allow(5)
+  assert not breakers.isAvailable(5)
+  assert breakers.unavailable() == [5]
+  assert breakers.rejectedCount == 1
+  assert changed == [5]
+
+def test_success_resets_the_count(clock):
+  breakers = CircuitBreakers(threshold = 3)
+  breakers.failure(5)
+  breakers.failure(5)
+  breakers.success(5)
+  breakers.failure(5)
+  assert breakers.isAvailable(5)
+
+def test_half_open_retry(clock):
+  breakers = CircuitBreakers(threshold = 1)
+  changed = []
+  breakers.onChange = changed.append
+  breakers.failure(5)
+  clock.now += BREAKER_RETRY_MIN
+  # a single request goes through to see whether the module is back
+  assert breakers.allow(5)
+  assert not breakers.allow(5)
+  breakers.success(5)
+  assert breakers.isAvailable(5)
+  assert changed == [5, 5]
+
+def test_failed_retry_backs_off(clock):
+  breakers = CircuitBreakers(threshold = 1)
+  breakers.failure(5)
+  clock.now += BREAKER_RETRY_MIN
+  assert breakers.allow(5)
+  breakers.failure(5)
+  clock.now += BREAKER_RETRY_MIN
+  assert not breakers.allow(5)
+  clock.now += BREAKER_RETRY_MIN
+  assert breakers.allow(5)
+
+def test_abandoned_retry_is_retried(clock):
+  breakers = CircuitBreakers(threshold = 1)
+  breakers.failure(5)
+  clock.now += BREAKER_RETRY_MIN
+  assert breakers.allow(5)
+  breakers.abandon(5)
+  assert breakers.allow(5)
+
+def test_reset_reports_modules_back(clock):
+  breakers = CircuitBreakers(threshold = 1)
+  changed = []
+  breakers.onChange = changed.append
+  breakers.failure(5)
+  breakers.failure(6)
+  breakers.reset()
+  assert breakers.unavailable() == []
+  assert changed == [5, 6, 5, 6]
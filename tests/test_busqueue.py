@@ -0,0 +1,47 @@
+import asyncio
+
+from domino_hub.busqueue import PRIORITY_COMMAND, PRIORITY_POLL, BusQueue
+
+async def grantOrder(queue, priorities):
+  order = []
+
+  async def exchange(name, priority):
+    async with queue.slot(priority):
+      order.append(name)
+      await asyncio.sleep(0)
+
+  # the bus is taken while everybody queues up behind it
+  await queue.acquire(PRIORITY_POLL)
+  tasks = [asyncio.create_task(exchange(name, priority)) for (name, priority) in priorities]
+  await asyncio.sleep(0)
+  queue.release()
+  await asyncio.gather(*tasks)
+  return order
+
+def test_commands_before_polls():
+  async def scenario():
+    return await grantOrder(BusQueue(), [("poll", PRIORITY_POLL), ("command", PRIORITY_COMMAND)])
+  assert asyncio.run(scenario()) == ["command", "poll"]
+
+def test_polls_are_not_starved():
+  async def scenario():
+    priorities = [("poll", PRIORITY_POLL)] + [(f"command {i}", PRIORITY_COMMAND) for i in range(10)]
+    return await grantOrder(BusQueue(maxCommandBurst = 4), priorities)
+  order = asyncio.run(scenario())
+  # a burst of commands holds the waiting poll back for maxCommandBurst of them at most
+  assert order.index("poll") == 4
+  assert order[5:] == [f"command {i}" for i in range(4, 10)]
+
+def test_cancelled_waiter_leaves_the_queue():
+  async def scenario():
+    queue = BusQueue()
+    await queue.acquire(PRIORITY_POLL)
+    waiter = asyncio.create_task(queue.acquire(PRIORITY_COMMAND))
+    await asyncio.sleep(0)
+    assert len(queue) == 1
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions = True)
+    assert len(queue) == 0
+    queue.release()
+    await asyncio.wait_for(queue.join(), 1)
+  asyncio.run(scenario())
@@ -0,0 +1,74 @@
+import time
+
+from domino_hub.cache import CACHE_LIGHT, EXPIRED, FRESH, STALE, RegisterCache
+from domino_hub.codec import calcMessage
+from domino_hub.dominoService import Dimmer, DominoService, LightContainer
+from domino_hub.framer import isValidFrame
+
+FRAME = calcMessage([0x55, 0x82, 0x31, 17, 0x00, 0x05])
+
+def test_lookup_ages():
+  cache = RegisterCache({CACHE_LIGHT: 10})
+  now = time.monotonic()
+  cache.store((17, 0x31), FRAME, now - 5)
+  assert cache.lookup((17, 0x31), CACHE_LIGHT) == (FRESH, FRAME)
+  cache.store((17, 0x31), FRAME, now - 15)
+  assert cache.lookup((17, 0x31), CACHE_LIGHT) == (STALE, FRAME)
+  cache.store((17, 0x31), FRAME, now - 25)
+  assert cache.lookup((17, 0x31), CACHE_LIGHT) == (EXPIRED, None)
+
+def test_snapshot_round_trip():
+  cache = RegisterCache()
+  cache.store((17, 0x31), FRAME, time.monotonic() - 30)
+  restored = RegisterCache()
+  assert restored.restore(cache.snapshot(), elapsed = 60) == [(17, 0x31)]
+  assert restored[(17, 0x31)] == FRAME
+  assert 89 < restored.age((17, 0x31)) < 91
+
+def test_restore_skips_old_bad_and_current_entries():
+  cache = RegisterCache()
+  current = calcMessage([0x55, 0x82, 0x31, 18, 0x00, 0x0F])
+  cache.store((18, 0x31), current)
+  entries = [
+    [17, 0x31, FRAME.hex(), 1000],
+    [18, 0x31, FRAME.hex(), 1],
+    [19, 0x31, "not hex", 1],
+    [20, 0x31, FRAME[:5].hex(), 1],
+    [21, 0x31, FRAME.hex(), 100],
+  ]
+  assert cache.restore(entries, elapsed = 10, maxAge = 900) == [(21, 0x31)]
+  # a value read since the snapshot is newer than anything in it
+  assert cache[(18, 0x31)] == current
+
+def test_patch_keeps_the_timestamp():
+  cache = RegisterCache()
+  cache.store((17, 0x31), FRAME, 123.0)
+  assert cache.patch((17, 0x31), 0x00, 0x0A)
+  assert cache[(17, 0x31)][4:6] == bytes([0x00, 0x0A])
+  assert isValidFrame(cache[(17, 0x31)])
+  assert cache._entries[(17, 0x31)][1] == 123.0
+  assert not cache.patch((18, 0x31), 0, 0)
+
+def test_write_through(simulatedBus):
+  dimmer = simulatedBus.bus.addDimmer(23, pct = 40)
+  simulatedBus.bus.addLightContainer(17, state = 0x01)
+
+  async def scenario(port):
+    svc = DominoService(port, 19200)
+    await svc.connect()
+    try:
+      await Dimmer(23).status(svc)
+      await Dimmer(23).setLight(svc, 75)
+      container = LightContainer(17)
+      await container.status(svc)
+      await container.on(svc, 3)
+      reads = simulatedBus.bus.requestCount
+      # served from the patched cache, no read goes out
+      return await Dimmer(23).status(svc), await container.status(svc), simulatedBus.bus.requestCount - reads
+    finally:
+      await svc.disconnect()
+
+  level, outputs, reads = simulatedBus.run(scenario)
+  assert level == dimmer.pct == 75
+  assert outputs == 0x05
+  assert reads == 0
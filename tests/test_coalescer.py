@@ -0,0 +1,56 @@
+import asyncio
+
+from domino_hub.coalescer import LatestWins
+
+class SlowWrite:
+  def __init__(self):
+    self.written = []
+    self.gate = asyncio.Event()
+
+  async def __call__(self, target):
+    await self.gate.wait()
+    self.written.append(target)
+    return f"ack {target}"
+
+def test_newest_target_wins():
+  async def scenario():
+    write = SlowWrite()
+    writes = LatestWins(write, "dimmer 23")
+    first = asyncio.create_task(writes.submit(10))
+    await asyncio.sleep(0)
+    # while 10 is on the bus, 20 waits behind it and 30 replaces it
+    queued = [asyncio.create_task(writes.submit(pct)) for pct in (20, 30)]
+    await asyncio.sleep(0)
+    write.gate.set()
+    results = await asyncio.gather(first, *queued)
+    return write.written, results, writes.supersededCount
+  written, results, superseded = asyncio.run(scenario())
+  assert written == [10, 30]
+  assert results == ["ack 10", "ack 30", "ack 30"]
+  assert superseded == 1
+
+def test_discard_drops_the_waiting_target():
+  async def scenario():
+    write = SlowWrite()
+    writes = LatestWins(write)
+    first = asyncio.create_task(writes.submit("open"))
+    await asyncio.sleep(0)
+    waiting = asyncio.create_task(writes.submit("close"))
+    await asyncio.sleep(0)
+    writes.discard()
+    write.gate.set()
+    return write.written, await asyncio.gather(first, waiting)
+  written, results = asyncio.run(scenario())
+  assert written == ["open"]
+  assert results == ["ack open", None]
+
+def test_errors_reach_the_caller():
+  async def scenario():
+    async def failing(target):
+      raise ValueError(target)
+    writes = LatestWins(failing)
+    try:
+      await writes.submit(1)
+    except ValueError as e:
+      return e.args
+  assert asyncio.run(scenario()) == (1,)
@@ -0,0 +1,54 @@
+import logging
+
+import pytest
+
+from bench_codec import legacyCalcMessage
+from domino_hub.codec import (checksum, dumpFrame, encodeFrame, encodeFrameInto, frameData, frameValue, isDumping,
+  isNak, isStatusRequest, statusRequest)
+from domino_hub.framer import FRAME_LENGTH
+
+@pytest.mark.parametrize("func", [0x30, 0x31])
+def test_status_requests_match_the_legacy_frames(func):
+  for mod in range(256):
+    frame = statusRequest(mod, func)
+    assert frame == legacyCalcMessage([0x55, 0x82, func, mod, 0x33, 0x33])
+    assert sum(frame) & 0xFF == 0xFF
+
+def test_status_requests_are_not_rebuilt():
+  assert statusRequest(17, 0x31) is statusRequest(17, 0x31)
+  assert encodeFrame(17, 0x31) is statusRequest(17, 0x31)
+  assert encodeFrame(17, 0x30, 0x33, 0x33) is statusRequest(17, 0x30)
+
+@pytest.mark.parametrize("mod, func, d1, d2", [(2, 0x10, 0x00, 0x11), (17, 0x10, 0x0C, 0x00), (255, 0x31, 0x00, 0x00), (0, 0x10, 0xFF, 0xFF)])
+def test_encode_matches_the_legacy_frames(mod, func, d1, d2):
+  expected = legacyCalcMessage([0x55, 0x82, func, mod, d1, d2])
+  assert encodeFrame(mod, func, d1, d2) == expected
+  assert checksum(func, mod, d1, d2) == expected[6]
+  buffer = bytearray(2 + FRAME_LENGTH)
+  assert encodeFrameInto(buffer, 2, mod, func, d1, d2) == FRAME_LENGTH
+  assert buffer[2:] == expected
+  assert buffer[:2] == b"\x00\x00"
+
+def test_replies_are_read_in_place():
+  reply = legacyCalcMessage([0x55, 0x82, 0x30, 31, 0x0B, 0x8A])
+  view = memoryview(b"\xff" + reply)[1:]
+  assert frameData(view) == (0x0B, 0x8A)
+  assert frameValue(view) == 0x0B8A
+  assert not isNak(view)
+  assert not isStatusRequest(view)
+
+def test_nak_and_status_request_frames():
+  assert isNak(legacyCalcMessage([0x55, 0x82, 0x00, 5, 0x00, 0xf0]))
+  assert isNak(legacyCalcMessage([0x55, 0x82, 0x00, 5, 0x00, 0xff]))
+  assert not isNak(legacyCalcMessage([0x55, 0x82, 0x31, 5, 0x00, 0xf0]))
+  assert isStatusRequest(statusRequest(5, 0x30))
+  assert isStatusRequest(statusRequest(5, 0x31))
+  assert not isStatusRequest(encodeFrame(5, 0x10, 0x33, 0x33))
+
+def test_dump_follows_the_log_level():
+  logger = logging.getLogger("domino_hub.test_codec")
+  logger.setLevel(logging.INFO)
+  assert not isDumping(logger)
+  logger.setLevel(logging.DEBUG)
+  assert isDumping(logger)
+  assert dumpFrame(memoryview(statusRequest(17, 0x31))) == "55 82 31 11 33 33 " + f"{statusRequest(17, 0x31)[6]:02x}"
@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from domino_hub.config_flow import _async_check_connection
+from domino_hub.const import CONF_COM_BAUD, CONF_COM_PORT, CONF_RTT_MS
+
+def test_answering_bus(simulatedBus):
+  simulatedBus.bus.addLightContainer(3)
+
+  async def scenario(port):
+    return port, await _async_check_connection(port, 9600)
+
+  port, data = simulatedBus.run(scenario)
+  assert data[CONF_COM_PORT] == port
+  assert data[CONF_COM_BAUD] == 9600
+  assert data[CONF_RTT_MS] > 0
+
+def test_silent_bus_cannot_connect(simulatedBus):
+  async def scenario(port):
+    return await _async_check_connection(port, 9600)
+
+  assert simulatedBus.run(scenario) is None
+
+def test_silent_bus_confirmed(simulatedBus):
+  async def scenario(port):
+    return port, await _async_check_connection(port, 9600, allowSilent = True)
+
+  port, data = simulatedBus.run(scenario)
+  assert data == {CONF_COM_PORT: port, CONF_COM_BAUD: 9600}
+
+def test_port_that_does_not_open():
+  assert asyncio.run(_async_check_connection("/dev/nonexistent", 9600, allowSilent = True)) is None
@@ -0,0 +1,148 @@
+import asyncio
+
+import pytest
+
+from domino_hub import connection
+from domino_hub.connection import ConnectionManager
+from domino_hub.dominoService import DominoService, LightContainer, Meteo, RoomTemperature
+from domino_hub.exceptions import BusConnectionError
+from domino_hub.simulator import SimulatedBus
+
+@pytest.fixture
+def fastReconnect(monkeypatch):
+  monkeypatch.setattr(connection, "RECONNECT_MIN_DELAY", 0.01)
+
+class FlakyTransport:
+  """Opens on the given attempt, fails before."""
+
+  def __init__(self, failures):
+    self.failures = failures
+    self.attempts = []
+    self.onLost = None
+    self.lastFrameTime = None
+
+  async def connect(self):
+    self.attempts.append(asyncio.get_running_loop().time())
+    if (len(self.attempts) <= self.failures):
+      raise BusConnectionError("no such port")
+
+  def close(self):
+    pass
+
+def test_reconnect_backs_off(monkeypatch):
+  # long enough for the doubling to stand out of the event loop jitter of a busy machine
+  monkeypatch.setattr(connection, "RECONNECT_MIN_DELAY", 0.03)
+
+  async def scenario():
+    transport = FlakyTransport(failures = 4)
+    manager = ConnectionManager(transport)
+    await manager.start()
+    assert not manager.isConnected
+    assert await manager.get(2) is transport
+    await manager.close()
+    return transport.attempts, manager.connectCount
+
+  attempts, connects = asyncio.run(scenario())
+  delays = [later - earlier for (earlier, later) in zip(attempts, attempts[1:])]
+  assert len(attempts) == 5
+  assert connects == 1
+  # 0.03, 0.06, 0.12, 0.24 seconds
+  assert all(later > earlier * 1.5 for (earlier, later) in zip(delays, delays[1:]))
+
+def test_get_fails_after_close():
+  async def scenario():
+    manager = ConnectionManager(FlakyTransport(failures = 0))
+    await manager.start()
+    await manager.close()
+    with pytest.raises(BusConnectionError):
+      await manager.get(1)
+
+  asyncio.run(scenario())
+
+def test_reconnect_after_the_gateway_drops_us(fastReconnect):
+  async def scenario():
+    bus = SimulatedBus(latency = 0.002)
+    bus.addLightContainer(3, state = 0x05)
+    port = await bus.startServer()
+    svc = DominoService(port, 19200)
+    await svc.connect()
+    try:
+      await svc.readRegister(3, 0x31)
+      bus.dropClients()
+      await asyncio.sleep(0.1)
+      frame = await svc.readRegister(3, 0x31)
+      return frame, svc.connection.stats()
+    finally:
+      await svc.disconnect()
+      bus.stop()
+
+  frame, stats = asyncio.run(scenario())
+  assert frame[5] == 0x05
+  assert stats == {"connected": True, "connects": 2, "connection_lost": 1}
+
+def deadDevicesScenario(simulatedBus, monkeypatch, devices, sweeps, heard = False):
+  # timeouts of 20ms, a line that heard nothing for 150ms is stalled
+  monkeypatch.setattr(connection, "STALL_SILENCE", 0.15)
+  simulatedBus.bus.addLightContainer(3)
+
+  async def scenario(port):
+    svc = DominoService(port, 19200)
+    svc.timeout = 0.02
+    await svc.connect()
+    try:
+      for device in [LightContainer(3)] + devices:
+        svc.scheduler.register([device], lambda *statuses: None)
+      await svc.readRegister(3, 0x31)
+      for _ in range(sweeps):
+        if (heard):
+          # another master keeps talking to a live module
+          simulatedBus.bus.switch(3, 0, 0x11)
+          await asyncio.sleep(0.01)
+        for device in devices:
+          for (mod, func) in device.registers():
+            try:
+              await svc.readRegister(mod, func)
+            except Exception:
+              pass
+      return svc.connection.lostCount
+    finally:
+      await svc.disconnect()
+
+  return simulatedBus.run(scenario)
+
+def test_dead_meteo_station_does_not_stall_the_line(simulatedBus, monkeypatch, fastReconnect):
+  # four addresses of one device, timing out for longer than the stall silence
+  assert deadDevicesScenario(simulatedBus, monkeypatch, [Meteo(80)], sweeps = 3) == 0
+
+def test_dead_devices_on_a_silent_line_stall_it(simulatedBus, monkeypatch, fastReconnect):
+  assert deadDevicesScenario(simulatedBus, monkeypatch, [Meteo(80), RoomTemperature(30)], sweeps = 2) == 1
+
+def test_traffic_on_the_line_is_not_a_stall(simulatedBus, monkeypatch, fastReconnect):
+  assert deadDevicesScenario(simulatedBus, monkeypatch, [Meteo(80), RoomTemperature(30)], sweeps = 2, heard = True) == 0
+
+def test_timeouts_that_stall_the_line_count_against_the_modules(simulatedBus, monkeypatch, fastReconnect):
+  # the timeout that makes the line look stalled still counts, so the dead modules go unavailable
+  monkeypatch.setattr(connection, "STALL_SILENCE", 0.05)
+  devices = [RoomTemperature(30), RoomTemperature(35)]
+
+  async def scenario(port):
+    svc = DominoService(port, 19200)
+    svc.timeout = 0.02
+    await svc.connect()
+    try:
+      for device in devices:
+        svc.scheduler.register([device], lambda *statuses: None)
+      for _ in range(3):
+        for device in devices:
+          for (mod, func) in device.registers():
+            try:
+              await svc.readRegister(mod, func)
+            except Exception:
+              pass
+      return svc.breakers.unavailable(), svc.connection.lostCount
+    finally:
+      await svc.disconnect()
+
+  unavailable, lost = simulatedBus.run(scenario)
+  assert lost >= 1
+  assert unavailable == [31, 36]
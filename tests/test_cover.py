@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from domino_hub.cover import DominoAwningEntity
+from domino_hub.devicemap import DeviceMap
+from domino_hub.dominoService import DominoService
+
+def coverEntity(invertPosition = None):
+  item = {"mod": 17, "num": 1, "name": "Tenda"}
+  if (invertPosition is not None):
+    item["invertPosition"] = invertPosition
+  entry = DeviceMap({"covers": [item]}).covers[0]
+  sent = []
+
+  async def setPosition(svc, pct):
+    sent.append(pct)
+
+  entry.device.setPosition = setPosition
+  entity = DominoAwningEntity(DominoService("unused", 19200), entry.device, entry.name, entry.deviceId)
+  entity._onMoved = lambda: None
+  return entity, sent
+
+@pytest.mark.parametrize("invertPosition, expected", [(None, [100, 0, 70]), (True, [100, 0, 70]), (False, [100, 0, 30])])
+def test_position_commands(invertPosition, expected):
+  entity, sent = coverEntity(invertPosition)
+
+  async def scenario():
+    await entity.async_open_cover()
+    await entity.async_close_cover()
+    await entity.async_set_cover_position(position = 30)
+
+  asyncio.run(scenario())
+  assert sent == expected
+
+def test_invert_position_must_be_a_flag():
+  with pytest.raises(ValueError, match = "invertPosition"):
+    DeviceMap({"covers": [{"mod": 17, "num": 1, "name": "Tenda", "invertPosition": "yes"}]})
@@ -0,0 +1,56 @@
+import pytest
+
+from domino_hub.devicemap import DeviceMap
+from domino_hub.dominoService import Dimmer, Light, Meteo, Motor, RoomTemperature
+
+def test_default_map_is_the_house_as_it_was_wired():
+  deviceMap = DeviceMap()
+  assert (len(deviceMap.dimmers), len(deviceMap.lights), len(deviceMap.covers), len(deviceMap.rooms), len(deviceMap.meteos)) == (3, 12, 5, 5, 2)
+  # room sensors answer on the address after their own
+  assert deviceMap.modules() == [1, 2, 3, 4, 5, 17, 19, 20, 23, 24, 25, 31, 36, 41, 46, 76, 80, 81, 82, 83, 90, 91, 92, 93]
+  assert len(deviceMap.groups) == 1 and len(deviceMap.groups[0].entries) == 12
+
+def test_devices_on_one_module_share_their_container():
+  deviceMap = DeviceMap({
+    "lights": [{"mod": 2, "num": 1, "name": "a"}, {"mod": 2, "num": 4, "name": "b"}, {"mod": 3, "num": 1, "name": "c"}],
+    "covers": [{"mod": 17, "num": 1, "name": "x", "openTime": 25, "closeTime": 22.5}, {"mod": 17, "num": 2, "name": "y"}],
+  })
+  a, b, c = (entry.device for entry in deviceMap.lights)
+  x, y = (entry.device for entry in deviceMap.covers)
+  assert isinstance(a, Light) and a.container is b.container and a.container is not c.container
+  assert isinstance(x, Motor) and x.motor is y.motor
+  assert (x.travel.openTime, x.travel.closeTime) == (25, 22.5)
+  assert deviceMap.covers[1].deviceId == "cover_17_2"
+  assert deviceMap.lights[0].deviceId == "lights"
+  assert deviceMap.registerKeys() == [(2, 0x31), (3, 0x31), (17, 0x31)]
+
+def test_sections_build_their_device_types():
+  deviceMap = DeviceMap({"dimmers": [{"mod": 23, "name": "d"}], "rooms": [{"mod": 30, "name": "r"}], "meteo": [80]})
+  assert isinstance(deviceMap.dimmers[0].device, Dimmer)
+  assert isinstance(deviceMap.rooms[0].device, RoomTemperature)
+  assert isinstance(deviceMap.meteos[0].device, Meteo)
+  assert deviceMap.meteos[0].name == "Meteo 80"
+  assert deviceMap.modules() == [23, 31, 80, 81, 82, 83]
+
+@pytest.mark.parametrize("config, message", [
+  ([], "expected a mapping"),
+  ({"switches": []}, "unknown sections"),
+  ({"lights": {"mod": 2}}, "expected a list"),
+  ({"lights": [5]}, r"lights\[0\]: expected a mapping"),
+  ({"lights": [{"mod": 256, "num": 1, "name": "a"}]}, "module address must be 0-255"),
+  ({"lights": [{"mod": True, "num": 1, "name": "a"}]}, "module address must be 0-255"),
+  ({"lights": [{"mod": 2, "num": 5, "name": "a"}]}, "output number must be 1-4"),
+  ({"lights": [{"mod": 2, "num": 1}]}, "missing name"),
+  ({"lights": [{"mod": 2, "num": 1, "name": "a"}, {"mod": 2, "num": 1, "name": "b"}]}, "light 2.1 is already mapped"),
+  ({"lights": [{"mod": 2, "num": 1, "name": "a"}], "groups": [{"id": "g", "name": "G", "lights": ["2.2"]}]}, "light 2.2 is not mapped"),
+  ({"groups": [{"id": "g", "name": "G", "lights": ["kitchen"]}]}, "is not a mod.num address"),
+  ({"groups": [{"name": "G"}]}, "missing id"),
+  ({"covers": [{"mod": 17, "num": 3, "name": "x"}]}, "output number must be 1-2"),
+  ({"covers": [{"mod": 17, "num": 1, "name": "x"}, {"mod": 17, "num": 1, "name": "y"}]}, "cover 17.1 is already mapped"),
+  ({"covers": [{"mod": 17, "num": 1, "name": "x", "openTime": 0}]}, "travel time must be a positive number"),
+  ({"covers": [{"mod": 17, "num": 1, "name": "x", "closeTime": "25"}]}, "travel time must be a positive number"),
+  ({"meteo": ["80"]}, r"meteo\[0\]: module address must be 0-255"),
+])
+def test_invalid_maps_say_what_is_wrong(config, message):
+  with pytest.raises(ValueError, match = message):
+    DeviceMap(config)
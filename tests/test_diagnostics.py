@@ -0,0 +1,28 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from domino_hub.diagnostics import async_get_config_entry_diagnostics
+from domino_hub.dominoService import DominoService
+from domino_hub.metrics import OUTCOME_OK, OUTCOME_TIMEOUT
+
+def test_diagnostics_report_every_bus():
+  first = DominoService("/dev/ttyUSB0", 19200)
+  second = DominoService("/dev/ttyUSB1", 19200)
+  first.metrics.record(2, 0x31, 0.008, OUTCOME_OK)
+  first.metrics.record(2, 0x31, 0.012, OUTCOME_OK)
+  second.metrics.record(30, 0x31, 10, OUTCOME_TIMEOUT)
+  entry = SimpleNamespace(data = {"comPort": "/dev/ttyUSB0"}, options = {}, runtime_data = SimpleNamespace(buses = [first, second]))
+
+  diagnostics = asyncio.run(async_get_config_entry_diagnostics(None, entry))
+
+  assert sorted(diagnostics["buses"]) == ["/dev/ttyUSB0", "/dev/ttyUSB1"]
+  module = diagnostics["buses"]["/dev/ttyUSB0"]["modules"][2]
+  assert module["requests"] == 2
+  assert module["latencyP95"] == 0.012
+  assert module["functions"]["0x31"]["histogram"]["le_20ms"] == 1
+  assert diagnostics["buses"]["/dev/ttyUSB0"]["stats"]["requests"] == 2
+  assert diagnostics["buses"]["/dev/ttyUSB1"]["modules"][30]["timeouts"] == 1
@@ -0,0 +1,70 @@
+import asyncio
+
+from domino_hub.discovery import KIND_DIMMER, KIND_OUTPUT, KIND_TEMPERATURE, BusDiscovery, ConnectionCheck
+from domino_hub.dominoService import DominoService
+
+def test_connection_check_finds_any_module(simulatedBus):
+  # a module none of the built-in map addresses point at
+  simulatedBus.bus.addLightContainer(6)
+
+  async def scenario(port):
+    check = ConnectionCheck(port, baudRates = (9600, 19200))
+    return await check.run(9600), check
+
+  found, check = simulatedBus.run(scenario)
+  assert found
+  assert check.baudRate == 9600
+  assert check.rtt is not None
+
+def test_connection_check_counts_traffic_it_did_not_ask_for(simulatedBus):
+  simulatedBus.bus.addLightContainer(200)
+
+  async def scenario(port):
+    check = ConnectionCheck(port, baudRates = (19200,), sweepTime = 0.1)
+    simulatedBus.bus._loop.call_later(0.05, simulatedBus.bus.announce, 200)
+    return await check.run(19200), check
+
+  found, check = simulatedBus.run(scenario)
+  assert found
+  assert check.rtt is None
+
+def test_connection_check_on_a_silent_bus(simulatedBus):
+  async def scenario(port):
+    check = ConnectionCheck(port, baudRates = (19200,), listenTime = 0.05, sweepTime = 0.1)
+    return await check.run(19200), check
+
+  found, check = simulatedBus.run(scenario)
+  assert not found
+  assert check.baudRate is None
+
+def test_connection_check_gives_up_quickly(simulatedBus):
+  async def scenario(port):
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    found = await ConnectionCheck(port).run(19200)
+    return found, loop.time() - start
+
+  found, duration = simulatedBus.run(scenario)
+  assert not found
+  assert duration < 2.5
+
+def test_discovery_drafts_a_device_map(simulatedBus):
+  simulatedBus.bus.addLightContainer(10)
+  simulatedBus.bus.addDimmer(23, pct = 60)
+  simulatedBus.bus.addRoomTemperature(40)
+
+  async def scenario(port):
+    svc = DominoService(port, 19200)
+    await svc.connect()
+    try:
+      discovery = BusDiscovery(svc, addresses = range(1, 48))
+      return await discovery.scan(), discovery.deviceMapDraft()
+    finally:
+      await svc.disconnect()
+
+  result, draft = simulatedBus.run(scenario)
+  assert [(module["mod"], module["kind"]) for module in result["modules"]] == [
+    (10, KIND_OUTPUT), (23, KIND_DIMMER), (40, KIND_TEMPERATURE), (41, KIND_TEMPERATURE)]
+  assert draft["dimmers"] == [{"mod": 23, "name": "Dimmer 23"}]
+  assert [light["mod"] for light in draft["lights"]] == [10] * 4
+  assert draft["rooms"] == [{"mod": 40, "name": "Temperature 40"}]
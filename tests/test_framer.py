@@ -0,0 +1,50 @@
+from domino_hub.codec import calcMessage, statusRequest
+from domino_hub.framer import FrameDecoder, isValidFrame
+
+REPLY = calcMessage([0x55, 0x82, 0x31, 17, 0x00, 0x28])
+
+def decode(decoder, *chunks):
+  frames = []
+  for chunk in chunks:
+    decoder.feed(chunk)
+    frames.extend(bytes(frame) for frame in decoder.frames())
+  return frames
+
+def test_checksum():
+  assert isValidFrame(REPLY)
+  assert isValidFrame(statusRequest(17, 0x31))
+  assert not isValidFrame(REPLY[:-1] + bytes([REPLY[-1] ^ 0x01]))
+
+def test_frame_split_across_reads():
+  decoder = FrameDecoder()
+  assert decode(decoder, REPLY[:3], REPLY[3:5], REPLY[5:]) == [REPLY]
+  assert decoder.frameCount == 1
+  assert len(decoder) == 0
+
+def test_back_to_back_frames():
+  other = calcMessage([0x55, 0x82, 0x31, 18, 0x00, 0x05])
+  assert decode(FrameDecoder(), REPLY + other + REPLY) == [REPLY, other, REPLY]
+
+def test_resync_on_garbage():
+  decoder = FrameDecoder()
+  assert decode(decoder, b"\x01\x02\x03" + REPLY) == [REPLY]
+  assert decoder.resyncCount == 1
+  assert decoder.discardedBytes == 3
+
+def test_bad_checksum_skips_to_next_header():
+  decoder = FrameDecoder()
+  corrupt = REPLY[:-1] + bytes([REPLY[-1] ^ 0xFF])
+  assert decode(decoder, corrupt + REPLY) == [REPLY]
+  assert decoder.checksumErrorCount >= 1
+  assert decoder.frameCount == 1
+
+def test_buffer_grows_past_capacity():
+  decoder = FrameDecoder(capacity = 8)
+  assert decode(decoder, REPLY * 5) == [REPLY] * 5
+
+def test_clear_drops_partial_frame():
+  decoder = FrameDecoder()
+  decoder.feed(REPLY[:4])
+  decoder.clear()
+  assert decode(decoder, REPLY) == [REPLY]
+  assert decoder.discardedBytes == 4
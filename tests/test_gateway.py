@@ -0,0 +1,162 @@
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+import serial
+import serial.rfc2217
+
+from domino_hub.codec import calcMessage, statusRequest
+from domino_hub.exceptions import BusConnectionError
+from domino_hub.simulator import SimulatedBus
+from domino_hub.transport import Rfc2217Transport, SerialTransport, SocketTransport, createTransport
+
+@pytest.mark.parametrize("url, kind", [
+  ("/dev/ttyUSB0", SerialTransport),
+  ("socket://gateway:4001", SocketTransport),
+  ("rfc2217://gateway:4002", Rfc2217Transport),
+])
+def test_transport_follows_the_port_url(url, kind):
+  transport = createTransport(url, 19200)
+  assert type(transport) is kind
+  assert transport.setsBaudRate == (kind is not SocketTransport)
+
+@pytest.mark.parametrize("url", ["loop://", "socket://gateway", "socket://:4001"])
+def test_unusable_urls_are_refused(url):
+  with pytest.raises(BusConnectionError):
+    createTransport(url, 19200)
+
+def test_socket_gateway_exchange():
+  bus = SimulatedBus(latency = 0.002)
+  bus.addLightContainer(2, state = 0x05)
+
+  async def scenario():
+    port = await bus.startServer()
+    transport = createTransport(port, 19200)
+    await transport.connect()
+    try:
+      sock = transport._transport.get_extra_info("socket")
+      reply = await transport.exchange(statusRequest(2, 0x31), 1)
+      return bytes(reply), sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY), sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE)
+    finally:
+      transport.close()
+      bus.stop()
+
+  reply, nodelay, keepalive = asyncio.run(scenario())
+  assert reply == calcMessage([0x55, 0x82, 0x31, 2, 0x00, 0x05])
+  assert nodelay and keepalive
+
+def test_socket_gateway_dropping_us_fails_the_exchange():
+  # a module that never answers, then the bridge goes away
+  bus = SimulatedBus(latency = 0.002)
+
+  async def scenario():
+    port = await bus.startServer()
+    transport = createTransport(port, 19200)
+    lost = []
+    transport.onLost = lost.append
+    await transport.connect()
+    try:
+      pending = asyncio.ensure_future(transport.exchange(statusRequest(9, 0x31), 5))
+      await asyncio.sleep(0.02)
+      bus.dropClients()
+      with pytest.raises(BusConnectionError):
+        await pending
+      return lost, transport.isOpen
+    finally:
+      transport.close()
+      bus.stop()
+
+  lost, isOpen = asyncio.run(scenario())
+  assert len(lost) == 1 and isinstance(lost[0], BusConnectionError)
+  assert not isOpen
+
+def test_socket_gateway_unreachable():
+  sock = socket.socket()
+  sock.bind(("127.0.0.1", 0))
+  port = sock.getsockname()[1]
+  sock.close()
+
+  async def scenario():
+    await createTransport(f"socket://127.0.0.1:{port}", 19200).connect()
+
+  with pytest.raises(BusConnectionError):
+    asyncio.run(scenario())
+
+class PtyLine(serial.Serial):
+  # a pseudo-terminal has no modem lines to report or drive
+  cts = dsr = ri = cd = False
+
+  def _update_dtr_state(self):
+    pass
+
+  def _update_rts_state(self):
+    pass
+
+def rfc2217Server(device):
+  """A one-client RFC 2217 server in front of a serial device, as a serial server
+  in the cabinet would be, returns its port and the line settings it was given."""
+  server = socket.socket()
+  server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+  server.bind(("127.0.0.1", 0))
+  server.listen(1)
+  ser = PtyLine(device, timeout = 0.02)
+
+  def serve():
+    conn, _ = server.accept()
+    server.close()
+
+    class Connection:
+      def write(self, data):
+        conn.sendall(data)
+
+    manager = serial.rfc2217.PortManager(ser, Connection())
+    done = threading.Event()
+
+    def toClient():
+      while (not done.is_set()):
+        data = ser.read(64)
+        if (data):
+          try:
+            conn.sendall(b"".join(manager.escape(data)))
+          except OSError:
+            return
+
+    threading.Thread(target = toClient, daemon = True).start()
+    while True:
+      data = conn.recv(1024)
+      if (not data):
+        break
+      ser.write(b"".join(manager.filter(data)))
+    done.set()
+    conn.close()
+
+  threading.Thread(target = serve, daemon = True).start()
+  return server.getsockname()[1], ser
+
+def test_rfc2217_gateway_exchange(simulatedBus):
+  simulatedBus.bus.addLightContainer(2, state = 0x05)
+
+  async def scenario(device):
+    port, line = rfc2217Server(device)
+    transport = createTransport(f"rfc2217://127.0.0.1:{port}", 9600)
+    await transport.connect()
+    try:
+      reply = await transport.exchange(statusRequest(2, 0x31), 2)
+      baudrate = line.baudrate
+    finally:
+      start = time.monotonic()
+      transport.close()
+      closing = time.monotonic() - start
+    await asyncio.sleep(0.2)
+    line.close()
+    return bytes(reply), baudrate, closing, transport.isOpen
+
+  reply, baudrate, closing, isOpen = simulatedBus.run(scenario)
+  assert reply == calcMessage([0x55, 0x82, 0x31, 2, 0x00, 0x05])
+  # the line settings went through to the serial server
+  assert baudrate == 9600
+  # pyserial's close waits on the server, the event loop does not
+  assert closing < 0.05
+  assert not isOpen
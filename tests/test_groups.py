@@ -0,0 +1,57 @@
+from domino_hub.devicemap import DeviceMap
+from domino_hub.dominoService import DominoService
+
+def houseBus(simulatedBus, deviceMap):
+  for mod in {entry.device.mod for entry in deviceMap.lights}:
+    simulatedBus.bus.addLightContainer(mod, state = 0x0F)
+
+def test_all_off_is_one_frame_per_container(simulatedBus):
+  deviceMap = DeviceMap()
+  houseBus(simulatedBus, deviceMap)
+
+  async def scenario(port):
+    svc = DominoService(port, 19200, deviceMap = deviceMap)
+    await svc.connect()
+    try:
+      lights = [entry.device for entry in deviceMap.groups[0].entries]
+      frames = await svc.setLights(lights, 0)
+      return len(lights), frames, simulatedBus.bus.requestCount
+    finally:
+      await svc.disconnect()
+
+  lights, frames, requests = simulatedBus.run(scenario)
+  assert (lights, frames, requests) == (12, 5, 5)
+  states = {mod: model.state for (mod, model) in simulatedBus.bus.modules.items()}
+  # only the mapped outputs went off, the others were left alone
+  assert states == {1: 0x07, 2: 0x08, 3: 0x04, 4: 0x0C, 5: 0x01}
+
+def test_group_switches_only_its_members(simulatedBus):
+  deviceMap = DeviceMap({
+    "lights": [
+      {"mod": 2, "num": 1, "name": "a"},
+      {"mod": 2, "num": 3, "name": "b"},
+      {"mod": 3, "num": 2, "name": "c"},
+      {"mod": 3, "num": 4, "name": "d"},
+    ],
+    "groups": [{"id": "night", "name": "Night", "lights": ["2.3", [3, 2]]}],
+  })
+  simulatedBus.bus.addLightContainer(2, state = 0x01)
+  simulatedBus.bus.addLightContainer(3, state = 0x08)
+
+  async def scenario(port):
+    svc = DominoService(port, 19200, deviceMap = deviceMap)
+    await svc.connect()
+    try:
+      group = deviceMap.groups[0]
+      frames = await svc.setLights([entry.device for entry in group.entries], 100)
+      statuses = [await entry.device.status(svc) for entry in deviceMap.lights]
+      return [entry.name for entry in group.entries], frames, statuses
+    finally:
+      await svc.disconnect()
+
+  members, frames, statuses = simulatedBus.run(scenario)
+  assert members == ["b", "c"]
+  assert frames == 2
+  assert statuses == [True, True, True, True]
+  assert simulatedBus.bus.modules[2].state == 0x05
+  assert simulatedBus.bus.modules[3].state == 0x0A
@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+import pytest
+
+from domino_hub.dominoService import DominoService, LightContainer
+from domino_hub.hub import DominoHub
+from domino_hub.simulator import SimulatedBus
+
+LATENCY = 0.04
+CONTAINERS = [1, 2, 3, 4, 5]
+
+def test_buses_are_polled_side_by_side(simulatedBus):
+  # the harness bus and a second one, each with five light containers behind a slow line
+  other = SimulatedBus(latency = LATENCY)
+  for bus in (simulatedBus.bus, other):
+    bus.latency = LATENCY
+    for mod in CONTAINERS:
+      bus.addLightContainer(mod, state = 0x01)
+
+  async def scenario(port):
+    otherPort = await other.start()
+    hub = DominoHub([DominoService(port, 19200), DominoService(otherPort, 19200, busId = "b")])
+    try:
+      await hub.connect()
+      for bus in hub.buses:
+        bus.scheduler.register([LightContainer(mod) for mod in CONTAINERS], lambda *statuses: None)
+      start = time.monotonic()
+      await hub.refresh()
+      return time.monotonic() - start, [bus.stats()["bus_reads"] for bus in hub.buses]
+    finally:
+      await hub.disconnect()
+      other.stop()
+
+  elapsed, reads = simulatedBus.run(scenario)
+  assert reads == [5, 5]
+  # one bus takes five latencies, both in a row would take ten
+  assert elapsed < LATENCY * len(CONTAINERS) * 1.6
+  assert simulatedBus.bus.requestCount == other.requestCount == 5
+
+def test_one_failing_bus_does_not_stop_the_others(simulatedBus, caplog):
+  simulatedBus.bus.addLightContainer(2, state = 0x01)
+
+  async def scenario(port):
+    good = DominoService(port, 19200)
+    bad = DominoService("/dev/null-bus", 19200, busId = "b")
+    hub = DominoHub([good, bad])
+    await good.connect()
+    try:
+      seen = []
+      good.scheduler.register([LightContainer(2)], seen.append)
+
+      async def broken():
+        raise RuntimeError("port gone")
+
+      bad.scheduler.refresh = broken
+      await hub.refresh()
+      await asyncio.sleep(0)
+      return seen
+    finally:
+      await good.disconnect()
+
+  assert simulatedBus.run(scenario) == [0x01]
+  assert "Error during poll cycle on /dev/null-bus: port gone" in caplog.text
+
+def test_extra_buses_keep_their_entities_apart():
+  first = DominoService("/dev/ttyUSB0", 19200)
+  second = DominoService("socket://gateway:4001", 19200, busId = "cellar")
+  hub = DominoHub([first, second])
+  assert hub.primary is first
+  assert hub.bus("socket://gateway:4001") is second
+  assert hub.bus("/dev/ttyUSB9") is None
+  assert first.uniqueId("domino_light_2_1") == "domino_light_2_1"
+  assert second.uniqueId("domino_light_2_1") == "domino_light_2_1_cellar"
+  assert first.queue is not second.queue and first.transport is not second.transport
+  with pytest.raises(ValueError):
+    DominoHub([])
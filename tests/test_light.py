@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from domino_hub.devicemap import DeviceMap
+from domino_hub.dominoService import DominoService
+from domino_hub.light import DominoLightEntity, DominoLightGroupEntity
+
+def groupEntity(setLights):
+  svc = DominoService("unused", 19200)
+  svc.setLights = setLights
+  members = [DominoLightEntity(svc, entry.device, entry.name) for entry in DeviceMap().lights[:3]]
+  group = DominoLightGroupEntity(svc, members, "Luci - Tutte", "all")
+  for entity in members + [group]:
+    entity.async_write_ha_state = lambda: None
+    entity._attr_is_on = True
+  return group, members
+
+def test_group_command_is_one_service_call():
+  calls = []
+
+  async def setLights(lights, pct):
+    calls.append(([(light.mod, light.num) for light in lights], pct))
+    return 1
+
+  group, members = groupEntity(setLights)
+  asyncio.run(group.async_turn_off())
+  assert calls == [([(2, 1), (2, 2), (2, 3)], 0)]
+  assert not group.is_on
+  assert not any(member.is_on for member in members)
+
+def test_failed_group_command_keeps_the_states():
+  async def setLights(lights, pct):
+    raise TimeoutError()
+
+  group, members = groupEntity(setLights)
+  asyncio.run(group.async_turn_off())
+  assert group.is_on
+  assert all(member.is_on for member in members)
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from domino_hub.dominoService import DominoService
+from domino_hub.exceptions import ModuleNakError, ModuleTimeoutError
+from domino_hub.metrics import (BusMetrics, ExchangeMetrics, LatencyHistogram, OUTCOME_NAK, OUTCOME_OK,
+  OUTCOME_TIMEOUT)
+
+def test_histogram_percentile_is_capped_by_the_slowest_exchange():
+  histogram = LatencyHistogram()
+  for latency in [0.004] * 18 + [0.03, 0.12]:
+    histogram.add(latency)
+  assert histogram.count == 20
+  assert histogram.asDict()["le_10ms"] == 18
+  assert histogram.asDict()["le_50ms"] == 1
+  assert histogram.asDict()["le_200ms"] == 1
+  assert histogram.percentile(50) == 0.01
+  assert histogram.percentile(95) == 0.05
+  assert histogram.percentile(100) == 0.12
+  assert LatencyHistogram().percentile(95) is None
+
+def test_a_request_after_a_failure_counts_as_a_retry():
+  metrics = ExchangeMetrics()
+  for outcome in (OUTCOME_OK, OUTCOME_TIMEOUT, OUTCOME_TIMEOUT, OUTCOME_OK, OUTCOME_NAK, OUTCOME_OK):
+    metrics.record(0.01, outcome)
+  stats = metrics.asDict()
+  assert (stats["requests"], stats["timeouts"], stats["naks"], stats["retries"]) == (6, 2, 1, 3)
+  # timeouts cost bus time but say nothing about how fast the module answers
+  assert metrics.latency.count == 4
+  assert metrics.busTime == pytest.approx(0.06)
+
+def test_new_modules_are_announced_once():
+  metrics = BusMetrics()
+  seen = []
+  remove = metrics.addModuleListener(seen.append)
+  metrics.record(2, 0x31, 0.01, OUTCOME_OK)
+  metrics.record(2, 0x30, 0.01, OUTCOME_NAK)
+  metrics.record(9, 0x31, 0.5, OUTCOME_TIMEOUT)
+  remove()
+  metrics.record(12, 0x31, 0.01, OUTCOME_OK)
+  assert seen == [2, 9]
+  assert metrics.modules() == [2, 9, 12]
+  assert metrics.slowestModule() == 9
+
+def test_service_records_every_exchange_outcome(simulatedBus):
+  simulatedBus.bus.addLightContainer(2, state = 0x01)
+
+  async def scenario(port):
+    svc = DominoService(port, 19200)
+    svc.timeout = 0.05
+    await svc.connect()
+    try:
+      await svc.readRegister(2, 0x31)
+      # a light container has no inputs register
+      with pytest.raises(ModuleNakError):
+        await svc.readRegister(2, 0x30)
+      with pytest.raises(ModuleTimeoutError):
+        await svc.readRegister(9, 0x31)
+      await svc.readRegister(2, 0x31)
+      return svc.stats(), svc.metrics
+    finally:
+      await svc.disconnect()
+
+  stats, metrics = simulatedBus.run(scenario)
+  assert {name: stats[name] for name in ("requests", "naks", "timeouts", "errors")} == {
+    "requests": 4, "naks": 1, "timeouts": 1, "errors": 0,
+  }
+  assert stats["utilization"] > 0
+  summary = metrics.moduleSummary(2)
+  assert (summary["requests"], summary["naks"], summary["timeouts"]) == (3, 1, 0)
+  assert sorted(summary["functions"]) == ["0x30", "0x31"]
+  assert summary["functions"]["0x31"]["requests"] == 2
+  assert metrics.moduleSummary(9)["timeouts"] == 1
+  assert metrics.slowestModule() == 9
@@ -0,0 +1,99 @@
+import asyncio
+
+from domino_hub.codec import calcMessage, frameData, statusRequest
+from domino_hub.dominoService import DominoService, LightContainer
+
+async def openService(port):
+  svc = DominoService(port, 19200)
+  await svc.connect()
+  svc.listen()
+  statuses = []
+  svc.scheduler.register([LightContainer(3)], statuses.append)
+  return svc, statuses
+
+def test_foreign_write_is_not_our_reply(simulatedBus):
+  container = simulatedBus.bus.addLightContainer(3, state = 0x03)
+
+  async def scenario(port):
+    svc, _ = await openService(port)
+    try:
+      read = asyncio.ensure_future(svc.readRegister(3, 0x31))
+      # another master switches output 2 of the module before it answers us
+      simulatedBus.bus.switch(3, 0, 0x22)
+      frame = await read
+      await asyncio.sleep(0.05)
+      return frame, svc.cache.peek((3, 0x31)), svc.monitoredWrites
+    finally:
+      await svc.disconnect()
+
+  frame, cached, monitoredWrites = simulatedBus.run(scenario)
+  assert frame[2] == 0x31
+  assert frameData(frame) == (0, 0x03)
+  assert frameData(cached) == (0, container.state)
+  assert monitoredWrites == 1
+
+def test_foreign_status_request_is_not_our_reply(simulatedBus):
+  simulatedBus.bus.addLightContainer(3, state = 0x05)
+
+  async def scenario(port):
+    svc, _ = await openService(port)
+    try:
+      read = asyncio.ensure_future(svc.readRegister(3, 0x31))
+      simulatedBus.bus.send(statusRequest(3, 0x31))
+      return await read, svc.monitoredFrames
+    finally:
+      await svc.disconnect()
+
+  frame, monitoredFrames = simulatedBus.run(scenario)
+  assert frameData(frame) == (0, 0x05)
+  assert monitoredFrames == 0
+
+def test_nak_of_another_module_is_not_our_reply(simulatedBus):
+  simulatedBus.bus.addLightContainer(3, state = 0x01)
+
+  async def scenario(port):
+    svc, _ = await openService(port)
+    try:
+      read = asyncio.ensure_future(svc.readRegister(3, 0x31))
+      simulatedBus.bus.send(calcMessage([0x55, 0x82, 0x0, 4, 0, 0xf0]))
+      return await read
+    finally:
+      await svc.disconnect()
+
+  assert frameData(simulatedBus.run(scenario)) == (0, 0x01)
+
+def test_unsolicited_status_updates_the_entities(simulatedBus):
+  container = simulatedBus.bus.addLightContainer(3, state = 0x01)
+
+  async def scenario(port):
+    svc, statuses = await openService(port)
+    try:
+      await svc.scheduler.refresh()
+      container.state = 0x09
+      # the module reports a wall switch press on its own
+      simulatedBus.bus.announce(3)
+      await asyncio.sleep(0.05)
+      return statuses, svc.monitoredFrames
+    finally:
+      await svc.disconnect()
+
+  statuses, monitoredFrames = simulatedBus.run(scenario)
+  assert statuses == [0x01, 0x09]
+  assert monitoredFrames == 1
+
+def test_foreign_write_is_read_back(simulatedBus):
+  simulatedBus.bus.addLightContainer(3, state = 0x00)
+
+  async def scenario(port):
+    svc, statuses = await openService(port)
+    try:
+      await svc.scheduler.refresh()
+      simulatedBus.bus.switch(3, 0, 0x11)
+      await asyncio.sleep(0.05)
+      return statuses, svc.monitoredWrites
+    finally:
+      await svc.disconnect()
+
+  statuses, monitoredWrites = simulatedBus.run(scenario)
+  assert statuses == [0x00, 0x01]
+  assert monitoredWrites == 1
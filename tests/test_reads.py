@@ -0,0 +1,107 @@
+import asyncio
+import time
+
+import pytest
+
+from domino_hub.dominoService import DominoService, Light, LightContainer, Meteo
+from domino_hub.exceptions import ModuleTimeoutError
+
+async def openService(port):
+  svc = DominoService(port, 19200)
+  await svc.connect()
+  return svc
+
+def test_concurrent_reads_share_one_frame(simulatedBus):
+  simulatedBus.bus.addLightContainer(2, state = 0x05)
+
+  async def scenario(port):
+    svc = await openService(port)
+    try:
+      container = LightContainer(2)
+      lights = [Light(container, num) for num in range(1, 5)]
+      statuses = await asyncio.gather(*[light.status(svc) for light in lights])
+      return statuses, simulatedBus.bus.requestCount, svc.stats()
+    finally:
+      await svc.disconnect()
+
+  statuses, requests, stats = simulatedBus.run(scenario)
+  assert statuses == [True, False, True, False]
+  assert requests == 1
+  assert stats["bus_reads"] == 1
+  assert stats["coalesced_reads"] == 3
+
+def test_meteo_reads_each_register_once(simulatedBus):
+  simulatedBus.bus.addMeteo(80)
+
+  async def scenario(port):
+    svc = await openService(port)
+    try:
+      meteos = [Meteo(80, num) for num in range(4)]
+      await asyncio.gather(*[meteo.readStatus(svc) for meteo in meteos])
+      return simulatedBus.bus.requestCount, svc.stats()
+    finally:
+      await svc.disconnect()
+
+  requests, stats = simulatedBus.run(scenario)
+  assert requests == 4
+  assert stats["bus_reads"] == 4
+  assert stats["coalesced_reads"] == 12
+
+def test_shared_read_failure_reaches_every_reader(simulatedBus):
+  async def scenario(port):
+    svc = await openService(port)
+    svc.timeout = 0.02
+    try:
+      results = await asyncio.gather(*[svc.readRegister(9, 0x31) for _ in range(3)], return_exceptions = True)
+      # the failed read is not kept around, the next reader asks again
+      with pytest.raises(ModuleTimeoutError):
+        await svc.readRegister(9, 0x31)
+      return results, svc.busReads
+    finally:
+      await svc.disconnect()
+
+  results, busReads = simulatedBus.run(scenario)
+  assert all(isinstance(result, ModuleTimeoutError) for result in results)
+  assert busReads == 2
+
+def test_cancelled_reader_leaves_the_read_to_the_others(simulatedBus):
+  simulatedBus.bus.latency = 0.02
+  simulatedBus.bus.addLightContainer(2, state = 0x01)
+
+  async def scenario(port):
+    svc = await openService(port)
+    try:
+      first = asyncio.ensure_future(svc.readRegister(2, 0x31))
+      second = asyncio.ensure_future(svc.readRegister(2, 0x31))
+      await asyncio.sleep(0.005)
+      first.cancel()
+      return await second, simulatedBus.bus.requestCount
+    finally:
+      await svc.disconnect()
+
+  frame, requests = simulatedBus.run(scenario)
+  assert frame[5] == 0x01
+  assert requests == 1
+
+def test_stale_value_is_served_and_refreshed_in_the_background(simulatedBus):
+  simulatedBus.bus.addLightContainer(2, state = 0x01)
+
+  async def scenario(port):
+    svc = await openService(port)
+    try:
+      container = LightContainer(2)
+      key = (2, 0x31)
+      ttl = svc.cache.ttl(container.cacheClass)
+      # what the cache last heard has the first output off, the module now says on
+      svc.cache.store(key, [0x55, 0x82, 0x31, 2, 0, 0x00, 0], time.monotonic() - ttl * 1.5)
+      stale = await container.status(svc)
+      await asyncio.shield(svc._inflight[key])
+      fresh = await container.status(svc)
+      return stale, fresh, simulatedBus.bus.requestCount, svc.stats()
+    finally:
+      await svc.disconnect()
+
+  stale, fresh, requests, stats = simulatedBus.run(scenario)
+  assert (stale, fresh) == (0x00, 0x01)
+  assert requests == 1
+  assert stats["bus_reads"] == 1
@@ -0,0 +1,107 @@
+import asyncio
+import time
+
+from domino_hub.codec import calcMessage
+from domino_hub.recorder import CAPTURE_MAGIC, CAPTURE_VERSION, HEADER, RECORD, BusRecorder, CaptureReader, ReplayTransport
+from domino_hub.transport import DIRECTION_RECEIVED, DIRECTION_SENT
+
+def frame(mod, value):
+  return calcMessage([0x55, 0x82, 0x31, mod, 0, value])
+
+def writeCapture(path, records, capacity = 16):
+  # records as (seconds since the capture started, direction, frame)
+  with open(path, "wb") as f:
+    f.write(HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, capacity, len(records), time.time()))
+    for (seconds, direction, data) in records:
+      f.write(RECORD.pack(int(seconds * 1e9), direction, data[3], data))
+    f.write(bytes((capacity - len(records)) * RECORD.size))
+
+def test_record_and_read_back(tmp_path):
+  path = tmp_path / "capture.bin"
+  recorder = BusRecorder(str(path), capacity = 8)
+  recorder.open()
+  recorder.record(DIRECTION_SENT, frame(3, 0x33))
+  recorder.record(DIRECTION_RECEIVED, frame(3, 0x05))
+  recorder.close()
+  reader = CaptureReader(str(path))
+  try:
+    records = list(reader)
+  finally:
+    reader.close()
+  assert [(r.direction, r.mod, r.frame) for r in records] == [(DIRECTION_SENT, 3, frame(3, 0x33)), (DIRECTION_RECEIVED, 3, frame(3, 0x05))]
+  assert records[0].timestamp <= records[1].timestamp
+
+def test_ring_keeps_the_latest_frames_across_restarts(tmp_path):
+  path = str(tmp_path / "capture.bin")
+  recorder = BusRecorder(path, capacity = 4)
+  recorder.open()
+  for value in range(3):
+    recorder.record(DIRECTION_RECEIVED, frame(3, value))
+  recorder.close()
+  # a restart goes on with the same capture
+  recorder = BusRecorder(path, capacity = 4)
+  recorder.open()
+  assert recorder.count == 3
+  for value in range(3, 6):
+    recorder.record(DIRECTION_RECEIVED, frame(3, value))
+  recorder.close()
+  reader = CaptureReader(path)
+  try:
+    assert reader.count == 6
+    assert [r.frame[5] for r in reader] == [2, 3, 4, 5]
+  finally:
+    reader.close()
+
+def test_flush_writes_in_the_background(tmp_path):
+  path = str(tmp_path / "capture.bin")
+  recorder = BusRecorder(path, capacity = 8)
+  recorder.open()
+  try:
+    recorder.record(DIRECTION_RECEIVED, frame(3, 1))
+    recorder.flush().result(timeout = 1)
+    reader = CaptureReader(path)
+    try:
+      assert [r.frame for r in reader] == [frame(3, 1)]
+    finally:
+      reader.close()
+  finally:
+    recorder.close()
+
+def replayed(path, **kwargs):
+  async def scenario():
+    transport = ReplayTransport(path, **kwargs)
+    frames = []
+    transport.onUnsolicited = frames.append
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    transport.open()
+    try:
+      await asyncio.wait_for(transport.finished.wait(), 5)
+    finally:
+      transport.close()
+    return frames, loop.time() - start
+  return asyncio.run(scenario())
+
+def test_replay_paces_from_the_first_frame(tmp_path):
+  # a ring that went around: its oldest frame is an hour into the capture, and a restart
+  # left half an hour without traffic
+  path = str(tmp_path / "capture.bin")
+  writeCapture(path, [
+    (3600.0, DIRECTION_RECEIVED, frame(3, 1)),
+    (3600.1, DIRECTION_SENT, frame(4, 0x33)),
+    (3600.2, DIRECTION_RECEIVED, frame(4, 2)),
+    (5400.0, DIRECTION_RECEIVED, frame(5, 3)),
+  ])
+  frames, duration = replayed(path, speed = 1.0, maxGap = 0.3)
+  assert [f[3] for f in frames] == [3, 4, 5]
+  assert 0.45 <= duration < 1.5
+
+def test_replay_speed(tmp_path):
+  path = str(tmp_path / "capture.bin")
+  writeCapture(path, [(100.0 + i * 0.2, DIRECTION_RECEIVED, frame(3, i)) for i in range(5)])
+  frames, duration = replayed(path, speed = 4.0)
+  assert len(frames) == 5
+  assert 0.15 <= duration < 1.0
+  frames, duration = replayed(path, speed = 0)
+  assert len(frames) == 5
+  assert duration < 0.15
@@ -0,0 +1,44 @@
+import asyncio
+
+from domino_hub.dominoService import DominoService, LightContainer, Motor, MotorContainer
+
+def test_registered_devices_get_their_status(simulatedBus):
+  simulatedBus.bus.addLightContainer(17, state = 0x03)
+
+  async def scenario(port):
+    svc = DominoService(port, 19200)
+    await svc.connect()
+    statuses = []
+    try:
+      svc.scheduler.register([LightContainer(17)], statuses.append)
+      await svc.scheduler.refresh()
+      return statuses
+    finally:
+      await svc.disconnect()
+
+  assert simulatedBus.run(scenario) == [0x03]
+
+def test_full_run_calibrates_through_the_scheduler(simulatedBus):
+  # every fast read of a moving motor has to reach its travel model, or the run
+  # ends too long after the last sighting to time it
+  simulatedBus.bus.addMotorContainer(17, travelTime = 4)
+
+  async def scenario(port):
+    svc = DominoService(port, 19200)
+    await svc.connect()
+    motor = Motor(MotorContainer(17), 1)
+    motor.travel.position = 0
+    try:
+      svc.scheduler.register([motor], motor.observe)
+      svc.scheduler.start()
+      await asyncio.sleep(0.2)
+      await motor.setPosition(svc, 100)
+      await asyncio.sleep(5)
+      return motor.travel
+    finally:
+      await svc.disconnect()
+
+  travel = simulatedBus.run(scenario)
+  assert travel.position == 100
+  assert travel.openTime is not None
+  assert abs(travel.openTime - 4) <= 1
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import time
+
+from domino_hub.dominoService import DominoService, LightContainer
+from domino_hub.hub import DominoHub
+
+CONTAINERS = [1, 2, 3, 4]
+
+def houseBus(simulatedBus):
+  for mod in CONTAINERS:
+    simulatedBus.bus.addLightContainer(mod, state = mod)
+
+async def takeSnapshot(port):
+  # what the last run left in storage, as JSON
+  svc = DominoService(port, 19200)
+  await svc.connect()
+  try:
+    for mod in CONTAINERS:
+      await svc.readRegister(mod, 0x31)
+    return json.loads(json.dumps(DominoHub([svc]).snapshot()))
+  finally:
+    await svc.disconnect()
+
+def test_warm_start_serves_the_snapshot_without_a_read(simulatedBus):
+  houseBus(simulatedBus)
+
+  async def scenario(port):
+    snapshot = await takeSnapshot(port)
+    requests = simulatedBus.bus.requestCount
+    svc = DominoService(port, 19200)
+    hub = DominoHub([svc])
+    hub.restoreSnapshot(snapshot, elapsed = 20)
+    await svc.connect()
+    try:
+      seen = []
+      for mod in CONTAINERS:
+        svc.scheduler.register([LightContainer(mod)], seen.append)
+      await asyncio.sleep(0)
+      return seen, simulatedBus.bus.requestCount - requests, svc.cache.age((1, 0x31))
+    finally:
+      await svc.disconnect()
+
+  seen, requests, age = simulatedBus.run(scenario)
+  assert seen == CONTAINERS
+  assert requests == 0
+  assert 20 <= age < 21
+
+def test_restored_registers_are_read_again_one_after_the_other(simulatedBus):
+  houseBus(simulatedBus)
+
+  async def scenario(port):
+    snapshot = await takeSnapshot(port)
+    requests = simulatedBus.bus.requestCount
+    svc = DominoService(port, 19200)
+    svc.restoreSnapshot(snapshot[port], elapsed = 20)
+    # the same plan, over a fraction of a second rather than a poll interval
+    svc.scheduler.warmStart(svc.cache.keys(), spread = 0.3)
+    await svc.connect()
+    try:
+      for mod in CONTAINERS:
+        svc.scheduler.register([LightContainer(mod)], lambda status: None)
+      svc.scheduler.start()
+      readsOverTime = []
+      start = time.monotonic()
+      while (time.monotonic() - start < 0.4):
+        readsOverTime.append(simulatedBus.bus.requestCount - requests)
+        await asyncio.sleep(0.05)
+      return readsOverTime
+    finally:
+      await svc.scheduler.stop()
+      await svc.disconnect()
+
+  readsOverTime = simulatedBus.run(scenario)
+  # the cold start read all four at once, the warm start one about every spread / 4
+  assert readsOverTime[1] <= 1
+  assert 1 <= readsOverTime[3] <= 3
+  assert readsOverTime[-1] == len(CONTAINERS)
+
+def test_snapshot_of_a_bus_is_kept_apart_from_the_others():
+  first = DominoService("/dev/ttyUSB0", 19200)
+  second = DominoService("socket://gateway:4001", 19200, busId = "b")
+  first.cache.store((2, 0x31), bytes.fromhex("558231020005f0"), time.monotonic() - 5)
+  hub = DominoHub([first, second])
+  snapshot = json.loads(json.dumps(hub.snapshot()))
+
+  restored = DominoHub([DominoService("/dev/ttyUSB0", 19200), DominoService("socket://gateway:4001", 19200, busId = "b")])
+  restored.restoreSnapshot(snapshot, elapsed = 0)
+  assert restored.primary.cache.peek((2, 0x31)) == bytes.fromhex("558231020005f0")
+  assert restored.bus("socket://gateway:4001").cache.peek((2, 0x31)) is None
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from domino_hub.codec import calcMessage, statusRequest
+from domino_hub.exceptions import BusConnectionError
+from domino_hub.transport import BusTransport, SerialTransport
+
+REQUEST = statusRequest(3, 0x31)
+REPLY = calcMessage([0x55, 0x82, 0x31, 3, 0x00, 0x05])
+
+class ScriptedTransport(BusTransport):
+  """Answers every request with the chunks of bytes it is given, in order."""
+
+  def __init__(self, *chunks):
+    super().__init__("scripted", 19200)
+    self.chunks = list(chunks)
+    self.sent = []
+    self.unsolicited = []
+    self.onUnsolicited = self.unsolicited.append
+    self._open = False
+
+  @property
+  def isOpen(self):
+    return self._open
+
+  def open(self):
+    self._loop = asyncio.get_running_loop()
+    self._open = True
+
+  def close(self):
+    self._open = False
+    self._fail(BusConnectionError("closed"))
+
+  def _write(self, msg):
+    self.sent.append(msg)
+    for (i, chunk) in enumerate(self.chunks):
+      self._loop.call_later(0.001 * (i + 1), self._onData, chunk)
+
+def exchange(transport, timeout = 0.1):
+  async def scenario():
+    await transport.connect()
+    return await transport.exchange(REQUEST, timeout)
+  return asyncio.run(scenario())
+
+def test_reply_split_across_reads():
+  transport = ScriptedTransport(REPLY[:2], REPLY[2:6], REPLY[6:])
+  assert exchange(transport) == REPLY
+  assert transport.sent == [REQUEST]
+
+def test_noise_before_the_reply():
+  transport = ScriptedTransport(b"\x00\xff" + REPLY)
+  assert exchange(transport) == REPLY
+  assert transport.stats()["resyncs"] == 1
+
+def test_frames_for_other_modules_are_unsolicited():
+  other = calcMessage([0x55, 0x82, 0x31, 4, 0x00, 0x01])
+  transport = ScriptedTransport(other, REPLY)
+  assert exchange(transport) == REPLY
+  assert transport.unsolicited == [other]
+  assert transport.stats()["unsolicited"] == 1
+
+def test_nak_is_the_reply():
+  nak = calcMessage([0x55, 0x82, 0x0, 3, 0x00, 0xf0])
+  assert exchange(ScriptedTransport(nak)) == nak
+
+def test_timeout():
+  with pytest.raises(TimeoutError):
+    exchange(ScriptedTransport(), timeout = 0.02)
+
+def test_exchange_on_a_closed_transport():
+  async def scenario():
+    await ScriptedTransport().exchange(REQUEST, 0.1)
+  with pytest.raises(BusConnectionError):
+    asyncio.run(scenario())
+
+def test_close_fails_the_pending_exchange():
+  async def scenario():
+    transport = ScriptedTransport()
+    await transport.connect()
+    asyncio.get_running_loop().call_later(0.01, transport.close)
+    await transport.exchange(REQUEST, 1)
+  with pytest.raises(BusConnectionError):
+    asyncio.run(scenario())
+
+def test_serial_transport_on_a_pty(simulatedBus):
+  simulatedBus.bus.addLightContainer(3, state = 0x05)
+
+  async def scenario(port):
+    transport = SerialTransport(port, 19200)
+    transport.open()
+    try:
+      replies = [await transport.exchange(REQUEST, 0.5) for _ in range(3)]
+      with pytest.raises(TimeoutError):
+        await transport.exchange(statusRequest(9, 0x31), 0.05)
+      return replies
+    finally:
+      transport.close()
+
+  assert simulatedBus.run(scenario) == [REPLY] * 3
@@ -0,0 +1,78 @@
+from domino_hub.travel import CLOSING, OPENING, STOPPED, TravelModel
+
+def test_position_estimate():
+  travel = TravelModel(openTime = 20, closeTime = 10, position = 0)
+  travel.move(100, now = 0)
+  assert travel.positionAt(5) == 25
+  assert travel.arrival(5) == 15
+  # the estimate stops at the target
+  assert travel.positionAt(30) == 100
+  travel.stop(now = 10)
+  assert travel.position == 50
+  travel.move(0, now = 10)
+  assert travel.direction == CLOSING
+  assert travel.positionAt(12.5) == 25
+
+def test_unknown_position_runs_to_an_end_stop():
+  travel = TravelModel()
+  travel.move(70, now = 0)
+  assert travel.direction == OPENING
+  assert travel.positionAt(1) is None
+  travel.observe(OPENING, now = 1)
+  travel.observe(STOPPED, now = 31)
+  assert travel.position == 70
+
+def test_wall_switch_movement():
+  travel = TravelModel(openTime = 10, position = 40)
+  assert travel.observe(CLOSING, now = 0)
+  assert travel.target == 0
+  assert travel.positionAt(2) == 20
+  assert not travel.observe(CLOSING, now = 2)
+
+def test_full_run_calibrates():
+  travel = TravelModel(position = 0)
+  travel.move(100, now = 0)
+  for now in range(1, 18):
+    travel.observe(OPENING, now = now)
+  travel.observe(STOPPED, now = 18)
+  # stopped between the last sighting and the first stopped read
+  assert travel.openTime == 17.5
+  assert travel.closeTime is None
+  assert travel.position == 100
+
+def test_calibration_needs_a_recent_sighting():
+  travel = TravelModel(position = 0)
+  travel.move(100, now = 0)
+  travel.observe(OPENING, now = 1)
+  travel.observe(STOPPED, now = 18)
+  assert travel.openTime is None
+  assert travel.position == 100
+
+def test_configured_times_are_kept():
+  travel = TravelModel(openTime = 25, position = 0)
+  travel.move(100, now = 0)
+  for now in range(1, 18):
+    travel.observe(OPENING, now = now)
+  travel.observe(STOPPED, now = 18)
+  assert travel.openTime == 25
+
+def test_stop_read_before_the_motor_starts():
+  travel = TravelModel(openTime = 20, position = 0)
+  travel.move(100, now = 0)
+  # the first fast poll comes before the motor shows it is moving
+  assert not travel.observe(STOPPED, now = 1)
+  assert travel.direction == OPENING
+  assert travel.positionAt(2) == 10
+  # once seen moving, a stop is an arrival whenever it comes
+  travel.observe(OPENING, now = 2)
+  travel.observe(STOPPED, now = 3)
+  assert travel.direction == STOPPED
+  assert travel.position == 100
+
+def test_motor_that_never_starts_arrives_after_the_start_lag():
+  travel = TravelModel(openTime = 20, position = 90)
+  travel.move(100, now = 0)
+  travel.observe(STOPPED, now = 1)
+  travel.observe(STOPPED, now = 6)
+  assert travel.direction == STOPPED
+  assert travel.position == 100
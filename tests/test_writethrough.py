@@ -0,0 +1,89 @@
+import pytest
+
+from domino_hub.dominoService import (Dimmer, DominoService, Light, LightContainer, Motor, MotorContainer)
+from domino_hub.exceptions import ModuleTimeoutError
+
+MotorMovement = MotorContainer.MotorStatus.MotorMovement
+
+async def openService(port):
+  svc = DominoService(port, 19200)
+  await svc.connect()
+  return svc
+
+def test_light_write_patches_the_cached_outputs(simulatedBus):
+  simulatedBus.bus.addLightContainer(2, state = 0x09)
+
+  async def scenario(port):
+    svc = await openService(port)
+    try:
+      container = LightContainer(2)
+      lights = {num: Light(container, num) for num in range(1, 5)}
+      assert await lights[1].status(svc)
+      await lights[2].setLight(svc, 100)
+      await lights[4].setLight(svc, 0)
+      statuses = [await lights[num].status(svc) for num in range(1, 5)]
+      return statuses, simulatedBus.bus.requestCount, svc.cache.peek((2, 0x31))[5]
+    finally:
+      await svc.disconnect()
+
+  statuses, requests, cached = simulatedBus.run(scenario)
+  assert statuses == [True, True, False, False]
+  # one read, two writes, the statuses after the writes come from the cache
+  assert requests == 3
+  assert cached == simulatedBus.bus.modules[2].state == 0x03
+
+def test_dimmer_write_patches_the_cached_level(simulatedBus):
+  simulatedBus.bus.addDimmer(23, pct = 10)
+
+  async def scenario(port):
+    svc = await openService(port)
+    try:
+      dimmer = Dimmer(23)
+      before = await dimmer.status(svc)
+      await dimmer.setLight(svc, 120)
+      return before, await dimmer.status(svc), simulatedBus.bus.requestCount
+    finally:
+      await svc.disconnect()
+
+  assert simulatedBus.run(scenario) == (10, 100, 2)
+
+def test_motor_commands_patch_the_cached_movement(simulatedBus):
+  simulatedBus.bus.addMotorContainer(17, travelTime = 30)
+
+  async def scenario(port):
+    svc = await openService(port)
+    try:
+      container = MotorContainer(17)
+      first, second = Motor(container, 1), Motor(container, 2)
+      assert await first.status(svc) == MotorMovement.STOPPED
+      await first.doOpen(svc)
+      opening = (await first.status(svc), await second.status(svc))
+      requests = simulatedBus.bus.requestCount
+      await first.doStop(svc)
+      stopped = await first.status(svc)
+      # where a set position sends the motor depends on where it is, the next read tells
+      await second.setPosition(svc, 40)
+      return opening, requests, stopped, svc.cache.peek((17, 0x31))
+    finally:
+      await svc.disconnect()
+
+  opening, requests, stopped, cached = simulatedBus.run(scenario)
+  assert opening == (MotorMovement.OPENING, MotorMovement.STOPPED)
+  assert requests == 2
+  assert stopped == MotorMovement.STOPPED
+  assert cached is None
+
+def test_failed_write_drops_the_cached_value(simulatedBus):
+  async def scenario(port):
+    svc = await openService(port)
+    svc.timeout = 0.02
+    try:
+      key = (6, 0x31)
+      svc.cache.store(key, [0x55, 0x82, 0x31, 6, 0, 0x01, 0])
+      with pytest.raises(ModuleTimeoutError):
+        await LightContainer(6).on(svc, 2)
+      return svc.cache.peek(key)
+    finally:
+      await svc.disconnect()
+
+  assert simulatedBus.run(scenario) is None
@@ -0,0 +1,363 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+import serial
+
+from .codec import isNak, isStatusRequest
+from .exceptions import BusConnectionError
+from .framer import FrameDecoder
+
+DIRECTION_SENT = 0
+DIRECTION_RECEIVED = 1
+
+# seconds to reach a remote bus gateway
+CONNECT_TIMEOUT = 5
+# a silent gateway connection is probed after KEEPALIVE_IDLE seconds, every KEEPALIVE_INTERVAL
+# seconds, and given up after KEEPALIVE_COUNT unanswered probes
+KEEPALIVE_IDLE = 10
+KEEPALIVE_INTERVAL = 5
+KEEPALIVE_COUNT = 3
+# seconds the RFC 2217 reader thread blocks waiting for data, and so to notice a close
+RFC2217_READ_TIMEOUT = 0.1
+
+_LOGGER = logging.getLogger(__name__)
+
+def createTransport(com_port, com_baud):
+  # the port is a device path or a URL, as pyserial knows them
+  scheme = urlsplit(com_port).scheme if "://" in com_port else ""
+  if (scheme == "socket"):
+    return SocketTransport(com_port, com_baud)
+  if (scheme == "rfc2217"):
+    return Rfc2217Transport(com_port, com_baud)
+  if (scheme != ""):
+    raise BusConnectionError(f"unsupported bus URL {com_port}")
+  return SerialTransport(com_port, com_baud)
+
+class BusTransport:
+  """Request/reply exchanges over a byte stream cut into frames. Subclasses
+  open the stream and feed what they read to _onData."""
+
+  # whether com_baud reaches the line, a raw socket bridge has its own settings
+  setsBaudRate = True
+
+  def __init__(self, com_port, com_baud):
+    self.com_port = com_port
+    self.com_baud = com_baud
+    self._loop = None
+    self.decoder = FrameDecoder()
+    self.unsolicitedCount = 0
+    self._waiter = None
+    # (module, function) of the request waiting for its reply
+    self._expected = None
+    self.onLost = None
+    # called with every frame that is not the reply to our own request
+    self.onUnsolicited = None
+    # recorder.BusRecorder capturing every frame sent and received
+    self.recorder = None
+    # monotonic time of the last frame received, whoever sent it
+    self.lastFrameTime = None
+
+  @property
+  def isOpen(self):
+    raise NotImplementedError
+
+  async def connect(self):
+    # transports that open without waiting only implement open()
+    self.open()
+
+  def open(self):
+    raise NotImplementedError
+
+  def close(self):
+    raise NotImplementedError
+
+  def _write(self, msg):
+    raise NotImplementedError
+
+  def _onData(self, data):
+    self.decoder.feed(data)
+    for frame in self.decoder.frames():
+      self._onFrame(frame)
+
+  def _onFrame(self, frame):
+    self.lastFrameTime = time.monotonic()
+    if (self.recorder is not None):
+      self.recorder.record(DIRECTION_RECEIVED, frame)
+    if (self._waiter is not None and not self._waiter.done() and self._isReply(frame)):
+      self._waiter.set_result(bytes(frame))
+      return
+    self.unsolicitedCount += 1
+    if (self.onUnsolicited is not None):
+      self.onUnsolicited(bytes(frame))
+    else:
+      _LOGGER.debug(f"Dropping unsolicited frame on {self.com_port}: {bytes(frame).hex(' ')}")
+
+  def _isReply(self, frame):
+    # other masters and modules talk on the same line: their status requests and writes
+    # are addressed to our module too, only the function we sent or a NAK answers it
+    mod, func = self._expected
+    if (frame[3] != mod):
+      return False
+    if (isNak(frame)):
+      return True
+    return frame[2] == func and not isStatusRequest(frame)
+
+  def _fail(self, exc):
+    if (self._waiter is not None and not self._waiter.done()):
+      self._waiter.set_exception(exc)
+
+  def _lost(self, exc):
+    self._fail(exc)
+    if (self.onLost is not None):
+      self.onLost(exc)
+    else:
+      self.close()
+
+  async def exchange(self, msg, timeout):
+    if (not self.isOpen):
+      raise BusConnectionError(f"{self.com_port} not open")
+    # a partial frame left in the buffer belongs to an earlier, timed out exchange
+    self.decoder.clear()
+    self._waiter = self._loop.create_future()
+    self._expected = (msg[3], msg[2])
+    try:
+      self._write(msg)
+      if (self.recorder is not None):
+        self.recorder.record(DIRECTION_SENT, msg)
+      async with asyncio.timeout(timeout):
+        return await self._waiter
+    finally:
+      self._waiter = None
+
+  def stats(self):
+    stats = self.decoder.stats()
+    stats["unsolicited"] = self.unsolicitedCount
+    return stats
+
+class SerialTransport(BusTransport):
+  """Non-blocking serial port driven by event loop readiness on its fd."""
+
+  def __init__(self, com_port, com_baud):
+    super().__init__(com_port, com_baud)
+    self.ser = None
+
+  @property
+  def isOpen(self):
+    return self.ser is not None
+
+  def open(self):
+    if (self.ser is not None):
+      return
+    self._loop = asyncio.get_running_loop()
+    # timeout=0 makes read() return immediately with whatever is available,
+    # the event loop tells us when there is something to read
+    self.ser = serial.Serial(self.com_port, baudrate = self.com_baud,
+          parity=serial.PARITY_NONE,
+          stopbits=serial.STOPBITS_ONE,
+          bytesize=serial.EIGHTBITS,
+          rtscts=False,
+          dsrdtr=False,
+          xonxoff=False,
+          timeout=0)
+    self.decoder.clear()
+    self._loop.add_reader(self.ser.fileno(), self._onReadable)
+    _LOGGER.debug(f"SerialTransport opened {self.com_port} at {self.com_baud}")
+
+  def close(self):
+    if (self.ser is None):
+      return
+    try:
+      self._loop.remove_reader(self.ser.fileno())
+    finally:
+      self.ser.close()
+      self.ser = None
+      self._fail(BusConnectionError("serial port closed"))
+      _LOGGER.debug(f"SerialTransport closed {self.com_port}")
+
+  def _onReadable(self):
+    try:
+      data = self.ser.read(self.ser.in_waiting or 1)
+    except serial.SerialException as e:
+      _LOGGER.error(f"Error reading from {self.com_port}: {e}")
+      self._lost(BusConnectionError(str(e)))
+      return
+    if (data):
+      self._onData(data)
+
+  def _write(self, msg):
+    try:
+      self.ser.write(msg)
+    except serial.SerialException as e:
+      self._lost(BusConnectionError(str(e)))
+      raise BusConnectionError(str(e)) from e
+
+class SocketTransport(BusTransport):
+  """socket://host:port, the raw byte stream of a TCP serial bridge (ser2net
+  and the like) on one persistent connection. The baud rate is the bridge's business."""
+
+  setsBaudRate = False
+
+  def __init__(self, com_port, com_baud):
+    super().__init__(com_port, com_baud)
+    url = urlsplit(com_port)
+    if (url.hostname is None or url.port is None):
+      raise BusConnectionError(f"{com_port}: expected socket://host:port")
+    self.host = url.hostname
+    self.port = url.port
+    self._transport = None
+
+  @property
+  def isOpen(self):
+    return self._transport is not None
+
+  async def connect(self):
+    if (self._transport is not None):
+      return
+    self._loop = asyncio.get_running_loop()
+    try:
+      async with asyncio.timeout(CONNECT_TIMEOUT):
+        transport, _ = await self._loop.create_connection(lambda: SocketTransport.Protocol(self), self.host, self.port)
+    except (OSError, TimeoutError) as e:
+      raise BusConnectionError(f"{self.com_port}: {e or 'connect timed out'}") from e
+    _tuneSocket(transport.get_extra_info("socket"))
+    self._transport = transport
+    self.decoder.clear()
+    _LOGGER.debug(f"SocketTransport connected to {self.host}:{self.port}")
+
+  def open(self):
+    raise BusConnectionError(f"{self.com_port}: a socket transport connects asynchronously")
+
+  def close(self):
+    if (self._transport is None):
+      return
+    transport = self._transport
+    self._transport = None
+    transport.close()
+    self._fail(BusConnectionError("bus gateway connection closed"))
+    _LOGGER.debug(f"SocketTransport closed {self.com_port}")
+
+  def _write(self, msg):
+    self._transport.write(msg)
+
+  def _connectionLost(self, transport, exc):
+    if (transport is not self._transport):
+      return
+    self._transport = None
+    self._lost(BusConnectionError(f"{self.com_port}: {exc or 'closed by the gateway'}"))
+
+  class Protocol(asyncio.Protocol):
+    def __init__(self, owner):
+      self._owner = owner
+      self._transport = None
+
+    def connection_made(self, transport):
+      self._transport = transport
+
+    def data_received(self, data):
+      self._owner._onData(data)
+
+    def connection_lost(self, exc):
+      self._owner._connectionLost(self._transport, exc)
+
+def _tuneSocket(sock):
+  # frames are 7 bytes, Nagle would hold each one back waiting for more
+  sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+  # a gateway that went away without a word is noticed even while the bus is quiet
+  sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+  for (option, value) in (("TCP_KEEPIDLE", KEEPALIVE_IDLE), ("TCP_KEEPINTVL", KEEPALIVE_INTERVAL), ("TCP_KEEPCNT", KEEPALIVE_COUNT)):
+    if (hasattr(socket, option)):
+      sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+
+class Rfc2217Transport(BusTransport):
+  """rfc2217://host:port, a telnet serial server that also takes the line settings.
+  pyserial speaks the protocol with blocking calls, none of which may run on the
+  event loop: the port is opened in an executor, read by a thread handing the
+  data over to the loop, and written and closed by a writer thread of its own,
+  which keeps the writes in order and the close after them."""
+
+  def __init__(self, com_port, com_baud):
+    super().__init__(com_port, com_baud)
+    self.ser = None
+    self._reader = None
+    self._writer = None
+
+  @property
+  def isOpen(self):
+    return self.ser is not None
+
+  async def connect(self):
+    if (self.ser is not None):
+      return
+    self._loop = asyncio.get_running_loop()
+    try:
+      ser = await self._loop.run_in_executor(None, self._openPort)
+    except serial.SerialException as e:
+      raise BusConnectionError(f"{self.com_port}: {e}") from e
+    self.ser = ser
+    self.decoder.clear()
+    self._writer = ThreadPoolExecutor(max_workers = 1, thread_name_prefix = f"domino_hub {self.com_port} writer")
+    self._reader = threading.Thread(target = self._read, args = (ser,), name = f"domino_hub {self.com_port}", daemon = True)
+    self._reader.start()
+    _LOGGER.debug(f"Rfc2217Transport opened {self.com_port} at {self.com_baud}")
+
+  def _openPort(self):
+    return serial.serial_for_url(self.com_port, baudrate = self.com_baud,
+          parity=serial.PARITY_NONE,
+          stopbits=serial.STOPBITS_ONE,
+          bytesize=serial.EIGHTBITS,
+          timeout=RFC2217_READ_TIMEOUT)
+
+  def open(self):
+    raise BusConnectionError(f"{self.com_port}: an RFC 2217 transport connects asynchronously")
+
+  def _read(self, ser):
+    # reader thread, it lives as long as the port it was started for
+    while (self.ser is ser):
+      try:
+        data = ser.read(ser.in_waiting or 1)
+      except Exception as e:
+        if (self.ser is ser):
+          self._loop.call_soon_threadsafe(self._portFailed, ser, e)
+        return
+      if (data):
+        self._loop.call_soon_threadsafe(self._readData, ser, data)
+
+  def _readData(self, ser, data):
+    if (self.ser is ser):
+      self._onData(data)
+
+  def _portFailed(self, ser, exc):
+    if (self.ser is ser):
+      _LOGGER.error(f"Error on {self.com_port}: {exc}")
+      self._lost(BusConnectionError(str(exc)))
+
+  def close(self):
+    if (self.ser is None):
+      return
+    ser = self.ser
+    writer = self._writer
+    self.ser = None
+    self._reader = None
+    self._writer = None
+    # pyserial joins its telnet thread and waits for the server to settle, seconds at worst
+    writer.submit(ser.close)
+    writer.shutdown(wait = False)
+    self._fail(BusConnectionError("serial port closed"))
+    _LOGGER.debug(f"Rfc2217Transport closed {self.com_port}")
+
+  def _write(self, msg):
+    self._writer.submit(self._send, self.ser, msg)
+
+  def _send(self, ser, msg):
+    # writer thread, a failed write is a lost connection, on the loop
+    try:
+      ser.write(msg)
+    except Exception as e:
+      self._loop.call_soon_threadsafe(self._portFailed, ser, e)
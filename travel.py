@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import logging
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+# seconds for a full travel when nothing is configured or calibrated yet
+TRAVEL_TIME_DEFAULT = 30
+# calibrated travel times outside this range are measurement glitches
+TRAVEL_TIME_RANGE = (3, 300)
+# a motor found stopped this close (in %) to its estimated target got there, further away it was stopped
+ARRIVAL_TOLERANCE = 25
+# a stop only calibrates the travel time when the motor was last seen moving at most this long before
+CALIBRATION_RESOLUTION = 3
+# seconds a motor may take to show it is moving after a command, a stop read before then is not an arrival
+START_LAG = 5
+
+STOPPED = 0
+OPENING = 1
+CLOSING = -1
+
+class TravelModel:
+  """Position of a motor estimated from the movements it was told to make and
+  the motion bits seen on the bus, 0 closed and 100 open, None while unknown."""
+
+  def __init__(self, openTime = None, closeTime = None, position = None):
+    # configured travel times are trusted, otherwise full runs calibrate them
+    self.configured = openTime is not None or closeTime is not None
+    self.openTime = openTime if openTime is not None else closeTime
+    self.closeTime = closeTime if closeTime is not None else openTime
+    self.position = position
+    self.direction = STOPPED
+    self.target = None
+    self.since = None
+    self.lastSeenMoving = None
+    # whether the motion bits confirmed the current move yet
+    self.confirmed = False
+    # a full travel from a known end stop, timed to calibrate the travel time
+    self._calibration = None
+
+  def _now(self, now):
+    return time.monotonic() if now is None else now
+
+  def _travelTime(self, direction):
+    # until both are known, one direction is as good a guess as any for the other
+    travelTime = self.openTime if direction == OPENING else self.closeTime
+    if (travelTime is None):
+      travelTime = self.closeTime if direction == OPENING else self.openTime
+    return travelTime if travelTime is not None else TRAVEL_TIME_DEFAULT
+
+  def positionAt(self, now = None):
+    if (self.position is None or self.direction == STOPPED):
+      return self.position
+    elapsed = self._now(now) - self.since
+    position = self.position + self.direction * elapsed * 100 / self._travelTime(self.direction)
+    if (self.direction == OPENING):
+      return min(position, self.target)
+    return max(position, self.target)
+
+  def arrival(self, now = None):
+    # seconds until the estimated position reaches the target, None when unknown or stopped
+    if (self.direction == STOPPED):
+      return None
+    now = self._now(now)
+    position = self.positionAt(now)
+    if (position is None):
+      return self._travelTime(self.direction)
+    return abs(self.target - position) * self._travelTime(self.direction) / 100
+
+  def isMoving(self):
+    return self.direction != STOPPED
+
+  def move(self, target, now = None):
+    now = self._now(now)
+    position = self.positionAt(now)
+    if (position is None):
+      # only a run to an end stop tells us where we are, towards it from anywhere
+      direction = OPENING if target >= 50 else CLOSING
+    elif (target == position):
+      self.stop(now)
+      return
+    else:
+      direction = OPENING if target > position else CLOSING
+    self._start(direction, target, position, now)
+
+  def _start(self, direction, target, position, now):
+    self.position = position
+    self.direction = direction
+    self.target = target
+    self.since = now
+    self.confirmed = False
+    endStop = 100 if direction == OPENING else 0
+    if (position == 100 - endStop and target == endStop):
+      self._calibration = (direction, now)
+    else:
+      self._calibration = None
+
+  def stop(self, now = None):
+    now = self._now(now)
+    self.position = self.positionAt(now)
+    self.direction = STOPPED
+    self.target = None
+    self._calibration = None
+
+  def observe(self, direction, now = None):
+    # reconcile with the motion bits read from the bus
+    now = self._now(now)
+    if (direction != STOPPED):
+      self.lastSeenMoving = now
+    if (direction == self.direction):
+      self.confirmed = direction != STOPPED
+      return False
+    if (direction == STOPPED):
+      if (not self.confirmed and now - self.since < START_LAG):
+        # the motor has not started yet, go on estimating from the command
+        return False
+      self._arrived(now)
+    else:
+      # moved by someone else (a wall switch), or the other way than guessed from an unknown position
+      position = self.positionAt(now)
+      target = self.target
+      if (target is None or (position is not None and (target - position) * direction <= 0)):
+        target = 100 if direction == OPENING else 0
+      _LOGGER.debug(f"Motor seen {'opening' if direction == OPENING else 'closing'} towards {target}")
+      self._start(direction, target, position, now)
+      self.confirmed = True
+    return True
+
+  def _arrived(self, now):
+    target = self.target
+    position = self.positionAt(now)
+    # a run to an end stop only ends there (our own stop command goes through stop()), otherwise
+    # a motor found close to its target got there and the estimate was off by the travel time
+    if (target in (0, 100) or (target is not None and (position is None or abs(position - target) <= ARRIVAL_TOLERANCE))):
+      self._calibrate(now)
+      position = target
+    self.position = position
+    self.direction = STOPPED
+    self.target = None
+    self._calibration = None
+
+  def _calibrate(self, now):
+    if (self.configured or self._calibration is None or self.target not in (0, 100)):
+      return
+    if (self.lastSeenMoving is None or now - self.lastSeenMoving > CALIBRATION_RESOLUTION):
+      return
+    direction, start = self._calibration
+    # it stopped somewhere between the last time it was seen moving and now
+    measured = (self.lastSeenMoving + now) / 2 - start
+    low, high = TRAVEL_TIME_RANGE
+    if (measured < low or measured > high):
+      return
+    if (direction == OPENING):
+      self.openTime = round(measured, 1)
+    else:
+      self.closeTime = round(measured, 1)
+    _LOGGER.info(f"Calibrated {'open' if direction == OPENING else 'close'} time: {measured:.1f}s")